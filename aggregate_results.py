@@ -0,0 +1,273 @@
+# aggregate_results.py
+# 以 process pool 平行讀取過去所有 Excel 結果（*_results_YYYYMMDD_HHMMSS.xlsx），整理成可跨模型、跨人格版本比較的表格
+# 解析結果依檔案的修改時間快取成 Parquet，檔案沒變就不必再用 openpyxl 讀一次
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# 解析後的表格快取（每個 Excel 兩個 Parquet：每回合答案、穩定度統計，加上執行資訊的 JSON）
+EXCEL_CACHE_DIR = ".excel_cache"
+
+# 預設讀取的檔名（各條件的 excel_prefix + 時間戳記）
+DEFAULT_PATTERNS = ("*_results_*.xlsx",)
+
+FILENAME_PATTERN = re.compile(r"^(?P<prefix>.+)_(?P<timestamp>\d{8}_\d{6})\.xlsx$")
+QUESTION_COLUMN = re.compile(r"^第(\d+)題$")
+
+# 每列附上的檔案與條件資訊（彙總時以這些欄位分組）；ambiguous 為無法判斷屬於哪個條件的檔案
+FILE_COLUMNS = ["excel_prefix", "condition", "model", "persona", "prompt_variant", "ambiguous", "run_time", "file"]
+
+# 舊版腳本共用的檔名前綴 → 曾寫入這個前綴的條件：ask_gpt5_final.py（PPV）、ask_gpt5_final_noppv.py（無 PPV）、
+# ask_gpt5_v2.py 與 ask_gpt5_v2_finetuned_prompt.py 都寫成 gpt_stability_results_*.xlsx，只靠檔名分不出人格與 prompt 版本
+LEGACY_SHARED_PREFIXES = {
+    "gpt_stability_results": ("gpt_ppv", "gpt_no_ppv", "gpt_v2", "gpt_v2_finetuned"),
+}
+
+# 新版 Excel 的「執行資訊」工作表（results_store.export_excel）欄位
+INFO_COLUMNS = {"條件": "condition", "模型": "model", "人格": "persona", "prompt 版本": "prompt_variant"}
+
+# 穩定度統計工作表的欄位（舊版腳本沒有熵與變異數，讀入時為 NaN）
+STABILITY_COLUMNS = {
+    "題號": "question",
+    "最常出現答案": "most_common",
+    "出現次數": "count",
+    "穩定度": "stability",
+    "熵": "entropy",
+    "變異數": "variance",
+}
+
+
+def cache_paths(path):
+    """快取檔名包含檔案路徑的雜湊、修改時間與大小：Excel 被覆寫後自動改讀新的內容"""
+    stat = os.stat(path)
+    path_hash = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    key = f"{path_hash}_{stat.st_mtime_ns}_{stat.st_size}"
+    return (
+        os.path.join(EXCEL_CACHE_DIR, f"{key}.rounds.parquet"),
+        os.path.join(EXCEL_CACHE_DIR, f"{key}.stability.parquet"),
+        os.path.join(EXCEL_CACHE_DIR, f"{key}.info.json"),
+        path_hash,
+    )
+
+
+def normalize_answer(value):
+    """Excel 讀回的答案可能是數字（1~3 量表）或字母；統一成字串，空白為 None"""
+    if value is None or value != value:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() or None
+
+
+def parse_excel(path):
+    """讀取一個 Excel 的每回合答案與穩定度統計，回傳 (rounds, stability, info)
+
+    rounds 為長表（round, question, answer），stability 為每題一列；缺少的欄位補 NaN。
+    info 為「執行資訊」工作表記錄的條件、模型、人格與 prompt 版本，舊版檔案沒有這個工作表時為空 dict。
+    """
+    import pandas as pd
+
+    with pd.ExcelFile(path, engine="openpyxl") as workbook:
+        names = ["每回合答案", "穩定度統計"] + (["執行資訊"] if "執行資訊" in workbook.sheet_names else [])
+        sheets = pd.read_excel(workbook, sheet_name=names)
+
+    wide = sheets["每回合答案"]
+    question_columns = {col: int(m.group(1)) for col in wide.columns if (m := QUESTION_COLUMN.match(str(col)))}
+    rounds = wide.melt(id_vars=["回合"], value_vars=list(question_columns), var_name="question", value_name="answer")
+    rounds = pd.DataFrame({
+        "round": rounds["回合"].astype("int32"),
+        "question": rounds["question"].map(question_columns).astype("int16"),
+        "answer": rounds["answer"].map(normalize_answer).astype("string"),
+    }).sort_values(["round", "question"], ignore_index=True)
+
+    stats = sheets["穩定度統計"].rename(columns=STABILITY_COLUMNS)
+    for column in STABILITY_COLUMNS.values():
+        if column not in stats:
+            stats[column] = float("nan")
+    stability = stats[list(STABILITY_COLUMNS.values())].copy()
+    stability["question"] = stability["question"].astype("int16")
+    stability["most_common"] = stability["most_common"].map(normalize_answer).astype("string")
+
+    info = {}
+    if "執行資訊" in sheets and len(sheets["執行資訊"]):
+        row = sheets["執行資訊"].iloc[0]
+        info = {key: str(row[column]) for column, key in INFO_COLUMNS.items() if column in row and row[column] == row[column]}
+    return rounds, stability, info
+
+
+def parse_to_cache(path, rounds_path, stability_path, info_path, path_hash):
+    """在 worker process 中解析一個 Excel 並寫入快取（同一個檔案舊版本的快取一併刪除）"""
+    rounds, stability, info = parse_excel(path)
+    os.makedirs(EXCEL_CACHE_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(EXCEL_CACHE_DIR, f"{path_hash}_*")):
+        os.remove(stale)
+    for df, target in ((rounds, rounds_path), (stability, stability_path)):
+        tmp_path = target + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, target)
+    # 執行資訊最後寫入：三個檔案都在才算快取完整
+    tmp_path = info_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False)
+    os.replace(tmp_path, info_path)
+    return path
+
+
+def condition_index(config):
+    """{excel_prefix: 條件資訊}，用來從檔名對回模型、人格與 prompt 版本
+
+    一個前綴可能屬於多個條件（設定檔中重複，或 LEGACY_SHARED_PREFIXES 列出的舊版腳本共用前綴）時，
+    只保留所有可能條件都相同的欄位，其餘為 None，並標記 ambiguous，不把檔案歸給其中任何一個條件。
+    """
+    from experiment_runner import all_conditions, persona_label
+
+    described = {}
+    candidates = {}
+    for condition in all_conditions(config):
+        prefix = condition.get("excel_prefix") or f"{condition['name']}_results"
+        described[condition["name"]] = {
+            "condition": condition["name"],
+            "model": config["providers"][condition["provider"]]["model"],
+            "persona": persona_label(condition.get("persona")),
+            "prompt_variant": condition.get("prompt_variant") or condition["template"],
+        }
+        candidates.setdefault(prefix, []).append(condition["name"])
+    for prefix, names in LEGACY_SHARED_PREFIXES.items():
+        candidates.setdefault(prefix, []).extend(name for name in names if name in described)
+
+    index = {}
+    for prefix, names in candidates.items():
+        names = list(dict.fromkeys(names))
+        if len(names) == 1:
+            index[prefix] = {**described[names[0]], "ambiguous": False}
+            continue
+        infos = [described[name] for name in names]
+        index[prefix] = {
+            key: infos[0][key] if all(info[key] == infos[0][key] for info in infos) else None
+            for key in ("model", "persona", "prompt_variant")
+        }
+        index[prefix].update(condition=None, ambiguous=True)
+    return index
+
+
+def file_info(path, conditions, workbook_info=None):
+    """由檔名取出 excel_prefix 與執行時間，並對回條件：優先採用 Excel 的執行資訊，其次依檔名（對不到時為 None）"""
+    name = os.path.basename(path)
+    match = FILENAME_PATTERN.match(name)
+    prefix = match.group("prefix") if match else os.path.splitext(name)[0]
+    run_time = datetime.strptime(match.group("timestamp"), "%Y%m%d_%H%M%S") if match else None
+    condition = {**workbook_info, "ambiguous": False} if workbook_info else conditions.get(prefix, {})
+    return {
+        "file": name,
+        "excel_prefix": prefix,
+        "run_time": run_time,
+        "condition": condition.get("condition"),
+        "model": condition.get("model"),
+        "persona": condition.get("persona"),
+        "prompt_variant": condition.get("prompt_variant"),
+        "ambiguous": bool(condition.get("ambiguous", False)),
+    }
+
+
+def load_results(paths, conditions=None, workers=None, use_cache=True):
+    """平行讀取多個 Excel，回傳 (rounds, stability) 兩個 DataFrame，每列附上檔案與條件資訊
+
+    只有沒有快取（或檔案已修改）的檔案才交給 process pool 解析。
+    """
+    import pandas as pd
+
+    conditions = conditions or {}
+    entries = [(path, *cache_paths(path)) for path in paths]
+    pending = [entry for entry in entries if not (use_cache and all(os.path.exists(target) for target in entry[1:4]))]
+    if pending:
+        print(f"解析 {len(pending)} 個 Excel（其餘 {len(entries) - len(pending)} 個使用快取）...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(parse_to_cache, *entry): entry[0] for entry in pending}
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"警告：無法讀取 {futures[future]}（{e}），略過")
+
+    rounds_frames, stability_frames = [], []
+    for path, rounds_path, stability_path, info_path, _ in entries:
+        if not all(os.path.exists(target) for target in (rounds_path, stability_path, info_path)):
+            continue
+        with open(info_path, encoding="utf-8") as f:
+            info = file_info(path, conditions, json.load(f))
+        for target, frames in ((rounds_path, rounds_frames), (stability_path, stability_frames)):
+            df = pd.read_parquet(target)
+            frames.append(df.assign(**info))
+    if not rounds_frames:
+        return None, None
+    return pd.concat(rounds_frames, ignore_index=True), pd.concat(stability_frames, ignore_index=True)
+
+
+def summarize(rounds, stability):
+    """每個檔案（一次執行）一列：條件、執行時間、回合數與穩定度，依 excel_prefix 與時間排序"""
+    summary = stability.groupby(FILE_COLUMNS, dropna=False).agg(
+        questions=("question", "count"),
+        mean_stability=("stability", "mean"),
+        min_stability=("stability", "min"),
+        mean_entropy=("entropy", "mean"),
+    )
+    summary["rounds"] = rounds.groupby(FILE_COLUMNS, dropna=False)["round"].nunique()
+    return summary.reset_index().sort_values(["excel_prefix", "run_time"], ignore_index=True)
+
+
+def main(argv=None):
+    from experiment_runner import load_config, CONFIG_PATH
+
+    parser = argparse.ArgumentParser(description="平行讀取過去所有 Excel 結果並彙總成單一表格")
+    parser.add_argument("patterns", nargs="*", default=list(DEFAULT_PATTERNS), help="要讀取的檔案（glob，預設 *_results_*.xlsx）")
+    parser.add_argument("--config", default=CONFIG_PATH, help="實驗設定檔（用來從檔名對回模型、人格與 prompt 版本）")
+    parser.add_argument("--workers", type=int, default=None, help="process pool 大小（預設為 CPU 核心數）")
+    parser.add_argument("--no-cache", action="store_true", help="忽略快取，重新解析所有檔案")
+    parser.add_argument("--output", default=None, help="把彙總後的表格寫出：.xlsx 檔，或檔名前綴（寫成 PREFIX.rounds.parquet 與 PREFIX.stability.parquet）")
+    args = parser.parse_args(argv)
+
+    paths = sorted({path for pattern in args.patterns for path in glob.glob(pattern)})
+    if not paths:
+        print("找不到任何結果檔案")
+        return None
+
+    conditions = condition_index(load_config(args.config)) if os.path.exists(args.config) else {}
+    rounds, stability = load_results(paths, conditions, args.workers, use_cache=not args.no_cache)
+    if stability is None:
+        print("沒有可讀取的結果")
+        return None
+
+    summary = summarize(rounds, stability)
+    print(f"\n=== 共 {len(summary)} 次執行、{len(rounds):,} 筆答案 ===")
+    ambiguous = int(summary["ambiguous"].sum())
+    if ambiguous:
+        print(f"注意：{ambiguous} 個檔案的檔名前綴由多個條件共用、檔案中也沒有執行資訊，條件 / 人格 / prompt 版本標記為不明")
+    for row in summary.itertuples():
+        label = row.condition if isinstance(row.condition, str) else row.excel_prefix
+        if row.ambiguous:
+            label += "（條件不明）"
+        run_time = "-" if row.run_time is None or row.run_time != row.run_time else f"{row.run_time:%Y-%m-%d %H:%M}"
+        print(f"{label:<28} {run_time:<16} {row.rounds:>5} 回合  平均穩定度 {row.mean_stability:.3f}（最低 {row.min_stability:.3f}）")
+
+    if args.output:
+        if args.output.endswith(".xlsx"):
+            import pandas as pd
+
+            with pd.ExcelWriter(args.output, engine="openpyxl") as writer:
+                summary.to_excel(writer, sheet_name="各次執行", index=False)
+                stability.to_excel(writer, sheet_name="穩定度統計", index=False)
+                rounds.to_excel(writer, sheet_name="每回合答案", index=False)
+        else:
+            rounds.to_parquet(f"{args.output}.rounds.parquet", index=False)
+            stability.to_parquet(f"{args.output}.stability.parquet", index=False)
+        print(f"✅ 彙總結果已寫入 {args.output}")
+    return rounds, stability, summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# answer_distributions.py
+# 由 token logprobs 直接讀出每題各選項的機率，不必抽樣大量回合
+import bisect
+import math
+import re
+
+import numpy as np
+
+from answer_parsers import numbered_matches, STRUCTURED_ITEM
+
+# 每個 token 位置要求的候選 token 數（OpenAI 上限 20）
+TOP_LOGPROBS = 20
+
+# 候選 token 比對選項前去掉的字元（空白、引號與常見標點）
+TOKEN_STRIP = " \t\r\n\"'`,，、.。:：;；()（）[]{}"
+
+
+def answer_offsets(answer_text, options, num_questions, structured=False):
+    """找出每題答案在回答文字中的位置，回傳 {題號: 字元位置}
+
+    對齊規則與解析器相同：結構化輸出依 question_id；有題號時依題號（答案矛盾的題目略過）；
+    沒有題號時只有答案數量剛好等於題數才依位置對齊。
+    """
+    if structured:
+        choices = "|".join(re.escape(opt) for opt in options)
+        pattern = STRUCTURED_ITEM.format(choices=choices)
+        matches = [(int(m.group(1)), m.group(2), m.start(2)) for m in re.finditer(pattern, answer_text)]
+    else:
+        matches = numbered_matches(answer_text, options)
+        if not matches:
+            positions = [idx for idx, char in enumerate(answer_text) if char in options]
+            if len(positions) != num_questions:
+                return {}
+            return {number: pos for number, pos in enumerate(positions, 1)}
+
+    offsets = {}
+    answers = {}
+    for number, answer, pos in matches:
+        if not 1 <= number <= num_questions:
+            continue
+        answers.setdefault(number, set()).add(answer)
+        offsets.setdefault(number, pos)
+    return {number: pos for number, pos in offsets.items() if len(answers[number]) == 1}
+
+
+def token_distribution(candidates, options):
+    """把一個 token 位置的候選 (token, logprob) 加總成各選項的機率並正規化；沒有任何選項時回傳 None"""
+    mass = np.zeros(len(options))
+    index = {opt: idx for idx, opt in enumerate(options)}
+    for token, logprob in candidates:
+        idx = index.get(token.strip(TOKEN_STRIP))
+        if idx is not None:
+            mass[idx] += math.exp(logprob)
+    total = mass.sum()
+    if total <= 0:
+        return None
+    return mass / total
+
+
+def answer_distributions(tokens, options, num_questions, structured=False):
+    """由一次回答的 token logprobs 取出每題的選項機率，shape = (題目 × 選項)，對不到的題目為 NaN
+
+    tokens 為 [(token, [(候選 token, logprob), ...]), ...]，依輸出順序排列。
+    """
+    probabilities = np.full((num_questions, len(options)), np.nan)
+    text = "".join(token for token, _ in tokens)
+    # 每個 token 在回答文字中的起始位置，用來把答案位置對回 token
+    starts = []
+    position = 0
+    for token, _ in tokens:
+        starts.append(position)
+        position += len(token)
+
+    for number, offset in answer_offsets(text, options, num_questions, structured).items():
+        token_idx = bisect.bisect_right(starts, offset) - 1
+        distribution = token_distribution(tokens[token_idx][1], options)
+        if distribution is not None:
+            probabilities[number - 1] = distribution
+    return probabilities
+
+
+def combine_distributions(distributions):
+    """多次請求的機率取平均（各題只計入有對到的請求），回傳 (機率, 每題有效的請求數)"""
+    stacked = np.stack(distributions)
+    valid = ~np.isnan(stacked).any(axis=2)
+    calls = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        combined = np.where(valid[:, :, None], stacked, 0.0).sum(axis=0) / calls[:, None]
+    return combined, calls
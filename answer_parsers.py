@@ -0,0 +1,337 @@
+# answer_parsers.py
+import bisect
+import json
+import re
+
+# 作答量表：名稱 → 選項（答案矩陣中依此順序編碼）
+SCALES = {
+    "agree3": ["1", "2", "3"],
+    "letter5": ["A", "B", "C", "D", "E"],
+}
+
+
+def numbered_pattern(options):
+    """帶題號答案的 regex：group 1 / 2 為題號，group 3 為答案"""
+    choices = "".join(re.escape(opt) for opt in options)
+    return re.compile(rf"(?:第\s*(\d+)\s*題\s*[：:]?|^\s*(\d+)\s*[.:：、)）])\s*([{choices}])", re.MULTILINE)
+
+
+# 行首「N. X」形式至少要出現在這麼多個不同題號的行，才視為帶題號的回答
+MIN_NUMBERED_LINES = 2
+
+
+def numbered_matches(answer_text, options, final=True):
+    """帶題號的答案，回傳 [(題號, 答案, 答案位置)]，依出現順序排列
+
+    「第N題：X」一律採用。行首的「N. X」、「N、X」… 容易和沒有題號、以頓號或逗號分隔的答案
+    （例如「1、2、3、1、2」）混淆，只有在至少 MIN_NUMBERED_LINES 個不同題號的行出現、且這些行內
+    沒有「X、Y」或「X, Y」連續答案時才採用。final 為 False 時（串流中）尚未收完的最後一行先不採用。
+    """
+    choices = "".join(re.escape(opt) for opt in options)
+    answer_run = re.compile(rf"[{choices}]\s*[、,，]\s*[{choices}]")
+    explicit, line_start = [], []
+    for match in numbered_pattern(options).finditer(answer_text):
+        if match.group(1):
+            explicit.append((int(match.group(1)), match.group(3), match.start(3)))
+            continue
+        line_end = answer_text.find("\n", match.start())
+        if line_end < 0:
+            if not final:
+                continue
+            line_end = len(answer_text)
+        # 從答案開始到行尾不能再接「、Y」「, Y」（題號本身也可能是選項字元，不列入檢查）
+        if answer_run.search(answer_text, match.start(3), line_end):
+            continue
+        line_start.append((int(match.group(2)), match.group(3), match.start(3)))
+    if len({number for number, _, _ in line_start}) < MIN_NUMBERED_LINES:
+        line_start = []
+    return sorted(explicit + line_start, key=lambda match: match[2])
+
+
+def extract_numbered(answer_text, options):
+    """找出帶題號的答案（「第N題：X」或多行的「N. X」、「N: X」…），回傳 {題號: [出現過的答案]}"""
+    found = {}
+    for number, answer, _ in numbered_matches(answer_text, options):
+        found.setdefault(number, []).append(answer)
+    return found
+
+
+def align_answers(answer_text, options, question_numbers):
+    """把回答對齊到題號，回傳 ({題號: 答案}，答案互相矛盾的題號)
+
+    question_numbers 為這次問的題號（依提問順序）。有題號時依題號對齊；沒有題號時只有答案數量
+    剛好等於題數才依位置對齊，否則無法判斷缺了哪幾題，全部視為缺答，避免錯位的答案混進穩定度統計。
+    """
+    aligned = {}
+    ambiguous = []
+    numbered = extract_numbered(answer_text, options)
+    if numbered:
+        wanted = set(question_numbers)
+        for number, found in numbered.items():
+            if number not in wanted:
+                continue
+            if len(set(found)) == 1:
+                aligned[number] = found[0]
+            else:
+                ambiguous.append(number)
+        return aligned, sorted(ambiguous)
+
+    chars = [a for a in answer_text if a in options]
+    if len(chars) == len(question_numbers):
+        aligned = dict(zip(question_numbers, chars))
+    return aligned, ambiguous
+
+
+def unaligned_count(answer_text, options, question_numbers):
+    """沒有題號、答案數量又和題數不符（無法依位置對齊）時回傳找到的答案數，否則回傳 0
+
+    這種回答仍有答案，只是不知道缺了哪幾題，交給補問要求逐題帶題號重答，不必整個回合重新取樣。
+    """
+    if extract_numbered(answer_text, options):
+        return 0
+    count = sum(1 for a in answer_text if a in options)
+    return count if count != len(question_numbers) else 0
+
+
+def answers_list(aligned, num_questions):
+    """{題號: 答案} → 長度為題數的 list，缺答為 None"""
+    return [aligned.get(number) for number in range(1, num_questions + 1)]
+
+
+def missing_questions(answers):
+    """缺答的題號（從 1 起算）"""
+    return [idx + 1 for idx, answer in enumerate(answers) if answer is None]
+
+
+def parse_chars(answer_text, options, num_questions):
+    """只有答案的回覆（例如「1, 2, 3...」）；有題號時優先依題號對齊
+
+    沒有題號且答案數量不符時，meta 的 unaligned 記錄找到的答案數（全部題目視為缺答，交給補問）。
+    """
+    question_numbers = range(1, num_questions + 1)
+    aligned, ambiguous = align_answers(answer_text, options, question_numbers)
+    meta = {"ambiguous": ambiguous} if ambiguous else {}
+    unaligned = unaligned_count(answer_text, options, question_numbers)
+    if unaligned:
+        meta["unaligned"] = unaligned
+    return answers_list(aligned, num_questions), meta
+
+
+def parse_numbered(answer_text, options, num_questions):
+    """「第N題：X（理由）- 信心水準：85分」格式的回覆，同時取出信心水準（0-100分）"""
+    question_numbers = range(1, num_questions + 1)
+    aligned, ambiguous = align_answers(answer_text, options, question_numbers)
+    answers = answers_list(aligned, num_questions)
+    meta = {"confidence": [int(score) for score in re.findall(r"信心水準[：:]\s*(\d+)", answer_text)]}
+    if ambiguous:
+        meta["ambiguous"] = ambiguous
+    unaligned = unaligned_count(answer_text, options, question_numbers)
+    if unaligned:
+        meta["unaligned"] = unaligned
+    return answers, meta
+
+
+def answer_schema(options):
+    """結構化輸出的 JSON schema：answers 陣列，每題一項 {question_id, answer, confidence, reason}
+
+    符合 OpenAI strict 模式的限制（所有欄位 required、不允許額外欄位）。
+    """
+    item = {
+        "type": "object",
+        "properties": {
+            "question_id": {"type": "integer"},
+            "answer": {"type": "string", "enum": list(options)},
+            "confidence": {"type": "integer"},
+            "reason": {"type": "string"},
+        },
+        "required": ["question_id", "answer", "confidence", "reason"],
+        "additionalProperties": False,
+    }
+    return {
+        "type": "object",
+        "properties": {"answers": {"type": "array", "items": item}},
+        "required": ["answers"],
+        "additionalProperties": False,
+    }
+
+
+def structured_items(answer_text, options, question_numbers):
+    """解析 JSON 回答並依題目定義驗證：題號必須是這次問的題目、答案必須是量表選項；
+    信心水準不是 0-100 的整數時記為 None。JSON 格式錯誤時回傳空 list"""
+    try:
+        items = json.loads(answer_text).get("answers")
+    except (ValueError, AttributeError):
+        return []
+    if not isinstance(items, list):
+        return []
+    wanted = set(question_numbers)
+    valid = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        number = item.get("question_id")
+        if not isinstance(number, int) or number not in wanted or item.get("answer") not in options:
+            continue
+        confidence = item.get("confidence")
+        if not isinstance(confidence, int) or not 0 <= confidence <= 100:
+            confidence = None
+        valid.append({"question_id": number, "answer": item["answer"], "confidence": confidence})
+    return valid
+
+
+def align_structured(answer_text, options, question_numbers):
+    """與 align_answers 相同的回傳格式：({題號: 答案}，答案互相矛盾的題號)"""
+    found = {}
+    for item in structured_items(answer_text, options, question_numbers):
+        found.setdefault(item["question_id"], set()).add(item["answer"])
+    aligned = {number: answers.pop() for number, answers in found.items() if len(answers) == 1}
+    ambiguous = sorted(number for number, answers in found.items() if len(answers) > 1)
+    return aligned, ambiguous
+
+
+def parse_structured(answer_text, options, num_questions):
+    """結構化輸出（JSON）的回覆：直接依 question_id 對齊，並取出各題的信心水準（{題號: 分數}）"""
+    question_numbers = range(1, num_questions + 1)
+    aligned, ambiguous = align_structured(answer_text, options, question_numbers)
+    confidence = {}
+    for item in structured_items(answer_text, options, question_numbers):
+        if item["confidence"] is not None and item["question_id"] in aligned:
+            confidence.setdefault(item["question_id"], item["confidence"])
+    # 依題號記錄，題目重新排列時才能與答案一起放回原本的題號
+    meta = {"confidence": {number: confidence[number] for number in sorted(confidence)}}
+    if ambiguous:
+        meta["ambiguous"] = ambiguous
+    return answers_list(aligned, num_questions), meta
+
+
+# 串流模式中，超過這麼多字還沒出現任何答案就視為格式錯誤
+MAX_PREAMBLE = 300
+
+# 結構化輸出中一題的 question_id 與 answer（strict schema 依欄位順序輸出）
+STRUCTURED_ITEM = r'"question_id"\s*:\s*(\d+)\s*,\s*"answer"\s*:\s*"({choices})"'
+
+
+class StreamingAnswerParser:
+    """逐段接收串流輸出，答案一出現就對齊題號並記下時間；發現格式錯誤時設定 malformed（說明字串）
+
+    mode 為 "numbered"（第N題：X）、"structured"（JSON）或 "chars"（依位置；出現題號時改用 numbered）。
+    回合的最終答案仍以完整回答重新解析，這裡的答案用來即時顯示、計時與提早中止。
+    """
+
+    def __init__(self, options, num_questions, mode="chars", max_preamble=MAX_PREAMBLE):
+        self.options = options
+        self.num_questions = num_questions
+        self.mode = mode
+        self.max_preamble = max_preamble
+        self.text = ""
+        self.answers = [None] * num_questions
+        self.confidence = {}   # 題號 → 信心水準（對齊到它前面最近的一題）
+        self.answered_at = {}   # 題號 → 答案出現時距離請求送出的秒數
+        self.malformed = None
+        self._scan_from = 0
+        self._positional = 0
+        self._answer_positions = []   # (答案在回答中的位置, 題號)，依位置排列
+        choices = "|".join(re.escape(opt) for opt in options)
+        self._structured = re.compile(STRUCTURED_ITEM.format(choices=choices))
+        self._line_number = re.compile(r"^\s*\d+\s*[.:：、)）]", re.MULTILINE)
+        # 信心分數後面要接非數字才算完整（避免把 85 讀成 8）
+        self._confidence = re.compile(r"信心水準[：:]\s*(\d+)(?=\D)")
+        self._confidence_from = 0
+
+    def feed(self, chunk, elapsed, final=False):
+        """加入一段輸出，回傳這段新對齊的題號；串流結束時以 final=True 再呼叫一次，處理最後一行"""
+        self.text += chunk
+        new = []
+        numbered = numbered_matches(self.text, self.options, final=final) if self.mode != "structured" else []
+        if self.mode == "chars" and numbered:
+            # 回答帶有題號：改依題號對齊，先前依位置讀到的答案作廢
+            self.mode = "numbered"
+            self.answers = [None] * self.num_questions
+            self.answered_at = {}
+            self._answer_positions = []
+            self._scan_from = 0
+
+        if self.mode == "chars":
+            for pos in range(self._scan_from, len(self.text)):
+                if self.text[pos] in self.options:
+                    self._positional += 1
+                    if self._positional > self.num_questions:
+                        # 行首可能是題號（「1. 2」），等收到更多行再決定是否改依題號對齊
+                        if not self._line_number.search(self.text):
+                            self.malformed = f"答案數量超過 {self.num_questions} 題"
+                        break
+                    new.append(self._answer(self._positional, self.text[pos], pos, elapsed))
+            self._scan_from = len(self.text)
+        else:
+            if self.mode == "structured":
+                matches = [
+                    (int(m.group(1)), m.group(2), m.start(2))
+                    for m in self._structured.finditer(self.text, self._scan_from)
+                ]
+            else:
+                # 行首題號要等整行收完才能判斷，每次重新檢查整段回答，只處理還沒處理過的位置
+                matches = [match for match in numbered if match[2] >= self._scan_from]
+            for number, answer, pos in matches:
+                self._scan_from = pos + len(answer)
+                if not 1 <= number <= self.num_questions:
+                    self.malformed = f"題號 {number} 超出範圍"
+                    break
+                if self.answers[number - 1] not in (None, answer):
+                    self.malformed = f"第 {number} 題答案矛盾"
+                    break
+                if self.answers[number - 1] is None:
+                    new.append(self._answer(number, answer, pos, elapsed))
+
+        for match in self._confidence.finditer(self.text, self._confidence_from):
+            self._confidence_from = match.end()
+            # 信心分數屬於它前面最近的一題
+            idx = bisect.bisect_left(self._answer_positions, (match.start(),)) - 1
+            if idx >= 0:
+                self.confidence.setdefault(self._answer_positions[idx][1], int(match.group(1)))
+
+        if not self.answered_at and len(self.text) > self.max_preamble and self.malformed is None:
+            self.malformed = f"前 {self.max_preamble} 字沒有任何答案"
+        return new
+
+    def _answer(self, number, answer, pos, elapsed):
+        self.answers[number - 1] = answer
+        self.answered_at[number] = elapsed
+        self._answer_positions.append((pos, number))
+        return number
+
+    def timing(self, total):
+        """串流計時：第一個答案的時間、各題答案出現的時間（缺答為 None）與整段回答的時間
+
+        回答中有「信心水準：N分」時，另外記錄對齊到各題的信心水準（沒有的題目為 None）。
+        """
+        timing = {
+            "first_answer": round(min(self.answered_at.values()), 3) if self.answered_at else None,
+            "answered_at": [
+                round(self.answered_at[number], 3) if number in self.answered_at else None
+                for number in range(1, self.num_questions + 1)
+            ],
+            "total": round(total, 3),
+        }
+        if self.confidence:
+            timing["confidence"] = [self.confidence.get(number) for number in range(1, self.num_questions + 1)]
+        return timing
+
+
+# 解析器：名稱 → 函式(answer_text, options, num_questions) → (對齊題號的答案 list, 額外 metadata)
+PARSERS = {
+    "chars": parse_chars,
+    "numbered": parse_numbered,
+    "structured": parse_structured,
+}
+
+
+def get_scale(name):
+    if name not in SCALES:
+        raise ValueError(f"未知的作答量表: {name}（可用: {', '.join(SCALES)}）")
+    return SCALES[name]
+
+
+def get_parser(name):
+    if name not in PARSERS:
+        raise ValueError(f"未知的答案解析器: {name}（可用: {', '.join(PARSERS)}）")
+    return PARSERS[name]
@@ -0,0 +1,80 @@
+# api_clients.py
+# 整個 process 共用的 API client：同一個 httpx 連線池（keep-alive、HTTP/2）給所有回合與條件使用
+import asyncio
+import importlib.util
+import os
+
+# 閒置連線保留的秒數（條件之間、回合之間不必重新建立 TLS 連線）
+KEEPALIVE_EXPIRY = 120
+
+# 連線池大小的下限（一般腳本、批次輪詢等沒有登記並行數的用途）
+MIN_POOL_SIZE = 8
+
+# 各 provider 登記的並行數（{provider 名稱: 同時進行中的請求數}），連線池大小為其總和
+_pool_sizes = {}
+_openai_client = None
+# AsyncOpenAI 的連線綁定在建立它的 event loop 上，每個 event loop 各一個
+_openai_async_clients = {}
+_gemini_configured = None
+
+
+def http2_available():
+    """HTTP/2 需要 h2 套件（pip install httpx[http2]）；沒有安裝時使用 HTTP/1.1 keep-alive"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def reserve(name, concurrency):
+    """登記一個 provider 的並行數；之後建立的連線池會保留足夠所有 provider 同時使用的連線"""
+    _pool_sizes[name] = concurrency
+
+
+def pool_limits():
+    import httpx
+
+    size = max(MIN_POOL_SIZE, sum(_pool_sizes.values()))
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=KEEPALIVE_EXPIRY)
+
+
+def openai_client():
+    """同步 OpenAI client（批次模式、舊腳本）"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI, DefaultHttpxClient
+
+        http_client = DefaultHttpxClient(http2=http2_available(), limits=pool_limits())
+        _openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+    return _openai_client
+
+
+def openai_async_client():
+    """目前 event loop 共用的 AsyncOpenAI；所有 OpenAI provider（不同模型）的請求走同一個連線池"""
+    loop = asyncio.get_running_loop()
+    client = _openai_async_clients.get(loop)
+    if client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        # 丟掉已結束的 event loop 留下的 client（它的連線已無法使用）
+        for old_loop in [l for l in _openai_async_clients if l.is_closed()]:
+            del _openai_async_clients[old_loop]
+        http_client = DefaultAsyncHttpxClient(http2=http2_available(), limits=pool_limits())
+        # 重試由 retry_policy 負責，關掉 SDK 內建的重試以免重複
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+        _openai_async_clients[loop] = client
+    return client
+
+
+def configure_gemini(base_url=None):
+    """genai.configure 只做一次：重複呼叫會重建 client，之前的連線（gRPC channel）就不再共用
+
+    base_url 不為 None 時（本機 fake_llm_server.py）改用 REST transport。
+    """
+    global _gemini_configured
+    if _gemini_configured == (base_url,):
+        return
+    import google.generativeai as genai
+
+    if base_url:
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), transport="rest", client_options={"api_endpoint": base_url})
+    else:
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    _gemini_configured = (base_url,)
@@ -1,17 +1,9 @@
 import json
-from openai import OpenAI
-import os
-
-# 讀取 PPV 初始內容
-with open("ppv_initial.json", "r", encoding="utf-8") as f:
-    ppv = json.load(f)
+from api_clients import openai_client
 
 # 讀取你的題目
 from questions_list import QUESTIONS
 
-# 使用環境變數的 API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def ask_gpt(ppv, questions):
     """向 GPT 詢問一次完整 10 題，回傳答案 list"""
 
@@ -23,7 +15,7 @@ def ask_gpt(ppv, questions):
         f"以下是 PPV：\n{json.dumps(ppv, ensure_ascii=False)}"
     )
 
-    response = client.chat.completions.create(
+    response = openai_client().chat.completions.create(
         model="gpt-5.1",
         messages=[
             {"role": "system", "content": "你是模擬使用者，需依照 PPV 風格回答選項題。"},
@@ -43,19 +35,28 @@ def ask_gpt(ppv, questions):
 # 🔁 執行 10 次
 # ----------------------------
 
-all_results = []   # 用來回收 10 輪結果
+def main():
+    # 讀取 PPV 初始內容（執行時才讀取，import 這個模組不做任何事）
+    with open("ppv_initial.json", "r", encoding="utf-8") as f:
+        ppv = json.load(f)
+
+    all_results = []   # 用來回收 10 輪結果
+
+    for i in range(1, 11):
+        print(f"\n=== Loop {i} ===")
+
+        ans = ask_gpt(ppv, QUESTIONS)
+        print("回答：", ans)
 
-for i in range(1, 11):
-    print(f"\n=== Loop {i} ===")
+        all_results.append(ans)
 
-    ans = ask_gpt(ppv, QUESTIONS)
-    print("回答：", ans)
+    print("\n========================")
+    print("🎯 十回合的全部回答如下：")
+    print("========================\n")
 
-    all_results.append(ans)
+    for i, res in enumerate(all_results, 1):
+        print(f"第 {i} 回：{res}")
 
-print("\n========================")
-print("🎯 十回合的全部回答如下：")
-print("========================\n")
 
-for i, res in enumerate(all_results, 1):
-    print(f"第 {i} 回：{res}")
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 # ask_gpt5_no_ppv_with_reasons.py
-from openai import OpenAI
+from api_clients import openai_client
 from questions_list import questions_list
-import os
 from collections import Counter
 
 # 系統提示，不帶 PPV
@@ -15,9 +14,6 @@ PERSONA_PROMPT = """
 - 答案應保持一致性，但允許少量波動。
 """
 
-# 建立 OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def ask_question_2_with_reason():
     """針對第二題詢問答案並要求解釋原因"""
     # 第二題是 index 1
@@ -29,7 +25,8 @@ def ask_question_2_with_reason():
         {"role": "user", "content": f"{q_text}\n\n請先回答選項字母（A~E），然後用 1-2 句話簡明扼要地說明選擇這個答案的理由。"}
     ]
 
-    response = client.chat.completions.create(
+    # OpenAI client 在第一次請求時才建立（與其他腳本共用同一組連線池設定）
+    response = openai_client().chat.completions.create(
         model="gpt-5.1-2025-11-13",
         messages=messages
     )
@@ -1,17 +1,13 @@
 # ask_gpt5_with_reasons.py
-import json
-from openai import OpenAI
+from api_clients import openai_client
 from questions_list import questions_list
-import os
+from persona_prompt import compile_persona_prompt, openai_cache_params
 from collections import Counter
 
-# 載入 PPV
-with open("ppv_initial.json", "r", encoding="utf-8") as f:
-    ppv_data = json.load(f)
-
-PERSONA_PROMPT = f"""
+# 人格 prompt 模板（PPV 在 main 中載入並編譯）
+PERSONA_TEMPLATE = """
 你是一個具有固定價值觀與決策習慣的角色，請依以下原則回答問題：
-【PPV】{json.dumps(ppv_data, ensure_ascii=False)}
+【PPV】{ppv}
 【決策優先順序】
 1. 穩定性
 2. 可控制度
@@ -25,23 +21,23 @@ PERSONA_PROMPT = f"""
 - 答案要保持傾向一致性，但允許少量波動。
 """
 
-# 建立 OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-def ask_question_2_with_reason():
+def ask_question_2_with_reason(persona):
     """針對第二題詢問答案並要求解釋原因"""
     # 第二題是 index 1
     question = questions_list[1]
     q_text = f"第 2 題: {question['q']}\n選項: {', '.join(question['options'])}"
 
     messages = [
-        {"role": "system", "content": PERSONA_PROMPT},
+        {"role": "system", "content": persona.text},
         {"role": "user", "content": f"{q_text}\n\n請先回答選項字母（A~E），然後用 1-2 句話簡明扼要地說明是基於 PPV 中的哪些具體維度做出選擇（例如：Big5、DISC、risk_profile、Schwartz Values 等）。"}
     ]
 
-    response = client.chat.completions.create(
+    # OpenAI client 在第一次請求時才建立（與其他腳本共用同一組連線池設定）
+    response = openai_client().chat.completions.create(
         model="gpt-5.1-2025-11-13",
-        messages=messages
+        messages=messages,
+        **openai_cache_params(persona)
     )
 
     answer_text = response.choices[0].message.content.strip()
@@ -62,10 +58,12 @@ def main():
     question = questions_list[1]
     print(f"題目: {question['q']}\n")
 
+    # 載入 PPV 並編譯成精簡、位元組穩定的 system prompt（編譯結果有磁碟快取）
+    persona = compile_persona_prompt(PERSONA_TEMPLATE, "ppv_initial.json")
     all_answers = []
 
     for i in range(1, 11):
-        answer, reason = ask_question_2_with_reason()
+        answer, reason = ask_question_2_with_reason(persona)
         all_answers.append(answer)
 
         print(f"第 {i} 次 - 答案: {answer}")
@@ -0,0 +1,212 @@
+# batch_runner.py
+import json
+import os
+import time
+from datetime import datetime
+
+# 批次輸入 JSONL 的存放目錄
+BATCH_DIR = "batch_inputs"
+
+# 輪詢批次狀態的間隔秒數
+DEFAULT_POLL_INTERVAL = 30
+
+OPENAI_FINISHED_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def custom_id(round_idx):
+    return f"round-{round_idx + 1:05d}"
+
+
+def round_index(custom_id_value):
+    return int(custom_id_value.split("-")[-1]) - 1
+
+
+def batch_input_path(name):
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(BATCH_DIR, f"{name}_{timestamp}.jsonl")
+
+
+# ------------------------- 提交紀錄（續跑） -------------------------
+# 提交後立即把批次 id 與對應的回合寫在結果紀錄檔旁（runs/NAME_TIMESTAMP.batch.json），
+# 輪詢中斷後以 --resume 續跑時繼續等同一個批次，不會重新提交（重複付費）；結果寫入紀錄檔後刪除
+
+def batch_state_path(log_path):
+    return os.path.splitext(log_path)[0] + ".batch.json"
+
+
+def load_batch_state(path):
+    """讀取尚未處理完的批次 {"batch_id", "rounds"}；沒有時回傳 None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_batch_state(path, batch_id, rounds):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"batch_id": batch_id, "rounds": list(rounds)}, f)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------- OpenAI ----------------------------
+
+def write_openai_batch_file(path, rounds, model, messages, extra_body=None):
+    """把所有回合寫成 OpenAI Batch API 的 JSONL（每回合一行，內容相同）"""
+    body = {"model": model, "messages": messages}
+    if extra_body:
+        body.update(extra_body)
+    with open(path, "w", encoding="utf-8") as f:
+        for round_idx in range(rounds):
+            line = {
+                "custom_id": custom_id(round_idx),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+
+def submit_openai_batch(client, path):
+    """上傳 JSONL 並建立批次，回傳 batch id"""
+    with open(path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    return batch.id
+
+
+def wait_for_openai_batch(client, batch_id, poll_interval=DEFAULT_POLL_INTERVAL):
+    """輪詢直到批次結束"""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"批次 {batch_id}: {batch.status}（完成 {counts.completed}/{counts.total}，失敗 {counts.failed}）")
+        else:
+            print(f"批次 {batch_id}: {batch.status}")
+        if batch.status in OPENAI_FINISHED_STATES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def read_openai_batch_results(client, batch, rounds):
+    """下載批次結果，依回合順序回傳每回合的回答文字（失敗的回合為 None）"""
+    answer_texts = [None] * rounds
+    if not batch.output_file_id:
+        return answer_texts
+
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            print(f"警告：{record['custom_id']} 失敗: {record.get('error')}")
+            continue
+        message = response["body"]["choices"][0]["message"]
+        answer_texts[round_index(record["custom_id"])] = (message.get("content") or "").strip()
+    return answer_texts
+
+
+def run_openai_batch(client, model, messages, rounds, extra_body=None, name="gpt", poll_interval=DEFAULT_POLL_INTERVAL,
+                     batch_id=None, on_submit=None):
+    """寫入 JSONL → 提交 → 輪詢 → 讀回結果
+
+    batch_id 不為 None 時不再提交，直接繼續輪詢這個既有的批次；on_submit(batch_id) 在提交後立即呼叫。
+    """
+    if batch_id is None:
+        path = write_openai_batch_file(batch_input_path(name), rounds, model, messages, extra_body)
+        print(f"批次輸入已寫入: {path}")
+        batch_id = submit_openai_batch(client, path)
+        print(f"已提交批次: {batch_id}")
+        if on_submit is not None:
+            on_submit(batch_id)
+    else:
+        print(f"繼續等待先前提交的批次: {batch_id}")
+    batch = wait_for_openai_batch(client, batch_id, poll_interval)
+    return read_openai_batch_results(client, batch, rounds)
+
+
+# ---------------------------- Gemini ----------------------------
+
+def make_gemini_batch_client():
+    """Gemini Batch API 需要新版 google-genai SDK（pip install google-genai）"""
+    from google import genai as genai_sdk
+
+    http_options = None
+    base_url = os.getenv("GEMINI_BASE_URL")
+    if base_url:
+        # 測試時指向本機的 fake_llm_server.py
+        http_options = {"base_url": base_url}
+    return genai_sdk.Client(api_key=os.getenv("GOOGLE_API_KEY"), http_options=http_options)
+
+
+def build_gemini_batch_requests(rounds, system_instruction, user_text, generation_config=None, safety_settings=None):
+    """每回合一筆 inline request，以 metadata.key 對應回合"""
+    config = dict(generation_config or {})
+    config["system_instruction"] = system_instruction
+    if safety_settings:
+        config["safety_settings"] = safety_settings
+    return [
+        {
+            "contents": [{"role": "user", "parts": [{"text": user_text}]}],
+            "config": config,
+            "metadata": {"key": custom_id(round_idx)},
+        }
+        for round_idx in range(rounds)
+    ]
+
+
+def wait_for_gemini_batch(client, job_name, poll_interval=DEFAULT_POLL_INTERVAL):
+    while True:
+        job = client.batches.get(name=job_name)
+        state = getattr(job.state, "name", str(job.state))
+        print(f"批次 {job_name}: {state}")
+        if state.endswith(("SUCCEEDED", "FAILED", "CANCELLED", "EXPIRED")):
+            return job
+        time.sleep(poll_interval)
+
+
+def read_gemini_batch_results(job, rounds):
+    answer_texts = [None] * rounds
+    inlined = getattr(job.dest, "inlined_responses", None) if job.dest else None
+    for position, item in enumerate(inlined or []):
+        metadata = getattr(item, "metadata", None) or {}
+        round_idx = round_index(metadata["key"]) if "key" in metadata else position
+        if item.error or not item.response or not item.response.candidates:
+            print(f"警告：{custom_id(round_idx)} 失敗: {item.error}")
+            continue
+        answer_texts[round_idx] = (item.response.text or "").strip()
+    return answer_texts
+
+
+def run_gemini_batch(model, system_instruction, user_text, rounds, generation_config=None,
+                     safety_settings=None, name="gemini", poll_interval=DEFAULT_POLL_INTERVAL, batch_id=None, on_submit=None):
+    """以 Gemini Batch API 執行所有回合，依回合順序回傳回答文字；batch_id / on_submit 同 run_openai_batch"""
+    client = make_gemini_batch_client()
+    if batch_id is None:
+        requests = build_gemini_batch_requests(rounds, system_instruction, user_text, generation_config, safety_settings)
+
+        # 同時把請求寫成 JSONL 留存，方便對照
+        path = batch_input_path(name)
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        print(f"批次輸入已寫入: {path}")
+
+        job = client.batches.create(model=model, src=requests, config={"display_name": os.path.basename(path)})
+        batch_id = job.name
+        print(f"已提交批次: {batch_id}")
+        if on_submit is not None:
+            on_submit(batch_id)
+    else:
+        print(f"繼續等待先前提交的批次: {batch_id}")
+    job = wait_for_gemini_batch(client, batch_id, poll_interval)
+    return read_gemini_batch_results(job, rounds)
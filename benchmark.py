@@ -0,0 +1,208 @@
+# benchmark.py
+# 在本機 fake server 上測量執行器本身的吞吐量：回合迴圈、答案解析、穩定度計算與匯出
+# 不需網路、不花 API 費用；同樣的 seed 與設定可重現同樣的結果
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# 預設的回合數級距
+SIZES = (10, 1_000, 100_000)
+
+# 測量項目：rounds = 透過 HTTP 的回合迴圈（含解析）、parse = 只解析回答、
+# stability = compute_stability、export = 寫入 Parquet 結果庫並匯出 Excel、
+# startup = 指令的啟動時間（與回合數無關，只測一次）
+SUITES = ("rounds", "parse", "stability", "export", "startup")
+
+# 啟動時間測量的指令（每次都在新的 process 中執行）；process pool 的 worker 只需要 import
+STARTUP_COMMANDS = {
+    "import experiment_runner": ["-c", "import experiment_runner"],
+    "import results_store": ["-c", "import results_store"],
+    "experiment_runner.py --list": ["experiment_runner.py", "--list"],
+    "list_gemini_models（import）": ["-c", "import list_gemini_models"],
+}
+
+# 各啟動指令重複執行的次數（取中位數）
+STARTUP_REPEAT = 5
+
+# benchmark 用的條件（無 PPV、1~3 量表，不補問）
+BENCH_TEMPLATE = "final"
+BENCH_SCALE = "agree3"
+
+
+def make_experiment(concurrency, rpm):
+    """指向 fake server 的 OpenAI 條件；rate limiter 換成 benchmark 指定的 RPM"""
+    from experiment_runner import Experiment
+    from providers import make_provider
+    from rate_limiter import RateLimiter
+
+    provider = make_provider("fake", {
+        "type": "openai", "model": "fake-model", "concurrency": concurrency,
+        "retry": {"max_attempts": 5, "base_delay": 0.05, "max_delay": 1.0}, "rpm": rpm,
+    })
+    # 每次測量用新的 limiter，上一次測量的 429 降速不會帶到下一次
+    provider.rate_limiter = RateLimiter(rpm)
+    return Experiment("benchmark", provider, BENCH_TEMPLATE, scale=BENCH_SCALE, repair_attempts=0)
+
+
+def fake_rounds(state, experiment, size):
+    """直接由 fake server 的答案產生器產生 size 個回答文字（不經過 HTTP）"""
+    prompt_text = "\n".join(experiment.question_texts)
+    return [state.fake_answer(prompt_text, state.request_rng()) for _ in range(size)]
+
+
+def bench_rounds(experiment, size):
+    from response_cache import ResponseCache
+    from round_runner import run_rounds_async
+
+    cache = ResponseCache(mode="off")
+
+    async def ask(round_idx):
+        return await experiment.ask_round(round_idx, cache)
+
+    records = asyncio.run(run_rounds_async(ask, size, concurrency=experiment.provider.concurrency))
+    failed = sum(1 for record in records if not record["answers"])
+    return {"failed_rounds": failed, "retries": sum(1 for call in experiment.telemetry.calls if call["attempt"] > 0)}
+
+
+def bench_parse(experiment, texts):
+    for text in texts:
+        experiment.parse_answers(text)
+
+
+def bench_stability(experiment, all_rounds):
+    import stability
+
+    stability.compute_stability(all_rounds, experiment.options, len(experiment.questions))
+
+
+def bench_export(experiment, all_rounds, size):
+    import results_store
+    import stability
+
+    run_id = f"benchmark_{size}_{datetime.now():%Y%m%d_%H%M%S}"
+    stability_results = stability.compute_stability(all_rounds, experiment.options, len(experiment.questions))
+    results_store.save_run(
+        run_id, experiment.provider.model, "none", BENCH_TEMPLATE, experiment.persona.sha256,
+        all_rounds, experiment.options, len(experiment.questions), stability_results
+    )
+    results_store.export_excel(run_id, f"{run_id}.xlsx")
+
+
+def bench_startup(repeat=STARTUP_REPEAT):
+    """每個指令在新的 process 中執行 repeat 次，回傳 {指令: 秒數中位數}（含 Python 本身的啟動時間）"""
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, args in STARTUP_COMMANDS.items():
+        seconds = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=project_dir, check=True, stdout=subprocess.DEVNULL)
+            seconds.append(time.perf_counter() - started)
+        results[name] = statistics.median(seconds)
+    return results
+
+
+def timed(fn, *args):
+    """執行並回傳 (秒數, fn 的回傳值)；執行期間的輸出丟棄，避免印出的內容影響測量"""
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def run_benchmarks(state, base_url, sizes, suites, concurrency, rpm):
+    """在暫存目錄中執行各項測量（紀錄檔、結果庫與 Excel 不會寫進專案目錄），回傳結果 list"""
+    results = []
+    if "startup" in suites:
+        for command, seconds in bench_startup().items():
+            result = {"suite": "startup", "command": command, "seconds": seconds}
+            results.append(result)
+            print(format_result(result))
+        suites = [suite for suite in suites if suite != "startup"]
+        if not suites:
+            return results
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    workdir = tempfile.mkdtemp(prefix="ppv_benchmark_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for size in sizes:
+            experiment = make_experiment(concurrency, rpm)
+            texts = fake_rounds(state, experiment, size)
+            all_rounds = [experiment.parse_answers(text)[0] for text in texts]
+            for suite in suites:
+                extra = None
+                if suite == "rounds":
+                    seconds, extra = timed(bench_rounds, experiment, size)
+                elif suite == "parse":
+                    seconds, _ = timed(bench_parse, experiment, texts)
+                elif suite == "stability":
+                    seconds, _ = timed(bench_stability, experiment, all_rounds)
+                else:
+                    seconds, _ = timed(bench_export, experiment, all_rounds, size)
+                result = {"suite": suite, "rounds": size, "seconds": seconds, "rounds_per_second": size / seconds if seconds else None}
+                if extra:
+                    result.update(extra)
+                results.append(result)
+                print(format_result(result))
+    finally:
+        os.chdir(cwd)
+    print(f"暫存輸出: {workdir}")
+    return results
+
+
+def format_result(result):
+    if result["suite"] == "startup":
+        return f"{'startup':<10} {result['command']:<30} {result['seconds']:>9.3f} 秒"
+    line = f"{result['suite']:<10} {result['rounds']:>8,} 回合  {result['seconds']:>9.3f} 秒  {result['rounds_per_second']:>12,.0f} 回合/秒"
+    if "failed_rounds" in result:
+        line += f"  （重試 {result['retries']}、失敗回合 {result['failed_rounds']}）"
+    return line
+
+
+def main(argv=None):
+    from fake_llm_server import add_profile_arguments, state_from_args, start_in_thread
+
+    parser = argparse.ArgumentParser(description="在本機 fake server 上測量執行器的吞吐量")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="回合數級距")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES), help="要測量的項目")
+    parser.add_argument("--concurrency", type=int, default=32, help="回合迴圈同時進行中的請求數")
+    parser.add_argument("--client-rpm", type=int, default=10_000_000, help="執行器端 rate limiter 的 RPM（預設等於不限；--rpm 是 fake server 端的上限）")
+    parser.add_argument("--server", default=None, help="使用已在執行的 fake server（例如 http://127.0.0.1:8765），預設在背景執行緒啟動一個")
+    parser.add_argument("--output", default=None, help="把結果附加到這個 JSON Lines 檔案，方便比較不同版本")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # 產生測試回答用的 state；沒有指定 --server 時也由它服務 HTTP 請求
+    state = state_from_args(args)
+    base_url = None
+    if args.server:
+        base_url = args.server.rstrip("/") + "/v1"
+    elif set(args.suites) != {"startup"}:
+        server = start_in_thread(state=state)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    if base_url:
+        print(f"fake server: {base_url}｜延遲 {args.latency}｜錯誤率 {args.error_rate}｜429 機率 {args.rate_limit_rate}｜答案分布 {args.profile}")
+    results = run_benchmarks(state, base_url, args.sizes, args.suites, args.concurrency, args.client_rpm)
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ("output", "sizes", "suites")}
+        with open(args.output, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps({"time": datetime.now().isoformat(timespec="seconds"), **settings, **result}, ensure_ascii=False) + "\n")
+        print(f"✅ 結果已附加到 {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
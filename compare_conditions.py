@@ -0,0 +1,284 @@
+# compare_conditions.py
+# 比較兩個條件（例如有 PPV vs 無 PPV）的每題穩定度：bootstrap 信賴區間、permutation test，
+# 並估計要多少回合才能把差異量到指定的精確度
+import argparse
+import math
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import stability
+
+# 預設的 bootstrap / permutation 次數
+DEFAULT_RESAMPLES = 10_000
+
+# 每個 worker 一次處理的重抽次數（控制記憶體：次數 × 回合數的權重矩陣）
+CHUNK_SIZE = 1_000
+
+
+def onehot(matrix, num_options):
+    """答案矩陣（回合 × 題目）轉成 (回合 × 題目·選項) 的 0/1 矩陣；缺答整列為 0"""
+    num_rounds, num_questions = matrix.shape
+    hot = np.zeros((num_rounds, num_questions * num_options), dtype=np.float32)
+    rows, cols = np.nonzero(matrix >= 0)
+    hot[rows, cols * num_options + matrix[rows, cols]] = 1
+    return hot
+
+
+def consistency_from_counts(counts, num_questions, num_options):
+    """(次數 × 題目·選項) 的選項次數 → 每次的每題穩定度（眾數比例），shape = (次數 × 題目)"""
+    counts = counts.reshape(-1, num_questions, num_options).astype(np.float64)
+    totals = counts.sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, counts.max(axis=2) / totals, np.nan)
+
+
+def bootstrap_chunk(matrix, num_options, resamples, seed):
+    """以多項分布權重一次做 resamples 次回合重抽（權重矩陣 × one-hot），回傳每次的每題穩定度"""
+    rng = np.random.default_rng(seed)
+    num_rounds, num_questions = matrix.shape
+    weights = rng.multinomial(num_rounds, np.full(num_rounds, 1 / num_rounds), size=resamples).astype(np.float32)
+    return consistency_from_counts(weights @ onehot(matrix, num_options), num_questions, num_options)
+
+
+def permutation_chunk(matrix_a, matrix_b, num_options, permutations, seed):
+    """把兩組回合混在一起隨機重新分組 permutations 次，回傳每次的每題穩定度差（A − B）"""
+    rng = np.random.default_rng(seed)
+    pooled = np.vstack([matrix_a, matrix_b])
+    num_a = len(matrix_a)
+    num_questions = pooled.shape[1]
+    # 每一列是一次重新分組：隨機排序後前 num_a 個回合歸 A
+    order = rng.random((permutations, len(pooled))).argsort(axis=1)
+    in_a = np.zeros((permutations, len(pooled)), dtype=np.float32)
+    np.put_along_axis(in_a, order[:, :num_a], 1, axis=1)
+
+    hot = onehot(pooled, num_options)
+    counts_a = in_a @ hot
+    counts_b = hot.sum(axis=0) - counts_a
+    return (
+        consistency_from_counts(counts_a, num_questions, num_options)
+        - consistency_from_counts(counts_b, num_questions, num_options)
+    )
+
+
+def run_chunks(fn, total, args, seed, workers=None):
+    """把 total 次重抽切成 CHUNK_SIZE 一塊，分給 process pool（workers=1 時在本 process 執行）後接回
+
+    每塊的亂數種子由 seed 衍生，結果與 worker 數量無關。
+    """
+    sizes = [min(CHUNK_SIZE, total - start) for start in range(0, total, CHUNK_SIZE)]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(sizes))
+    tasks = [(*args, size, child) for size, child in zip(sizes, seeds)]
+    if workers == 1 or len(tasks) == 1:
+        results = [fn(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fn, *zip(*tasks)))
+    return np.concatenate(results)
+
+
+def trait_means(values, blocks=None):
+    """(次數 × 題目) → (次數 × 特質)：各 Big Five 特質題目的平均"""
+    num_questions = values.shape[1]
+    if blocks is None:
+        blocks = stability.trait_blocks()
+    blocks = [(trait, indices[indices < num_questions]) for trait, indices in blocks]
+    blocks = [(trait, indices) for trait, indices in blocks if indices.size]
+    # 某特質的題目都沒有有效答案時為 NaN（不顯示 Mean of empty slice 警告）
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        means = np.stack([np.nanmean(values[:, indices], axis=1) for _, indices in blocks], axis=1)
+    return [trait for trait, _ in blocks], means
+
+
+def benjamini_hochberg(p_values):
+    """Benjamini–Hochberg 調整後的 q 值（控制多題同時檢定的偽發現率）；NaN 保持 NaN"""
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full_like(p_values, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if valid.size:
+        order = valid[np.argsort(p_values[valid])]
+        ranked = p_values[order] * valid.size / np.arange(1, valid.size + 1)
+        q_values[order] = np.minimum.accumulate(ranked[::-1])[::-1].clip(max=1.0)
+    return q_values
+
+
+def rounds_needed(half_width, target, rounds_a, rounds_b):
+    """差異的信賴區間半寬縮到 target 時，兩個條件各需要的回合數（半寬與 √(1/Ra + 1/Rb) 成正比）"""
+    if not np.isfinite(half_width) or not target or target <= 0:
+        return None
+    return math.ceil(2 * (half_width / target) ** 2 / (1 / rounds_a + 1 / rounds_b))
+
+
+def summarize(observed_a, observed_b, boot_a, boot_b, perm, rounds_a, rounds_b, ci, margin):
+    """每一列（題目或特質）的穩定度、差異的 bootstrap 信賴區間、permutation p 值與所需回合數"""
+    tail = (1 - ci) / 2 * 100
+    diff = observed_a - observed_b
+    boot_diff = boot_a - boot_b
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low, high = np.nanpercentile(boot_diff, [tail, 100 - tail], axis=0)
+        a_low, a_high = np.nanpercentile(boot_a, [tail, 100 - tail], axis=0)
+        b_low, b_high = np.nanpercentile(boot_b, [tail, 100 - tail], axis=0)
+    # 雙尾 p 值：重新分組後的差異至少和觀察到的一樣極端的比例（加 1 避免 p = 0）
+    with np.errstate(invalid="ignore"):
+        extreme = (np.abs(perm) >= np.abs(diff) - 1e-12).sum(axis=0)
+    p_values = np.where(np.isnan(diff), np.nan, (extreme + 1) / (len(perm) + 1))
+
+    rows = []
+    for idx in range(len(diff)):
+        half_width = (high[idx] - low[idx]) / 2
+        rows.append({
+            "a": float(observed_a[idx]),
+            "a_ci": (float(a_low[idx]), float(a_high[idx])),
+            "b": float(observed_b[idx]),
+            "b_ci": (float(b_low[idx]), float(b_high[idx])),
+            "diff": float(diff[idx]),
+            "diff_ci": (float(low[idx]), float(high[idx])),
+            "p_value": float(p_values[idx]),
+            "rounds_for_margin": rounds_needed(half_width, margin, rounds_a, rounds_b),
+            # 觀察到的差異要讓信賴區間不跨過 0 所需的回合數
+            "rounds_to_detect": rounds_needed(half_width, abs(diff[idx]), rounds_a, rounds_b) if diff[idx] else None,
+        })
+    return rows
+
+
+def compare_stability(matrix_a, matrix_b, num_options, resamples=DEFAULT_RESAMPLES, permutations=DEFAULT_RESAMPLES,
+                      ci=0.95, margin=0.05, seed=0, workers=None):
+    """比較兩組答案矩陣（回合 × 題目）的每題與每個特質的穩定度，回傳 {"questions": [...], "traits": [...]}
+
+    每列含 A / B 的穩定度與 bootstrap 信賴區間、差異（A − B）的信賴區間、permutation test 的 p 值
+    （題目另有 Benjamini–Hochberg 調整後的 q 值），以及差異量到 ±margin、或量到可區分觀察到的差異所需的回合數。
+    """
+    num_questions = min(matrix_a.shape[1], matrix_b.shape[1])
+    matrix_a, matrix_b = matrix_a[:, :num_questions], matrix_b[:, :num_questions]
+    observed_a = stability.stability_stats(matrix_a, num_options)["consistency"]
+    observed_b = stability.stability_stats(matrix_b, num_options)["consistency"]
+
+    seeds = np.random.SeedSequence(seed).spawn(3)
+    boot_a = run_chunks(bootstrap_chunk, resamples, (matrix_a, num_options), seeds[0], workers)
+    boot_b = run_chunks(bootstrap_chunk, resamples, (matrix_b, num_options), seeds[1], workers)
+    perm = run_chunks(permutation_chunk, permutations, (matrix_a, matrix_b, num_options), seeds[2], workers)
+
+    rounds_a, rounds_b = len(matrix_a), len(matrix_b)
+    questions = summarize(observed_a, observed_b, boot_a, boot_b, perm, rounds_a, rounds_b, ci, margin)
+    q_values = benjamini_hochberg([row["p_value"] for row in questions])
+    trait_of = {}
+    for trait, indices in stability.trait_blocks():
+        for q_idx in indices[indices < num_questions]:
+            trait_of[int(q_idx)] = trait
+    for q_idx, row in enumerate(questions):
+        row.update(question=q_idx + 1, trait=trait_of.get(q_idx), q_value=float(q_values[q_idx]))
+
+    # 特質層級：每次重抽 / 重新分組都先取該特質各題的平均，再算信賴區間與 p 值
+    traits, trait_a = trait_means(observed_a[None, :])
+    _, trait_b = trait_means(observed_b[None, :])
+    _, boot_trait_a = trait_means(boot_a)
+    _, boot_trait_b = trait_means(boot_b)
+    # 重新分組後的特質差異 = 兩組各題穩定度差的特質平均
+    _, perm_trait = trait_means(perm)
+    trait_rows = summarize(trait_a[0], trait_b[0], boot_trait_a, boot_trait_b, perm_trait, rounds_a, rounds_b, ci, margin)
+    for trait, row in zip(traits, trait_rows):
+        row["trait"] = trait
+
+    return {"questions": questions, "traits": trait_rows, "rounds": (rounds_a, rounds_b), "resamples": resamples,
+            "permutations": permutations, "ci": ci, "margin": margin}
+
+
+def to_dataframes(result, label_a, label_b):
+    """把 compare_stability 的結果轉成（每題, 每特質）兩個 DataFrame（中文欄位，供 Excel 輸出）"""
+    import pandas as pd
+
+    pct = f"{result['ci']:.0%}"
+
+    def frame(rows, key_columns):
+        data = {}
+        for name, key in key_columns:
+            data[name] = [row[key] for row in rows]
+        for label, key in ((label_a, "a"), (label_b, "b")):
+            data[f"{label} 穩定度"] = [row[key] for row in rows]
+            data[f"{label} {pct} 下界"] = [row[f"{key}_ci"][0] for row in rows]
+            data[f"{label} {pct} 上界"] = [row[f"{key}_ci"][1] for row in rows]
+        data["差異"] = [row["diff"] for row in rows]
+        data[f"差異 {pct} 下界"] = [row["diff_ci"][0] for row in rows]
+        data[f"差異 {pct} 上界"] = [row["diff_ci"][1] for row in rows]
+        data["p 值"] = [row["p_value"] for row in rows]
+        if rows and "q_value" in rows[0]:
+            data["q 值(BH)"] = [row["q_value"] for row in rows]
+        data[f"±{result['margin']} 所需回合"] = [row["rounds_for_margin"] for row in rows]
+        data["可區分差異所需回合"] = [row["rounds_to_detect"] for row in rows]
+        return pd.DataFrame(data)
+
+    return (
+        frame(result["questions"], [("題號", "question"), ("特質", "trait")]),
+        frame(result["traits"], [("特質", "trait")]),
+    )
+
+
+def format_result(result, label_a, label_b, alpha=0.05):
+    """印出特質層級的比較與顯著題目的摘要"""
+    pct = f"{result['ci']:.0%}"
+    rounds_a, rounds_b = result["rounds"]
+    lines = [f"\n=== {label_a}（{rounds_a} 回合） vs {label_b}（{rounds_b} 回合） ===",
+             f"bootstrap {result['resamples']:,} 次、permutation {result['permutations']:,} 次；差異 = {label_a} − {label_b}"]
+    for row in result["traits"]:
+        low, high = row["diff_ci"]
+        lines.append(
+            f"{row['trait']}：{row['a']:.3f} vs {row['b']:.3f}｜差異 {row['diff']:+.3f}（{pct} CI {low:+.3f} ~ {high:+.3f}）｜"
+            f"p = {row['p_value']:.4f}"
+        )
+    significant = [row for row in result["questions"] if row["q_value"] < alpha]
+    lines.append(f"\nq < {alpha}（BH 調整）的題目：{len(significant)} / {len(result['questions'])} 題"
+                 + (f"（{', '.join(str(row['question']) for row in significant)}）" if significant else ""))
+    needed = [row["rounds_for_margin"] for row in result["questions"] if row["rounds_for_margin"] is not None]
+    if needed:
+        lines.append(f"每題差異量到 ±{result['margin']}：中位數需 {int(np.median(needed))} 回合、最多 {max(needed)} 回合（每個條件）")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    import results_store
+
+    parser = argparse.ArgumentParser(description="以 bootstrap 與 permutation test 比較兩個條件的每題穩定度")
+    parser.add_argument("a", help="條件名稱（取結果庫中最新一次執行）或 run_id，例如 gpt_ppv")
+    parser.add_argument("b", help="對照的條件名稱或 run_id，例如 gpt_no_ppv")
+    parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES, help="bootstrap 次數")
+    parser.add_argument("--permutations", type=int, default=DEFAULT_RESAMPLES, help="permutation test 次數")
+    parser.add_argument("--ci", type=float, default=0.95, help="信賴水準")
+    parser.add_argument("--alpha", type=float, default=0.05, help="顯著水準（題目以 BH 調整後的 q 值判斷）")
+    parser.add_argument("--margin", type=float, default=0.05, help="估計差異量到 ±margin 所需的回合數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="process pool 大小（預設為 CPU 核心數，1 = 不開 process）")
+    parser.add_argument("--output", default=None, help="另外把每題與每特質的比較寫入這個 Excel 檔")
+    args = parser.parse_args(argv)
+
+    matrices = []
+    for name in (args.a, args.b):
+        run_id = results_store.latest_run_id(name)
+        matrix = results_store.load_answer_matrix(run_id) if run_id else None
+        if matrix is None:
+            parser.error(f"結果庫中找不到 {name} 的執行結果")
+        print(f"{name}: run_id = {run_id}（{len(matrix)} 回合）")
+        matrices.append(matrix)
+
+    num_options = int(max(matrix.max() for matrix in matrices)) + 1
+    result = compare_stability(*matrices, num_options, args.resamples, args.permutations, args.ci, args.margin,
+                               args.seed, args.workers)
+    print(format_result(result, args.a, args.b, args.alpha))
+
+    if args.output:
+        import pandas as pd
+
+        df_questions, df_traits = to_dataframes(result, args.a, args.b)
+        with pd.ExcelWriter(args.output, engine="openpyxl") as writer:
+            df_traits.to_excel(writer, sheet_name="特質比較", index=False)
+            df_questions.to_excel(writer, sheet_name="每題比較", index=False)
+        print(f"✅ 比較結果已匯出: {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,932 @@
+# experiment_runner.py
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import secrets
+import time
+from datetime import datetime
+
+import numpy as np
+
+import stability
+import results_store
+from questions_list import questions_list, BIG5_TRAITS  # 你的題目 list
+from persona_prompt import compile_persona_prompt
+from prompt_templates import get_template, format_question, REPAIR_INSTRUCTION, STRUCTURED_INSTRUCTION, SUBSET_INSTRUCTION
+from answer_parsers import (
+    get_scale, get_parser, align_answers, align_structured, answer_schema, missing_questions, unaligned_count,
+    StreamingAnswerParser,
+)
+from answer_distributions import TOP_LOGPROBS, answer_distributions, combine_distributions
+from providers import make_provider
+from question_order import round_order, unpermute, canonical_numbers, position_matrix, order_effects
+from response_cache import ResponseCache, CacheMiss, CACHE_MODES
+from results_log import open_results_log
+from batch_runner import batch_state_path, load_batch_state, save_batch_state
+from retry_policy import call_with_retry, classify_error, BlockedResponse, MalformedOutput
+from round_runner import run_rounds_async
+from scheduler import run_matrix
+from telemetry import Telemetry, format_summary
+from trait_scores import TraitAccumulator, trait_report
+
+# 預設的實驗設定檔
+CONFIG_PATH = "experiments.json"
+
+# 設定檔 matrix 區段中可以列出多個值、展開成所有組合的欄位
+MATRIX_AXES = ("provider", "persona", "template")
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Experiment:
+    """實驗矩陣中的一個條件：provider × 人格（有 / 無 PPV）× prompt 版本 × 作答量表"""
+
+    def __init__(self, name, provider, template, persona=None, scale="agree3", parser=None,
+                 rounds=100, prompt_variant=None, excel_prefix=None, show_raw=False, repair_attempts=1,
+                 structured=False, questions=questions_list):
+        self.name = name
+        self.provider = provider
+        self.rounds = rounds
+        self.questions = questions
+        self.options = get_scale(scale)
+        # 結構化輸出模式：OpenAI strict JSON schema / Gemini response_schema，依 question_id 對齊答案
+        self.structured = structured
+        self.response_schema = answer_schema(self.options) if structured else None
+        parser = parser or ("structured" if structured else "chars")
+        self.parser = get_parser(parser)
+        # 串流模式的逐段解析方式（chars 遇到題號時會自動改用 numbered）
+        self.stream_mode = parser if parser in ("numbered", "structured") else "chars"
+        self.align = align_structured if structured else align_answers
+        self.show_raw = show_raw
+        # 回答缺題或答案矛盾時，最多補問幾次（0 = 不補問）
+        self.repair_attempts = repair_attempts
+        self.persona_name = persona_label(persona)
+        # PPV 檔案路徑：特質分數與其 big5 目標值比較（無 PPV 時為 None）
+        self.ppv_path = persona
+        self.prompt_variant = prompt_variant or template
+        self.excel_prefix = excel_prefix or f"{name}_results"
+
+        # 人格 prompt 編譯一次（有磁碟快取），請求內容在整個 run 中固定不變
+        self.persona = compile_persona_prompt(get_template(template, persona is not None), persona)
+        self.question_texts = [format_question(idx, q) for idx, q in enumerate(questions)]
+        self.request = provider.build_request(self.persona, self.question_texts + self.instructions())
+        self.request_hash = provider.request_hash(self.persona, self.request)
+        # 快取 key 的生成參數：provider 參數，結構化模式再加上 schema
+        self.cache_params = provider.cache_params()
+        if structured:
+            self.cache_params = {**self.cache_params, "response_schema": self.response_schema}
+
+        # 本次執行的結果紀錄檔（由 run 開啟），每完成一回合就附加一筆
+        self.results_log = None
+        # 每個 API 請求的延遲、token 與費用（每次 run 重新開始）
+        self.telemetry = Telemetry(name, provider.pricing)
+
+    def instructions(self, repair=False, subset=False):
+        """附在題目之後的說明：結構化模式要求 JSON，補問或只問部分題目時要求帶題號作答"""
+        if self.structured:
+            return [STRUCTURED_INSTRUCTION.format(options=", ".join(self.options))]
+        if repair:
+            return [REPAIR_INSTRUCTION.format(options=", ".join(self.options))]
+        if subset:
+            return [SUBSET_INSTRUCTION.format(options=", ".join(self.options))]
+        return []
+
+    def subset_request(self, questions):
+        """只包含部分題目（題號從 1 起算，維持原本的編號）的請求，回傳 (請求, 請求雜湊)"""
+        question_texts = [self.question_texts[number - 1] for number in questions]
+        request = self.provider.build_request(self.persona, question_texts + self.instructions(subset=True))
+        return request, self.provider.request_hash(self.persona, request)
+
+    def shuffled_request(self, order):
+        """依 order（原題目索引）重新排列並重新編號的完整請求，回傳 (請求, 請求雜湊)"""
+        question_texts = [format_question(position, self.questions[idx]) for position, idx in enumerate(order)]
+        request = self.provider.build_request(self.persona, question_texts + self.instructions())
+        return request, self.provider.request_hash(self.persona, request)
+
+    def parse_shuffled(self, answer_text, order):
+        """解析題目重新排列過的回答（依送出時的題號），再依 order 放回原本的題號"""
+        answers, extra = self.parse_answers(answer_text)
+        answers = unpermute(answers, order, len(self.questions))
+        if "ambiguous" in extra:
+            extra = {**extra, "ambiguous": sorted(canonical_numbers(extra["ambiguous"], order))}
+        # 結構化輸出的信心水準依題號記錄，跟答案一起放回原本的題號
+        if isinstance(extra.get("confidence"), dict):
+            numbers = list(extra["confidence"])
+            scores = dict(zip(canonical_numbers(numbers, order), extra["confidence"].values()))
+            extra = {**extra, "confidence": dict(sorted(scores.items()))}
+        return answers, extra
+
+    def parse_subset(self, answer_text, questions):
+        """解析只問部分題目的回答，依題號放回完整長度的答案 list（沒有問的題目為 None）"""
+        aligned, ambiguous = self.align(answer_text, self.options, questions)
+        answers = [None] * len(self.questions)
+        for number, answer in aligned.items():
+            answers[number - 1] = answer
+        missing = [number for number in questions if number not in aligned]
+        if missing:
+            print(f"警告：[{self.name}] 預期 {len(questions)} 個答案，缺少或無法判讀 {len(missing)} 題")
+        extra = {"asked": list(questions)}
+        if ambiguous:
+            extra["ambiguous"] = ambiguous
+        unaligned = 0 if self.structured else unaligned_count(answer_text, self.options, questions)
+        if unaligned:
+            extra["unaligned"] = unaligned
+        return answers, extra
+
+    def parse_answers(self, answer_text):
+        """解析回答並依題號對齊，缺答或答案矛盾的題目為 None"""
+        answers, meta = self.parser(answer_text, self.options, len(self.questions))
+
+        # 驗證答案數量（僅在出錯時顯示）
+        missing = missing_questions(answers)
+        if missing:
+            print(f"警告：[{self.name}] 預期 {len(self.questions)} 個答案，缺少或無法判讀 {len(missing)} 題")
+            if meta.get("unaligned"):
+                print(f"回答沒有題號且只找到 {meta['unaligned']} 個答案，無法依位置對齊，改以補問逐題重答")
+            elif len(missing) == len(answers):
+                print(f"原始回答: {answer_text}")
+
+        return answers, meta
+
+    def record(self, round_idx, answer_text, answers, extra):
+        """寫入結果紀錄檔，回傳與紀錄檔相同格式的回合紀錄"""
+        meta = {"model": self.provider.model, "prompt_hash": self.persona.sha256, **extra}
+        if self.results_log is not None:
+            self.results_log.append(round_idx, answers, raw=answer_text, meta=meta)
+        return {"round": round_idx, "answers": answers, "raw": answer_text, "meta": meta}
+
+    async def stream_round(self, timing, request):
+        """以串流取得一個回合：邊收邊解析，出現格式錯誤就中止連線並拋出 MalformedOutput；計時寫入 timing"""
+        parser = StreamingAnswerParser(self.options, len(self.questions), self.stream_mode)
+        started = time.monotonic()
+
+        def on_sent():
+            # 從請求實際送出開始計時，不含等待並行與速率額度的時間
+            nonlocal started
+            started = time.monotonic()
+
+        chunks = self.provider.stream_async(self.persona, request, self.response_schema, on_sent)
+        try:
+            async for chunk in chunks:
+                parser.feed(chunk, time.monotonic() - started)
+                if parser.malformed:
+                    raise MalformedOutput(f"串流中止（{parser.malformed}）: {parser.text[-80:]}")
+        finally:
+            await chunks.aclose()
+        parser.feed("", time.monotonic() - started, final=True)
+        timing.update(parser.timing(time.monotonic() - started))
+        return parser.text.strip() or None
+
+    async def ask_round(self, round_idx, response_cache, stream=False, questions=None, shuffle_seed=None):
+        """問一個回合（依快取模式讀取本地快取或呼叫 API）；暫時性錯誤依 provider 的重試策略重試
+
+        stream 為 True 時以串流接收並逐段解析（從快取讀到的回合沒有串流計時）。
+        questions 為這回合要問的題號（自適應抽樣，見 adaptive_questions），None 表示全部題目；
+        只問部分題目時不使用串流，答案依題號放回原本的位置，meta 的 asked 記錄實際問了哪些題目。
+        shuffle_seed 不為 None 時依 (seed, 回合) 的排列打亂題目順序（見 question_order.py），
+        meta 記錄 shuffle_seed 與 order（送出順序的原題目索引），答案一律以原本的題號保存。
+        """
+        provider = self.provider
+        cache_params = self.cache_params
+        timing = {}
+        order = None
+        if shuffle_seed is not None:
+            order = round_order(shuffle_seed, round_idx, len(self.questions) if questions is None else len(questions))
+            if questions is not None:
+                # 只問部分題目時維持原本的題號，只打亂出現順序
+                questions = [questions[idx] for idx in order]
+                order = np.asarray(questions, dtype=np.int16) - 1
+        if questions is not None:
+            request, request_hash = self.subset_request(questions)
+            stream = False
+        elif order is not None:
+            request, request_hash = self.shuffled_request(order)
+        else:
+            request, request_hash = self.request, self.request_hash
+
+        async def call():
+            with self.telemetry.measure("round", round_idx):
+                if stream:
+                    return await self.stream_round(timing, request)
+                return await provider.generate_async(self.persona, request, self.response_schema)
+
+        async def attempt():
+            answer_text = await response_cache.fetch_async(provider.model, request_hash, cache_params, round_idx, call)
+            if answer_text is None:
+                raise BlockedResponse("回應被阻擋")
+            if questions is not None:
+                answers, extra = self.parse_subset(answer_text, questions)
+            elif order is not None:
+                answers, extra = self.parse_shuffled(answer_text, order)
+            else:
+                answers, extra = self.parse_answers(answer_text)
+            # 沒有題號、答案數量不符的回答交給補問（逐題帶題號重答），比整個回合重新取樣便宜
+            repairable = extra.get("unaligned") and self.repair_attempts
+            if all(answer is None for answer in answers) and not repairable:
+                # 完全解析不出答案：丟掉這筆快取，重新取樣
+                response_cache.invalidate(provider.model, request_hash, cache_params, round_idx)
+                raise MalformedOutput(f"解析不出任何答案: {answer_text[:80]}")
+            return answer_text, answers, extra
+
+        try:
+            answer_text, answers, extra = await call_with_retry(
+                attempt, provider.retry_policy, provider.breaker, fatal=(CacheMiss,), label=f"{self.name} 回合 {round_idx + 1}"
+            )
+        except CacheMiss as e:
+            raise CacheMiss(f"回合 {round_idx + 1}") from e
+        except Exception as e:
+            # 重試用盡或不可重試：記為空答案，不寫入紀錄檔（--resume 時會重新問）
+            print(f"錯誤：[{self.name}] 回合 {round_idx + 1} 放棄（{classify_error(e)}）: {e}")
+            return {"round": round_idx, "answers": [], "raw": None, "meta": {}}
+
+        if timing:
+            if order is not None:
+                timing["answered_at"] = unpermute(timing["answered_at"], order, len(self.questions))
+                if "confidence" in timing:
+                    timing["confidence"] = unpermute(timing["confidence"], order, len(self.questions))
+            extra = {**extra, "stream": timing}
+        if order is not None:
+            extra = {**extra, "shuffle_seed": shuffle_seed, "order": [int(idx) for idx in order]}
+        return await self.finish_round(round_idx, answer_text, response_cache, answers, extra)
+
+    async def repair(self, round_idx, answers, response_cache, asked=None):
+        """只針對缺答或答案矛盾的題目送出小的補問請求，合併回原本的回合；回傳 (答案, 補問紀錄)
+
+        asked 為這回合實際問過的題號（自適應抽樣），沒有問的題目不補問。
+        """
+        provider = self.provider
+        cache_params = self.cache_params
+        repairs = []
+        for attempt_idx in range(self.repair_attempts):
+            missing = unanswered(answers, asked)
+            if not missing:
+                break
+            question_texts = [self.question_texts[number - 1] for number in missing]
+            request = provider.build_request(self.persona, question_texts + self.instructions(repair=True))
+            request_hash = provider.request_hash(self.persona, request)
+
+            async def call():
+                with self.telemetry.measure("repair", round_idx):
+                    return await provider.generate_async(self.persona, request, self.response_schema)
+
+            async def attempt():
+                # 補問的快取 key 以「回合:repair次數」區分
+                text = await response_cache.fetch_async(
+                    provider.model, request_hash, cache_params, f"{round_idx}:repair{attempt_idx}", call
+                )
+                if text is None:
+                    raise BlockedResponse("補問回應被阻擋")
+                return text
+
+            try:
+                text = await call_with_retry(
+                    attempt, provider.retry_policy, provider.breaker, fatal=(CacheMiss,), label=f"{self.name} 回合 {round_idx + 1} 補問"
+                )
+            except CacheMiss as e:
+                raise CacheMiss(f"回合 {round_idx + 1} 第 {attempt_idx + 1} 次補問") from e
+            except Exception as e:
+                print(f"錯誤：[{self.name}] 回合 {round_idx + 1} 補問失敗（{classify_error(e)}）: {e}")
+                break
+
+            aligned, _ = self.align(text, self.options, missing)
+            for number, answer in aligned.items():
+                answers[number - 1] = answer
+            repairs.append({"questions": missing, "filled": sorted(aligned), "raw": text})
+            print(f"補問：[{self.name}] 回合 {round_idx + 1} 補問 {len(missing)} 題，補回 {len(aligned)} 題")
+        return answers, repairs
+
+    async def finish_round(self, round_idx, answer_text, response_cache, answers=None, extra=None):
+        """解析（尚未解析時）、補問缺答題目並寫入紀錄檔，回傳回合紀錄"""
+        if answers is None:
+            answers, extra = self.parse_answers(answer_text)
+        extra = dict(extra)
+        asked = extra.get("asked")
+        if self.repair_attempts and unanswered(answers, asked):
+            answers, repairs = await self.repair(round_idx, answers, response_cache, asked)
+            extra["repairs"] = repairs
+        missing = unanswered(answers, asked)
+        if missing:
+            extra["missing"] = missing
+        return self.record(round_idx, answer_text, answers, extra)
+
+    async def estimate_distributions(self, response_cache, calls):
+        """以 calls 次帶 logprobs 的請求讀出每題各選項的機率（不必抽樣大量回合）
+
+        回傳 (機率矩陣（題目 × 選項）, 每題有效的請求數)；全部請求都失敗時回傳 None。
+        """
+        provider = self.provider
+        cache_params = {**self.cache_params, "top_logprobs": TOP_LOGPROBS}
+
+        async def estimate(call_idx):
+            # 快取中存 token 與候選 logprobs 的 JSON，重播時同樣可以重新計算分布
+            sample_index = f"logprobs{call_idx}"
+
+            async def call():
+                with self.telemetry.measure("logprobs", call_idx):
+                    tokens = await provider.logprobs_async(self.persona, self.request, self.response_schema)
+                return json.dumps(tokens, ensure_ascii=False) if tokens is not None else None
+
+            async def attempt():
+                cached = await response_cache.fetch_async(provider.model, self.request_hash, cache_params, sample_index, call)
+                if cached is None:
+                    raise BlockedResponse("回應被阻擋或沒有 logprobs")
+                probabilities = answer_distributions(json.loads(cached), self.options, len(self.questions), self.structured)
+                if np.isnan(probabilities).all():
+                    response_cache.invalidate(provider.model, self.request_hash, cache_params, sample_index)
+                    raise MalformedOutput("無法從 logprobs 對齊任何題目的答案")
+                return probabilities
+
+            try:
+                return await call_with_retry(
+                    attempt, provider.retry_policy, provider.breaker, fatal=(CacheMiss,), label=f"{self.name} logprobs {call_idx + 1}"
+                )
+            except CacheMiss:
+                # 重播時缺少這次的快取：只略過這一次，機率分布以其餘請求估計
+                print(f"錯誤：[{self.name}] --cache replay 找不到 logprobs 請求 {call_idx + 1} 的快取，略過")
+                return None
+            except Exception as e:
+                print(f"錯誤：[{self.name}] logprobs 請求 {call_idx + 1} 失敗（{classify_error(e)}）: {e}")
+                return None
+
+        results = await asyncio.gather(*(estimate(call_idx) for call_idx in range(calls)))
+        distributions = [probabilities for probabilities in results if probabilities is not None]
+        if not distributions:
+            print(f"警告：[{self.name}] 沒有取得任何 logprobs（模型可能不支援），略過機率分布估計")
+            return None
+        return combine_distributions(distributions)
+
+    async def run(self, response_cache, rounds=None, batch=False, target_margin=None,
+                  min_rounds=10, resume=None, excel=False, progress=None, logprobs=None, stream=False, adaptive=False,
+                  shuffle_seed=None):
+        """執行這個條件的所有回合；實際同時送出的請求數由 provider 的並行額度控制
+
+        stream 為 True 時以串流接收每個回合（見 ask_round）。logprobs 為請求次數時，另外以 logprobs 估計每題的選項機率，與抽樣結果並列報告（rounds=0 時只做估計）。
+        adaptive 為 True 時，誤差範圍已在 target_margin 以內的題目不再出現在之後的請求中（見 adaptive_questions）。
+        shuffle_seed 不為 None 時每回合以不同的順序送出題目（見 ask_round），結束時另外報告題序效應。
+        """
+        rounds = self.rounds if rounds is None else rounds
+        self.telemetry = Telemetry(self.name, self.provider.pricing)
+
+        # 每完成一回合就寫入紀錄檔；--resume 時沿用舊紀錄檔並跳過已完成的回合
+        self.results_log, completed = open_results_log(self.name, resume, self.persona.sha256)
+        print(f"[{self.name}] 結果紀錄檔: {self.results_log.path}")
+
+        # 邊收回合邊更新每題的次數表，可即時看到穩定度與誤差範圍
+        accumulator = stability.StabilityAccumulator(self.options, len(self.questions))
+        traits = TraitAccumulator(self.options, self.questions, self.ppv_path)
+
+        async def resumable_round(round_idx):
+            if round_idx in completed:
+                return completed[round_idx]
+            questions = self.adaptive_questions(accumulator, target_margin, min_rounds) if adaptive else None
+            if questions == []:
+                # 開始這回合前所有題目都已穩定（其他回合剛完成），不必再送出請求
+                return {"round": round_idx, "answers": [], "raw": None, "meta": {"asked": []}}
+            return await self.ask_round(round_idx, response_cache, stream, questions, shuffle_seed)
+
+        def on_result(i, record):
+            accumulator.add_round(record["answers"])
+            # 只問部分題目的回合不計入特質分數（各特質只剩不穩定的幾題，平均會有偏差）
+            if "asked" not in record["meta"]:
+                traits.add_round(record["answers"])
+            if progress is not None:
+                progress.update(self.name)
+            print(f"\n=== [{self.name}] 回合 {i} ===")
+            if self.show_raw and record["raw"]:
+                print(f"完整回答:\n{record['raw']}")
+            print("答案:", format_answers(record["answers"]))
+            if "asked" in record["meta"]:
+                print(f"本回合只問 {len(record['meta']['asked'])} 題尚未穩定的題目")
+            confidence = confidence_scores(record["meta"])
+            if confidence:
+                print(f"本回合平均信心水準: {sum(confidence) / len(confidence):.2f}")
+            timing = record["meta"].get("stream")
+            if timing and timing["first_answer"] is not None:
+                print(f"第一個答案: {timing['first_answer']:.2f} 秒｜完整回答: {timing['total']:.2f} 秒")
+            print(accumulator.summary())
+            if traits.key is not None:
+                print(traits.summary())
+
+        def should_stop():
+            # 每題穩定度的信賴區間半寬都小於 target_margin 時提前停止
+            return target_margin is not None and accumulator.converged(target_margin, min_rounds)
+
+        try:
+            if batch:
+                records = await self.run_batch(response_cache, rounds, completed, progress)
+            else:
+                # 同時保持多個回合進行中，結果仍依回合順序排列
+                records = await run_rounds_async(
+                    resumable_round, rounds, concurrency=self.provider.concurrency, on_result=on_result, stop_when=should_stop
+                )
+        except CacheMiss as e:
+            # 重播時缺少某個回合的快取（錄製時放棄或格式錯誤的回合不會寫入快取）：只略過這個條件，其他條件照常完成
+            self.results_log.close()
+            if progress is not None:
+                progress.finish(self.name)
+            print(f"錯誤：[{self.name}] --cache replay 找不到{e} 的快取，略過這個條件")
+            return None
+
+        self.results_log.close()
+        if progress is not None:
+            progress.finish(self.name)
+        distributions = await self.estimate_distributions(response_cache, logprobs) if logprobs else None
+        return self.report(records, excel, distributions)
+
+    async def run_batch(self, response_cache, rounds, completed, progress=None):
+        """以 Batch API 一次提交尚未完成的回合，完成後再依回合順序解析；回傳依回合順序的紀錄
+
+        提交後批次 id 記在紀錄檔旁（見 batch_runner.batch_state_path），--resume 時繼續等同一個批次。
+        批次的回應與逐回合呼叫使用相同的快取 key：replay / auto 時先讀快取，record / auto 時寫入快取。
+        """
+        provider = self.provider
+        state_path = batch_state_path(self.results_log.path)
+        state = load_batch_state(state_path)
+        missing = [i for i in range(rounds) if i not in completed]
+        answer_texts = {}
+        for round_idx in missing:
+            cached = response_cache.lookup(provider.model, self.request_hash, self.cache_params, round_idx)
+            if cached is not None:
+                answer_texts[round_idx] = cached
+        if response_cache.mode == "replay" and len(answer_texts) < len(missing):
+            first = next(i for i in missing if i not in answer_texts)
+            raise CacheMiss(f"回合 {first + 1}")
+
+        pending = state["rounds"] if state is not None else [i for i in missing if i not in answer_texts]
+        if pending:
+            texts = await asyncio.to_thread(
+                provider.run_batch, self.persona, self.request, len(pending), self.name,
+                response_schema=self.response_schema, batch_id=state["batch_id"] if state is not None else None,
+                on_submit=lambda batch_id: save_batch_state(state_path, batch_id, pending),
+            )
+            for round_idx, text in zip(pending, texts):
+                response_cache.store(provider.model, self.request_hash, self.cache_params, round_idx, text)
+                if text is not None:
+                    answer_texts[round_idx] = text
+
+        finished = await asyncio.gather(*(
+            self.finish_round(round_idx, answer_texts[round_idx], response_cache)
+            for round_idx in missing if round_idx in answer_texts
+        ))
+        for record in finished:
+            completed[record["round"]] = record
+        # 結果都已寫入紀錄檔，之後的 --resume 只需重新提交失敗的回合
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        if progress is not None:
+            progress.done[self.name] = len(completed)
+        records = [completed[i] for i in range(rounds) if i in completed]
+        if len(records) < rounds:
+            print(f"警告：[{self.name}] {rounds - len(records)} 個回合在批次中失敗，已略過")
+        return records
+
+    def adaptive_questions(self, accumulator, target_margin, min_rounds=10):
+        """自適應抽樣：這回合要問的題號（尚未有 min_rounds 個答案或誤差範圍仍大於 target_margin 的題目）
+
+        所有題目都還不穩定時回傳 None（送出原本的完整請求，可共用 prompt 快取與串流）。
+        """
+        unsettled = accumulator.unsettled(target_margin, min_rounds)
+        if unsettled.all():
+            return None
+        return [int(idx) + 1 for idx in np.flatnonzero(unsettled)]
+
+    def report(self, records, excel=False, distributions=None):
+        """印出穩定度、寫入結果庫，需要時匯出 Excel；回傳 run_id
+
+        distributions 為 estimate_distributions 的結果，會與抽樣穩定度並列印出並寫入結果庫。
+        """
+        all_rounds = [record["answers"] for record in records]
+
+        print(f"\n=== [{self.name}] 全部回合答案 ===")
+        for i, ans in enumerate(all_rounds, 1):
+            print(f"{i}: {format_answers(ans)}")
+
+        # ⭐ 計算穩定度
+        stability_results = stability.compute_stability(all_rounds, self.options, len(self.questions))
+
+        print(f"\n=== [{self.name}] 每一題穩定度（Consistency）===\n")
+        for s in stability_results:
+            print(
+                f"第 {s['question']} 題："
+                f"最常出現 {s['most_common']}（{s['count']}/{s['total']} 次）｜"
+                f"穩定度 = {s['stability']:.3f}"
+            )
+
+        extra_sheets = {**(confidence_report(records) or {}), **(stream_report(records) or {})}
+        by_question = question_confidence(records, len(self.questions))
+        if by_question is not None:
+            extra_sheets["各題信心水準"] = by_question
+        adaptive = adaptive_report(records, len(self.questions))
+        if adaptive is not None:
+            extra_sheets["自適應抽樣"] = adaptive
+        traits = self.report_traits([record["answers"] for record in records if "asked" not in record["meta"]])
+        if traits is not None:
+            extra_sheets["特質分數"] = traits
+
+        # 每回合答案與穩定度寫入 Parquet 結果庫（依模型 / 人格 / prompt 版本 / 日期分區）
+        run_id = results_store.run_id_from_log(self.results_log.path)
+        results_store.save_run(
+            run_id, self.provider.model, self.persona_name, self.prompt_variant, self.persona.sha256,
+            all_rounds, self.options, len(self.questions), stability_results
+        )
+        if stability_results:
+            self.report_trait_stability(run_id, all_rounds)
+        if distributions is not None:
+            self.report_distributions(run_id, distributions, stability_results)
+        if any("order" in record["meta"] for record in records):
+            extra_sheets["題序效應"] = self.report_order(run_id, records, all_rounds)
+        if self.telemetry.calls:
+            extra_sheets["請求統計"] = self.report_telemetry(run_id)
+        print(f"\n✅ 結果已寫入 {results_store.STORE_DIR}/（run_id = {run_id}）")
+
+        # Excel 改為選用的匯出格式，由結果庫產生
+        if excel:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{self.excel_prefix}_{timestamp}.xlsx"
+            results_store.export_excel(run_id, filename, extra_sheets or None)
+            print(f"✅ Excel 已匯出: {filename}")
+        return run_id
+
+
+    def report_trait_stability(self, run_id, all_rounds):
+        """印出各 Big Five 特質的穩定度彙總並寫入結果庫（traits/）"""
+        matrix = stability.build_answer_matrix(all_rounds, self.options, len(self.questions))
+        aggregates = stability.trait_aggregates(stability.stability_stats(matrix, len(self.options)))
+        if not aggregates:
+            return
+        print(f"\n=== [{self.name}] 各特質穩定度 ===\n")
+        for a in aggregates:
+            print(f"{a['trait']}：平均 {a['mean_consistency']:.3f}｜最低 {a['min_consistency']:.3f}｜"
+                  f"平均熵 {a['mean_entropy']:.3f}｜平均變異數 {a['mean_variance']:.3f}")
+        results_store.save_traits(
+            run_id, self.provider.model, self.persona_name, self.prompt_variant, self.persona.sha256,
+            len(matrix), aggregates
+        )
+
+    def report_traits(self, all_rounds):
+        """印出各特質的平均分數（有 PPV 時與 big5 目標值比較），回傳每回合特質分數的 Excel 工作表"""
+        df = trait_report(all_rounds, self.options, self.questions, self.ppv_path)
+        if df is None:
+            return None
+        print(f"\n=== [{self.name}] Big Five 特質分數（0~100，反向題已反向計分）===\n")
+        for label in BIG5_TRAITS.values():
+            if label not in df:
+                continue
+            line = f"{label}：平均 {df[label].mean():.1f}"
+            if f"{label}−目標" in df:
+                line += f"｜與目標差 {df[f'{label}−目標'].mean():+.1f}"
+            print(line)
+        if "與 PPV 距離" in df:
+            print(f"與 PPV 距離（每回合均方根）：平均 {df['與 PPV 距離'].mean():.1f}")
+        return df
+
+    def report_order(self, run_id, records, all_rounds):
+        """印出題目出現在前半段與後半段時的作答差異，並把每回合的題目順序寫入結果庫，回傳 Excel 工作表"""
+        import pandas as pd
+
+        shuffled = [record for record in records if "order" in record["meta"]]
+        results_store.save_orders(
+            run_id, self.provider.model, self.persona_name, self.prompt_variant,
+            [record["round"] + 1 for record in shuffled],
+            [record["meta"]["shuffle_seed"] for record in shuffled],
+            [record["meta"]["order"] for record in shuffled],
+        )
+
+        # 放棄的回合沒有 order，但也沒有任何答案，不影響比較
+        num_questions = len(self.questions)
+        positions = position_matrix([record["meta"].get("order") for record in records], num_questions)
+        matrix = stability.build_answer_matrix(all_rounds, self.options, num_questions)
+        effects = order_effects(matrix, positions, len(self.options))
+
+        print(f"\n=== [{self.name}] 題序效應（{len(shuffled)} 回合隨機順序，前半段 vs 後半段出現）===\n")
+        shift = np.abs(effects["mean_shift"])
+        if np.isnan(shift).all():
+            print("尚無足夠的答案比較前後半段")
+        else:
+            print(f"平均答案位移 |Δ|：{np.nanmean(shift):.3f}（0~1 量尺）｜"
+                  f"與眾數一致比例的平均差：{np.nanmean(effects['agreement_shift']):+.3f}")
+            largest = [idx for idx in np.argsort(-np.nan_to_num(shift, nan=-1))[:3] if np.isfinite(shift[idx])]
+            print("位移最大：" + "、".join(f"第 {idx + 1} 題 {effects['mean_shift'][idx]:+.3f}" for idx in largest))
+
+        return pd.DataFrame({
+            "題號": np.arange(1, num_questions + 1),
+            "前半段答案數": effects["early_n"],
+            "後半段答案數": effects["late_n"],
+            "前半段平均答案": effects["early_mean"],
+            "後半段平均答案": effects["late_mean"],
+            "答案位移": effects["mean_shift"],
+            "前半段眾數一致比例": effects["early_agreement"],
+            "後半段眾數一致比例": effects["late_agreement"],
+            "一致比例差": effects["agreement_shift"],
+        })
+
+    def report_telemetry(self, run_id):
+        """印出請求統計並把每個請求的紀錄寫入結果庫，回傳 Excel 工作表（指標 / 值）"""
+        import pandas as pd
+
+        summary = self.telemetry.summary()
+        print(format_summary(self.name, summary))
+        results_store.save_telemetry(run_id, self.provider.model, self.persona_name, self.prompt_variant, self.telemetry.calls)
+        return pd.DataFrame({"指標": list(summary), "值": list(summary.values())})
+
+    def report_distributions(self, run_id, distributions, stability_results):
+        """印出 logprobs 估計的選項分布與解析計算的預期穩定度（有抽樣結果時並列），並寫入結果庫"""
+        probabilities, calls = distributions
+        stats = stability.distribution_stats(probabilities)
+        sampled = {s["question"]: s["stability"] for s in stability_results}
+
+        print(f"\n=== [{self.name}] logprobs 選項分布（{int(calls.max())} 次請求）===\n")
+        for q_idx in np.flatnonzero(calls > 0):
+            distribution = " ".join(f"{opt}={p:.2f}" for opt, p in zip(self.options, probabilities[q_idx]))
+            line = f"第 {q_idx + 1} 題：{distribution}｜預期穩定度 = {stats['expected_stability'][q_idx]:.3f}"
+            if q_idx + 1 in sampled:
+                line += f"｜抽樣穩定度 = {sampled[q_idx + 1]:.3f}"
+            print(line)
+        unaligned = int((calls == 0).sum())
+        if unaligned:
+            print(f"警告：[{self.name}] {unaligned} 題無法從 logprobs 對齊答案")
+        print(f"平均預期穩定度: {np.nanmean(stats['expected_stability']):.3f}")
+        if sampled:
+            print(f"平均抽樣穩定度: {np.mean(list(sampled.values())):.3f}")
+
+        results_store.save_distributions(
+            run_id, self.provider.model, self.persona_name, self.prompt_variant, self.persona.sha256,
+            probabilities, calls, self.options, stats
+        )
+
+
+def unanswered(answers, asked=None):
+    """缺答的題號；asked 不為 None 時（只問部分題目的回合）只看實際問過的題目"""
+    missing = missing_questions(answers)
+    if asked is None:
+        return missing
+    asked = set(asked)
+    return [number for number in missing if number in asked]
+
+
+def format_answers(answers):
+    """以空白分隔答案，缺答顯示為 -"""
+    return " ".join(answer or "-" for answer in answers)
+
+
+def confidence_scores(meta):
+    """回合的信心水準分數 list：結構化輸出為 {題號: 分數}（讀回紀錄檔時題號為字串），其他格式為依出現順序的 list"""
+    confidence = meta.get("confidence") or []
+    return list(confidence.values()) if isinstance(confidence, dict) else confidence
+
+
+def question_confidence(records, num_questions):
+    """依題號記錄的信心水準（結構化輸出）：每題的平均信心水準與次數；沒有這類回合時回傳 None"""
+    scored = [record["meta"]["confidence"] for record in records if isinstance(record["meta"].get("confidence"), dict)]
+    if not scored:
+        return None
+    import pandas as pd
+
+    totals = np.zeros(num_questions)
+    counts = np.zeros(num_questions, dtype=np.int64)
+    for confidence in scored:
+        for number, score in confidence.items():
+            if 0 < int(number) <= num_questions:
+                totals[int(number) - 1] += score
+                counts[int(number) - 1] += 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, totals / counts, np.nan)
+    return pd.DataFrame({"題號": np.arange(1, num_questions + 1), "平均信心水準": np.round(means, 2), "次數": counts})
+
+
+def confidence_report(records):
+    """解析器有取出信心水準時，印出統計並回傳 Excel 的額外工作表；否則回傳 None"""
+    if not any("confidence" in record["meta"] for record in records):
+        return None
+    import pandas as pd
+
+    # 完整回答內容和信心水準
+    full_responses_data = []
+    for i, record in enumerate(records, 1):
+        conf_scores = confidence_scores(record["meta"])
+        avg_conf = sum(conf_scores) / len(conf_scores) if conf_scores else 0
+        full_responses_data.append({
+            "回合": i,
+            "完整回答": record["raw"],
+            "平均信心水準": round(avg_conf, 2)
+        })
+    extra_sheets = {'完整回答含理由': pd.DataFrame(full_responses_data)}
+
+    # 計算總體信心水準統計
+    all_conf_flat = [score for record in records for score in confidence_scores(record["meta"])]
+    overall_avg_conf = sum(all_conf_flat) / len(all_conf_flat) if all_conf_flat else 0
+
+    print(f"\n=== 信心水準統計 ===")
+    print(f"總平均信心水準: {overall_avg_conf:.2f} 分")
+    if all_conf_flat:
+        print(f"最高信心: {max(all_conf_flat)} 分")
+        print(f"最低信心: {min(all_conf_flat)} 分")
+        # 分組統計
+        high_conf = [s for s in all_conf_flat if s >= 80]
+        mid_conf = [s for s in all_conf_flat if 50 <= s < 80]
+        low_conf = [s for s in all_conf_flat if s < 50]
+        print(f"高信心 (≥80分): {len(high_conf)} 次 ({len(high_conf)/len(all_conf_flat)*100:.1f}%)")
+        print(f"中信心 (50-79分): {len(mid_conf)} 次 ({len(mid_conf)/len(all_conf_flat)*100:.1f}%)")
+        print(f"低信心 (<50分): {len(low_conf)} 次 ({len(low_conf)/len(all_conf_flat)*100:.1f}%)")
+
+        extra_sheets['信心水準統計'] = pd.DataFrame([{
+            "總平均信心水準": round(overall_avg_conf, 2),
+            "最高信心": max(all_conf_flat),
+            "最低信心": min(all_conf_flat),
+            "高信心(≥80分)次數": len(high_conf),
+            "高信心百分比": round(len(high_conf)/len(all_conf_flat)*100, 1),
+            "中信心(50-79分)次數": len(mid_conf),
+            "中信心百分比": round(len(mid_conf)/len(all_conf_flat)*100, 1),
+            "低信心(<50分)次數": len(low_conf),
+            "低信心百分比": round(len(low_conf)/len(all_conf_flat)*100, 1),
+            "總回答數": len(all_conf_flat)
+        }])
+    return extra_sheets
+
+
+def adaptive_report(records, num_questions):
+    """有只問部分題目的回合時，印出實際提問的題次與省下的比例，回傳每題提問次數的 Excel 工作表；否則回傳 None"""
+    if not any("asked" in record["meta"] for record in records):
+        return None
+    import pandas as pd
+
+    asked_counts = np.zeros(num_questions, dtype=np.int64)
+    partial = 0
+    for record in records:
+        asked = record["meta"].get("asked")
+        if asked is None:
+            asked_counts += 1
+        else:
+            partial += 1
+            asked_counts[np.asarray(asked, dtype=np.int64) - 1] += 1
+    asked_total = int(asked_counts.sum())
+    full_total = len(records) * num_questions
+    print(
+        f"\n自適應抽樣：{partial}/{len(records)} 回合只問尚未穩定的題目，"
+        f"共問 {asked_total:,} 題次（每回合都問全部需 {full_total:,}，省下 {1 - asked_total / full_total:.0%}）"
+    )
+    return pd.DataFrame({"題號": np.arange(1, num_questions + 1), "提問次數": asked_counts})
+
+
+def stream_report(records):
+    """串流模式有計時資料時，印出第一個答案的時間與每題答案的間隔，並回傳 Excel 的額外工作表；否則回傳 None"""
+    timed = [record for record in records if record["meta"].get("stream")]
+    if not timed:
+        return None
+    import pandas as pd
+
+    rows = []
+    gaps = []
+    for record in timed:
+        timing = record["meta"]["stream"]
+        answered = sorted(t for t in timing["answered_at"] if t is not None)
+        # 每題答案之間的間隔（第一題以前的等待算在 first_answer）
+        round_gaps = np.diff(answered) if len(answered) > 1 else np.array([])
+        gaps.extend(round_gaps)
+        row = {
+            "回合": record["round"] + 1,
+            "第一個答案(秒)": timing["first_answer"],
+            "每題平均間隔(秒)": round(float(round_gaps.mean()), 3) if round_gaps.size else None,
+            "完整回答(秒)": timing["total"],
+            "串流答案數": len(answered),
+        }
+        # 串流解析時對齊到各題的信心水準
+        scores = [score for score in timing.get("confidence") or [] if score is not None]
+        if scores:
+            row["對齊題號的信心水準數"] = len(scores)
+            row["串流平均信心水準"] = round(float(np.mean(scores)), 2)
+        rows.append(row)
+
+    first = np.array([row["第一個答案(秒)"] for row in rows if row["第一個答案(秒)"] is not None])
+    totals = np.array([row["完整回答(秒)"] for row in rows])
+    print(f"\n=== 串流延遲（{len(rows)} 回合）===")
+    if first.size:
+        print(f"第一個答案: 平均 {first.mean():.2f} 秒｜中位數 {np.median(first):.2f} 秒｜最長 {first.max():.2f} 秒")
+    if gaps:
+        print(f"每題答案間隔: 平均 {np.mean(gaps):.3f} 秒｜p95 {np.percentile(gaps, 95):.3f} 秒")
+    print(f"完整回答: 平均 {totals.mean():.2f} 秒")
+    return {"串流延遲": pd.DataFrame(rows)}
+
+
+def persona_label(persona):
+    return os.path.splitext(os.path.basename(persona))[0] if persona else "none"
+
+
+def expand_matrix(spec):
+    """把 matrix 區段的一項展開成多個條件：provider / persona / template 可以是 list，取所有組合
+
+    name 可用 {provider}、{persona}、{template} 代入，預設為 "{provider}_{persona}_{template}"。
+    """
+    spec = dict(spec)
+    name_format = spec.pop("name", "{provider}_{persona}_{template}")
+    axes = [axis for axis in MATRIX_AXES if isinstance(spec.get(axis), list)]
+    conditions = []
+    for values in itertools.product(*(spec[axis] for axis in axes)):
+        condition = {**spec, **dict(zip(axes, values))}
+        condition["name"] = name_format.format(
+            provider=condition["provider"], persona=persona_label(condition.get("persona")), template=condition["template"]
+        )
+        conditions.append(condition)
+    return conditions
+
+
+def all_conditions(config):
+    """設定檔中的所有條件：conditions 逐一列出的條件，加上 matrix 展開的組合"""
+    conditions = list(config.get("conditions", []))
+    for spec in config.get("matrix", []):
+        conditions.extend(expand_matrix(spec))
+    return conditions
+
+
+def build_experiments(config, names=None, concurrency=None):
+    """依設定檔建立實驗條件；同一個 provider（client、並行額度、rate limiter、Gemini 模型）由所有條件共用
+
+    concurrency 不為 None 時覆寫每個 provider 的並行額度。
+    """
+    conditions = all_conditions(config)
+    if names:
+        known = {c["name"] for c in conditions}
+        unknown = [n for n in names if n not in known]
+        if unknown:
+            raise ValueError(f"設定檔中沒有這些條件: {', '.join(unknown)}")
+        conditions = [c for c in conditions if c["name"] in names]
+
+    providers = {}
+    experiments = []
+    for condition in conditions:
+        condition = dict(condition)
+        provider_key = condition.pop("provider")
+        if provider_key not in providers:
+            settings = config["providers"][provider_key]
+            if concurrency is not None:
+                settings = {**settings, "concurrency": concurrency}
+            providers[provider_key] = make_provider(provider_key, settings)
+        experiments.append(Experiment(provider=providers[provider_key], **condition))
+    return experiments
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="依設定檔執行一組實驗條件")
+    parser.add_argument("--config", default=CONFIG_PATH, help="實驗設定檔（JSON）")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="只執行這些條件（預設全部）")
+    parser.add_argument("--list", action="store_true", help="列出設定檔中的條件後結束")
+    parser.add_argument("--rounds", type=int, default=None, help="每個條件的回合數（預設依設定檔）")
+    parser.add_argument("--concurrency", type=int, default=None, help="每個 provider 同時進行中的請求數（預設依 provider 設定）")
+    parser.add_argument("--batch", action="store_true", help="改用 Batch API 提交所有回合")
+    parser.add_argument("--stream", action="store_true", help="以串流接收回答，邊收邊解析並記錄每題答案的延遲")
+    parser.add_argument("--cache", choices=CACHE_MODES, default=None, help="本地回應快取模式（預設 off 或環境變數 RESPONSE_CACHE_MODE）")
+    parser.add_argument("--target-margin", type=float, default=None, help="每題穩定度的 95%% 信賴區間半寬都小於此值時提前停止")
+    parser.add_argument("--min-rounds", type=int, default=10, help="提前停止前至少要完成的回合數")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="自適應抽樣：誤差範圍已小於 --target-margin 的題目不再出現在之後的請求中")
+    parser.add_argument("--shuffle", nargs="?", type=int, const=True, default=None, metavar="SEED",
+                        help="每回合以不同的隨機順序送出題目（可指定 seed 重現；不指定時隨機產生並印出）")
+    parser.add_argument("--resume", metavar="LOG", default=None, help="從既有的結果紀錄檔（runs/*.jsonl）繼續，只能搭配單一條件")
+    parser.add_argument("--excel", action="store_true", help="另外匯出 Excel（每回合答案、穩定度統計）")
+    parser.add_argument("--logprobs", type=int, metavar="CALLS", default=None,
+                        help="另以 CALLS 次帶 logprobs 的請求估計每題選項機率（搭配 --rounds 0 只做估計）")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if args.list:
+        for c in all_conditions(config):
+            mode = "結構化輸出" if c.get("structured") else c.get("parser", "chars")
+            print(f"{c['name']}: {c['provider']} / {c.get('persona') or '無 PPV'} / {c['template']} / {c['scale']} / {mode}")
+        return
+
+    experiments = build_experiments(config, args.only, args.concurrency)
+    if args.resume and len(experiments) != 1:
+        parser.error("--resume 只能搭配單一條件（例如 --only gpt_ppv）")
+    if args.stream and args.batch:
+        parser.error("--stream 不能與 --batch 同時使用")
+    if args.adaptive and args.target_margin is None:
+        parser.error("--adaptive 需要搭配 --target-margin（每題停止追加取樣的誤差範圍）")
+    if args.adaptive and args.batch:
+        parser.error("--adaptive 不能與 --batch 同時使用（批次會一次提交所有回合）")
+    if args.adaptive and (args.cache or os.getenv("RESPONSE_CACHE_MODE")) == "replay":
+        # 每回合問哪些題目取決於先前回合完成的順序，錄製時的請求內容（快取 key）無法重現
+        parser.error("--adaptive 不能與 --cache replay 同時使用（每回合的題目取決於回合完成的順序，無法重現錄製時的請求）")
+    if args.shuffle is not None and args.batch:
+        parser.error("--shuffle 不能與 --batch 同時使用（批次的每個請求內容相同）")
+    shuffle_seed = args.shuffle
+    if shuffle_seed is True:
+        shuffle_seed = secrets.randbits(32)
+    if shuffle_seed is not None:
+        print(f"題目順序隨機化：seed = {shuffle_seed}（以 --shuffle {shuffle_seed} 重現相同的順序）")
+
+    response_cache = ResponseCache(mode=args.cache)
+    # 所有條件同時執行，各 provider 依自己的並行與速率額度送出請求
+    return asyncio.run(run_matrix(
+        experiments, response_cache, rounds=args.rounds, batch=args.batch,
+        target_margin=args.target_margin, min_rounds=args.min_rounds, resume=args.resume, excel=args.excel,
+        logprobs=args.logprobs, stream=args.stream, adaptive=args.adaptive, shuffle_seed=shuffle_seed,
+    ))
+
+
+if __name__ == "__main__":
+    main()
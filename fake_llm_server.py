@@ -0,0 +1,613 @@
+# fake_llm_server.py
+# 本機假的 OpenAI / Gemini API，用來在不花 API 費用、不需網路的情況下測試與測量執行器
+# 可設定回應延遲分布、錯誤率、429 行為與每題的答案分布；同一個 seed 下第 n 個請求的結果固定
+import argparse
+import collections
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 題號與題目文字（「第 N 題: 題目」）；答案分布依題目文字決定，題目順序被打亂時仍跟著題目走
+QUESTION_PATTERN = re.compile(r"第\s*(\d+)\s*題\s*[：:]?[ \t]*([^\n]*)")
+
+DEFAULT_OPTIONS = ["1", "2", "3"]
+
+# 每題答案分布：uniform = 各選項機率相同、varied = 每題固定的隨機分布、stable = 每題有一個機率 stable_p 的主要答案
+ANSWER_PROFILES = ("uniform", "varied", "stable")
+
+
+def prompt_questions(prompt_text):
+    """請求中的題目，回傳 [(題號, 題目文字)]；沒有題目文字時以題號代替，完全沒有題號時視為一題"""
+    questions = [(int(number), text.strip() or number) for number, text in QUESTION_PATTERN.findall(prompt_text)]
+    return questions or [(1, "1")]
+
+
+def parse_latency(spec):
+    """延遲分布設定 → 函式(rng) → 秒數
+
+    "0.2"（固定秒數）、"uniform:最小,最大"、"normal:平均,標準差"、"lognormal:中位數,sigma"。
+    """
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        seconds = float(kind)
+        return lambda rng: seconds
+    a, b = (float(value) for value in args.split(","))
+    if kind == "uniform":
+        return lambda rng: rng.uniform(a, b)
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(a, b))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(a), b)
+    raise ValueError(f"未知的延遲分布: {spec}（可用: 秒數、uniform、normal、lognormal）")
+
+
+class FakeLLMState:
+    """伺服器共用狀態：上傳的檔案、批次工作、延遲 / 錯誤設定與答案分布"""
+
+    def __init__(self, seed=0, options=None, batch_delay=1.0, stream_delay=0.005, profile="varied", stable_p=0.9,
+                 latency="0", error_rate=0.0, rate_limit_rate=0.0, rpm=None, retry_after=1.0, drop_rate=0.0):
+        if profile not in ANSWER_PROFILES:
+            raise ValueError(f"未知的答案分布: {profile}（可用: {', '.join(ANSWER_PROFILES)}）")
+        self.files = {}
+        self.batches = {}
+        self.gemini_batches = {}
+        self.options = options or DEFAULT_OPTIONS
+        self.seed = seed
+        self.batch_delay = batch_delay
+        # 串流回應每個片段之間的延遲秒數
+        self.stream_delay = stream_delay
+        self.profile = profile
+        self.stable_p = stable_p
+        self.latency = parse_latency(latency)
+        # 回傳 500 與 429 的機率；rpm 不為 None 時，每分鐘超過 rpm 個請求就回傳 429
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.retry_after = retry_after
+        # 沒有題號的回答中每個答案被漏掉的機率（模擬答案數量不符的回覆）
+        self.drop_rate = drop_rate
+        self._requests = 0
+        self._recent = collections.deque()
+        self._lock = threading.Lock()
+
+    def request_rng(self):
+        """第 n 個請求專用的亂數來源：同一個 seed 下，第 n 個請求的延遲、錯誤與答案都固定，與執行緒排程無關"""
+        with self._lock:
+            self._requests += 1
+            count = self._requests
+        return random.Random(f"{self.seed}:{count}")
+
+    def response_delay(self, rng):
+        return self.latency(rng)
+
+    def fault(self, rng):
+        """依 RPM 上限與錯誤率決定這個請求是否失敗，回傳 (HTTP 狀態碼, 訊息, Retry-After 秒數) 或 None"""
+        if self.rpm is not None:
+            now = time.monotonic()
+            with self._lock:
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm:
+                    return 429, f"Rate limit reached: {self.rpm} RPM", 60 - (now - self._recent[0])
+                self._recent.append(now)
+        if rng.random() < self.rate_limit_rate:
+            return 429, "Rate limit reached (simulated)", self.retry_after
+        if rng.random() < self.error_rate:
+            return 500, "Internal server error (simulated)", None
+        return None
+
+    def rate_limit_headers(self):
+        """與 OpenAI 相同的配額 header（x-ratelimit-remaining-requests 等）；沒有設定 rpm 時不送出"""
+        if self.rpm is None:
+            return {}
+        now = time.monotonic()
+        with self._lock:
+            remaining = max(0, self.rpm - len(self._recent))
+            reset = 60 - (now - self._recent[0]) if self._recent else 0.0
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{max(reset, 0.0):.3f}s",
+        }
+
+    def question_distribution(self, question, options):
+        """每題固定的選項機率（依題目文字與答案分布決定），多次請求抽樣的是同一個分布"""
+        if self.profile == "uniform":
+            return [1 / len(options)] * len(options)
+        rng = random.Random(f"{question}:{','.join(options)}")
+        if self.profile == "stable":
+            main = rng.randrange(len(options))
+            rest = (1 - self.stable_p) / (len(options) - 1)
+            return [self.stable_p if idx == main else rest for idx in range(len(options))]
+        weights = [rng.random() ** 3 + 0.01 for _ in options]
+        total = sum(weights)
+        return [w / total for w in weights]
+
+    def sample_answer(self, rng, question, options):
+        return rng.choices(options, weights=self.question_distribution(question, options))[0]
+
+    def fake_answer(self, prompt_text, rng, options=None):
+        """依題目產生「1, 3, 2, ...」格式的回答；drop_rate 大於 0 時隨機漏掉部分答案"""
+        questions = prompt_questions(prompt_text)
+        options = options or self.options
+        answers = [self.sample_answer(rng, text, options) for _, text in questions]
+        if self.drop_rate > 0:
+            answers = [answer for answer in answers if rng.random() >= self.drop_rate]
+        return ", ".join(answers)
+
+    def fake_numbered_answer(self, prompt_text, rng, options=None):
+        """「第N題：X（理由）- 信心水準：85分」格式的回答（每題一行）"""
+        questions = prompt_questions(prompt_text)
+        options = options or self.options
+        return "\n".join(
+            f"第{n}題：{self.sample_answer(rng, text, options)}（假資料的理由）- 信心水準：{rng.randint(40, 100)}分"
+            for n, text in questions
+        )
+
+    def fake_structured_answer(self, prompt_text, rng, options=None):
+        """結構化輸出：依題號產生 {"answers": [{question_id, answer, confidence, reason}]}"""
+        questions = prompt_questions(prompt_text)
+        options = options or self.options
+        items = [
+            {"question_id": n, "answer": self.sample_answer(rng, text, options),
+             "confidence": rng.randint(40, 100), "reason": "假資料"}
+            for n, text in questions
+        ]
+        return json.dumps({"answers": items}, ensure_ascii=False)
+
+    def fake_logprob_answer(self, prompt_text, rng, options=None, structured=False):
+        """依每題的分布抽答案，回傳 (回答文字, Chat Completions 格式的 logprobs.content)
+
+        答案 token 的 top_logprobs 為各選項的 log 機率，其他 token 只有自己（機率 1）。
+        """
+        questions = prompt_questions(prompt_text)
+        options = options or self.options
+        segments = []  # (文字, 該題的選項機率或 None)
+        if structured:
+            segments.append(('{"answers":[', None))
+        for idx, (number, text) in enumerate(questions):
+            probabilities = self.question_distribution(text, options)
+            answer = rng.choices(options, weights=probabilities)[0]
+            if structured:
+                segments += [(f'{{"question_id":{number},"answer":"', None), (answer, probabilities),
+                             ('","confidence":80,"reason":"假資料"}', None)]
+                if idx < len(questions) - 1:
+                    segments.append((",", None))
+            else:
+                if idx:
+                    segments.append((", ", None))
+                segments.append((answer, probabilities))
+        if structured:
+            segments.append(("]}", None))
+
+        content = []
+        for text, probabilities in segments:
+            if probabilities is None:
+                top = [{"token": text, "logprob": 0.0, "bytes": None}]
+            else:
+                top = sorted(
+                    ({"token": opt, "logprob": math.log(p), "bytes": None} for opt, p in zip(options, probabilities)),
+                    key=lambda item: -item["logprob"],
+                )
+            chosen = next(item["logprob"] for item in top if item["token"] == text)
+            content.append({"token": text, "logprob": chosen, "bytes": None, "top_logprobs": top})
+        return "".join(text for text, _ in segments), content
+
+    def fake_content(self, prompt_text, system_text, rng, options=None, structured=False, logprobs=False):
+        """依請求內容選擇回答格式，回傳 (回答, Chat Completions 格式的 logprobs.content 或 None)"""
+        options = options or prompt_options(system_text)
+        if logprobs:
+            return self.fake_logprob_answer(prompt_text, rng, options, structured)
+        if structured:
+            return self.fake_structured_answer(prompt_text, rng, options), None
+        if "信心水準" in system_text or "格式：第N題" in prompt_text:
+            # 要求附上理由與信心水準的 prompt（v2_finetuned），或要求帶題號作答的補問 / 部分題目請求
+            return self.fake_numbered_answer(prompt_text, rng, options), None
+        return self.fake_answer(prompt_text, rng, options), None
+
+
+def schema_options(schema):
+    """從 answers 的 JSON schema 中找出 answer 的 enum（找不到回傳 None）"""
+    if not isinstance(schema, dict):
+        return None
+    if "answer" in schema.get("properties", {}):
+        return schema["properties"]["answer"].get("enum")
+    for value in list(schema.get("properties", {}).values()) + [schema.get("items")]:
+        found = schema_options(value)
+        if found:
+            return found
+    return None
+
+
+def prompt_options(system_text):
+    """依 system prompt 中的作答說明猜測選項（A~E 量表），猜不到時回傳 None"""
+    return ["A", "B", "C", "D", "E"] if "A~E" in system_text else None
+
+
+def chat_completion_content(state, body, rng):
+    """依請求內容產生回答文字，回傳 (回答, logprobs 或 None)"""
+    prompt_text = "\n".join(
+        m["content"] for m in body.get("messages", []) if m.get("role") == "user" and isinstance(m.get("content"), str)
+    )
+    system_text = "\n".join(
+        m["content"] for m in body.get("messages", []) if m.get("role") == "system" and isinstance(m.get("content"), str)
+    )
+    response_format = body.get("response_format") or {}
+    structured = response_format.get("type") == "json_schema"
+    options = schema_options(response_format["json_schema"].get("schema")) if structured else None
+    content, tokens = state.fake_content(prompt_text, system_text, rng, options, structured, bool(body.get("logprobs")))
+    return content, {"content": tokens, "refusal": None} if tokens is not None else None
+
+
+def chat_usage(body, content):
+    """以字數當作 token 數；同一人格（prompt_cache_key）的 system prompt 算作快取命中"""
+    prompt_text = "\n".join(m["content"] for m in body.get("messages", []) if isinstance(m.get("content"), str))
+    system_text = "".join(m["content"] for m in body.get("messages", []) if m.get("role") == "system")
+    cached = len(system_text) if body.get("prompt_cache_key") else 0
+    return {
+        "prompt_tokens": len(prompt_text), "completion_tokens": len(content),
+        "total_tokens": len(prompt_text) + len(content), "prompt_tokens_details": {"cached_tokens": cached},
+    }
+
+
+def chat_completion_body(state, body, rng):
+    content, logprobs = chat_completion_content(state, body, rng)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "logprobs": logprobs, "finish_reason": "stop"}
+        ],
+        "usage": chat_usage(body, content),
+    }
+
+
+def gemini_content(state, request, rng):
+    """依 generateContent 請求產生 (回答文字, Gemini 格式的 logprobsResult 或 None, 輸入字數)"""
+    prompt_text = "\n".join(
+        part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", [])
+    )
+    system = request.get("systemInstruction") or request.get("system_instruction") or {}
+    system_text = "\n".join(part.get("text", "") for part in system.get("parts", []))
+    config = request.get("generationConfig") or request.get("generation_config") or {}
+    schema = config.get("responseSchema") or config.get("response_schema")
+    logprobs = config.get("responseLogprobs") or config.get("response_logprobs")
+    text, tokens = state.fake_content(
+        prompt_text, system_text, rng, schema_options(schema) if schema else None, schema is not None, bool(logprobs)
+    )
+    logprobs_result = None
+    if tokens is not None:
+        logprobs_result = {
+            "topCandidates": [
+                {"candidates": [{"token": c["token"], "logProbability": c["logprob"]} for c in item["top_logprobs"]]}
+                for item in tokens
+            ],
+            "chosenCandidates": [{"token": item["token"], "logProbability": item["logprob"]} for item in tokens],
+        }
+    return text, logprobs_result, len(prompt_text) + len(system_text)
+
+
+def gemini_usage(prompt_tokens, text):
+    return {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(text), "totalTokenCount": prompt_tokens + len(text)}
+
+
+def gemini_response_body(state, request, rng):
+    text, logprobs_result, prompt_tokens = gemini_content(state, request, rng)
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}
+    if logprobs_result is not None:
+        candidate["logprobsResult"] = logprobs_result
+    return {"candidates": [candidate], "usageMetadata": gemini_usage(prompt_tokens, text)}
+
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive：與真正的 API 一樣，同一條連線可以連續送出多個請求
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def _simulate(self, rng, gemini=False):
+        """依設定延遲回應，並視錯誤率 / RPM 回傳錯誤；已送出錯誤時回傳 True"""
+        delay = self.state.response_delay(rng)
+        if delay > 0:
+            time.sleep(delay)
+        fault = self.state.fault(rng)
+        if fault is None:
+            return False
+        status, message, retry_after = fault
+        if gemini:
+            payload = {"error": {"code": status, "message": message,
+                                 "status": "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"}}
+        else:
+            payload = {"error": {"message": message, "type": "rate_limit_exceeded" if status == 429 else "server_error",
+                                 "code": "rate_limit_exceeded" if status == 429 else None}}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if retry_after is not None:
+            self.send_header("Retry-After", f"{max(retry_after, 0.0):.3f}")
+        self.end_headers()
+        self.wfile.write(data)
+        return True
+
+    # ---------------------------- 路由 ----------------------------
+
+    def _send_chat_stream(self, body, rng):
+        """Chat Completions 串流（server-sent events）：每個片段幾個字，片段之間延遲 stream_delay 秒"""
+        content, _ = chat_completion_content(self.state, body, rng)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        for name, value in self.state.rate_limit_headers().items():
+            self.send_header(name, value)
+        # 串流沒有 Content-Length，以關閉連線表示結束
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        for idx, piece in enumerate(pieces + [None]):
+            delta = {"content": piece} if piece is not None else {}
+            if idx == 0:
+                delta["role"] = "assistant"
+            chunk = {
+                "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "fake-model"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None if piece is not None else "stop"}],
+            }
+            try:
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 用戶端提早中止
+                return
+            time.sleep(self.state.stream_delay)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = {
+                "id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "fake-model"), "choices": [], "usage": chat_usage(body, content),
+            }
+            self.wfile.write(f"data: {json.dumps(usage_chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_gemini_stream(self, request, rng):
+        """Gemini REST 串流：JSON 陣列，每個元素是一段回答，最後一段附上 finishReason 與用量"""
+        text, _, prompt_tokens = gemini_content(self.state, request, rng)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        self.end_headers()
+        pieces = [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+        try:
+            self.wfile.write(b"[")
+            for idx, piece in enumerate(pieces):
+                chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}]}
+                if idx == len(pieces) - 1:
+                    chunk["candidates"][0]["finishReason"] = "STOP"
+                    chunk["usageMetadata"] = gemini_usage(prompt_tokens, text)
+                self.wfile.write((("," if idx else "") + json.dumps(chunk, ensure_ascii=False)).encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.state.stream_delay)
+            self.wfile.write(b"]")
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if path == "/v1/chat/completions":
+            body = json.loads(self._read_body())
+            rng = self.state.request_rng()
+            if self._simulate(rng):
+                return
+            if body.get("stream"):
+                return self._send_chat_stream(body, rng)
+            return self._send_json(chat_completion_body(self.state, body, rng), headers=self.state.rate_limit_headers())
+        match = re.match(r"^/v1beta/(models/[^:]+):(generateContent|streamGenerateContent)$", path)
+        if match:
+            request = json.loads(self._read_body())
+            rng = self.state.request_rng()
+            if self._simulate(rng, gemini=True):
+                return
+            if match.group(2) == "streamGenerateContent":
+                return self._send_gemini_stream(request, rng)
+            return self._send_json(gemini_response_body(self.state, request, rng))
+        if path == "/v1/files":
+            return self._upload_file()
+        if path == "/v1/batches":
+            return self._create_openai_batch(json.loads(self._read_body()))
+        match = re.match(r"^/v1beta/(models/[^:]+):batchGenerateContent$", path)
+        if match:
+            return self._create_gemini_batch(match.group(1), json.loads(self._read_body()))
+        # 沒有讀取 request body，不能沿用這條連線
+        self.close_connection = True
+        self._send_json({"error": {"message": f"unknown path {path}"}}, status=404)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        match = re.match(r"^/v1/batches/([^/]+)$", path)
+        if match:
+            return self._send_openai_batch(match.group(1))
+        match = re.match(r"^/v1/files/([^/]+)/content$", path)
+        if match and match.group(1) in self.state.files:
+            data = self.state.files[match.group(1)]["content"]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        match = re.match(r"^/v1beta/(batches/[^/]+)$", path)
+        if match and match.group(1) in self.state.gemini_batches:
+            return self._send_json(self.state.gemini_batches[match.group(1)])
+        self._send_json({"error": {"message": f"unknown path {path}"}}, status=404)
+
+    # ---------------------------- OpenAI 批次 ----------------------------
+
+    def _upload_file(self):
+        raw = b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + self._read_body()
+        message = BytesParser(policy=default_policy).parsebytes(raw)
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        filename, content = fields["file"]
+        purpose = fields.get("purpose", (None, b"batch"))[1].decode()
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.state.files[file_id] = {"content": content, "filename": filename, "purpose": purpose}
+        self._send_json(self._file_object(file_id))
+
+    def _file_object(self, file_id):
+        f = self.state.files[file_id]
+        return {
+            "id": file_id, "object": "file", "bytes": len(f["content"]), "created_at": int(time.time()),
+            "filename": f["filename"] or "input.jsonl", "purpose": f["purpose"], "status": "processed",
+        }
+
+    def _create_openai_batch(self, body):
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        lines = self.state.files[body["input_file_id"]]["content"].decode("utf-8").splitlines()
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": body["endpoint"], "errors": None,
+            "input_file_id": body["input_file_id"], "completion_window": body["completion_window"],
+            "status": "in_progress", "output_file_id": None, "error_file_id": None,
+            "created_at": int(time.time()), "completed_at": None,
+            "request_counts": {"total": len([l for l in lines if l.strip()]), "completed": 0, "failed": 0},
+        }
+        self.state.batches[batch_id] = batch
+        threading.Timer(self.state.batch_delay, self._finish_openai_batch, args=(batch_id, lines)).start()
+        self._send_json(batch)
+
+    def _finish_openai_batch(self, batch_id, lines):
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            output.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": chat_completion_body(self.state, request["body"], self.state.request_rng())},
+                "error": None,
+            }, ensure_ascii=False))
+        output_file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.state.files[output_file_id] = {"content": ("\n".join(output) + "\n").encode("utf-8"), "filename": "output.jsonl", "purpose": "batch_output"}
+        batch = self.state.batches[batch_id]
+        batch.update({
+            "status": "completed", "output_file_id": output_file_id, "completed_at": int(time.time()),
+            "request_counts": {"total": len(output), "completed": len(output), "failed": 0},
+        })
+
+    def _send_openai_batch(self, batch_id):
+        if batch_id not in self.state.batches:
+            return self._send_json({"error": {"message": "batch not found"}}, status=404)
+        self._send_json(self.state.batches[batch_id])
+
+    # ---------------------------- Gemini 批次 ----------------------------
+    # 回應格式依 Gemini REST 文件（batches 以 long-running operation 表示）
+
+    def _create_gemini_batch(self, model, body):
+        batch_body = body.get("batch", body)
+        name = f"batches/{uuid.uuid4().hex[:12]}"
+        requests = batch_body["inputConfig"]["requests"]["requests"] if "inputConfig" in batch_body \
+            else batch_body["input_config"]["requests"]["requests"]
+        metadata = {
+            "@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatch",
+            "name": name, "model": model, "displayName": batch_body.get("displayName") or batch_body.get("display_name"),
+            "state": "BATCH_STATE_RUNNING", "createTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        operation = {"name": name, "metadata": metadata, "done": False}
+        self.state.gemini_batches[name] = operation
+        threading.Timer(self.state.batch_delay, self._finish_gemini_batch, args=(name, requests)).start()
+        self._send_json(operation)
+
+    def _finish_gemini_batch(self, name, requests):
+        responses = [
+            {"response": gemini_response_body(self.state, item["request"], self.state.request_rng()), "metadata": item.get("metadata", {})}
+            for item in requests
+        ]
+        output = {"inlinedResponses": {"inlinedResponses": responses}}
+        operation = self.state.gemini_batches[name]
+        operation["metadata"].update({"state": "BATCH_STATE_SUCCEEDED", "output": output})
+        operation["done"] = True
+        operation["response"] = dict(output, **{"@type": "type.googleapis.com/google.ai.generativelanguage.v1main.GenerateContentBatchOutput"})
+
+
+def add_profile_arguments(parser):
+    """延遲、錯誤與答案分布的命令列參數（benchmark.py 共用）"""
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", default="0", help="回應延遲分布：秒數、uniform:最小,最大、normal:平均,標準差、lognormal:中位數,sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回傳 500 的機率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="隨機回傳 429 的機率")
+    parser.add_argument("--rpm", type=int, default=None, help="每分鐘請求數上限，超過時回傳 429（預設不限）")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="隨機 429 附帶的 Retry-After 秒數")
+    parser.add_argument("--profile", choices=ANSWER_PROFILES, default="varied", help="每題答案分布")
+    parser.add_argument("--stable-p", type=float, default=0.9, help="stable 分布中主要答案的機率")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="沒有題號的回答中每個答案被漏掉的機率")
+
+
+def state_from_args(args):
+    return FakeLLMState(
+        seed=args.seed, batch_delay=getattr(args, "batch_delay", 1.0), stream_delay=getattr(args, "stream_delay", 0.005),
+        profile=args.profile, stable_p=args.stable_p, latency=args.latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, rpm=args.rpm, retry_after=args.retry_after,
+        drop_rate=args.drop_rate,
+    )
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    # 預設的 listen backlog 只有 5，高並行的 benchmark 會出現連線被拒而重試，扭曲測到的吞吐量
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=8765, state=None):
+    handler = type("BoundFakeLLMHandler", (FakeLLMHandler,), {"state": state or FakeLLMState()})
+    return FakeLLMServer((host, port), handler)
+
+
+def start_in_thread(host="127.0.0.1", port=0, state=None):
+    """在背景執行緒啟動伺服器（port=0 表示自動選擇），回傳 server"""
+    server = make_server(host, port, state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="批次完成前的延遲秒數")
+    parser.add_argument("--stream-delay", type=float, default=0.005, help="串流回應片段之間的延遲秒數")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, state_from_args(args))
+    print(f"Fake LLM server 執行中：")
+    print(f"  OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    print(f"  GEMINI_BASE_URL=http://{args.host}:{args.port}")
+    server.serve_forever()
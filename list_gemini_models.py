@@ -1,23 +1,32 @@
-import google.generativeai as genai
 import os
 
-# 設定 API key
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from api_clients import configure_gemini
 
-print("正在列出所有可用的 Gemini 模型...\n")
 
-try:
-    # 列出所有模型
-    models = genai.list_models()
+def main():
+    import google.generativeai as genai
 
-    print("=== 可用的模型 ===\n")
-    for model in models:
-        # 檢查是否支援 generateContent
-        if 'generateContent' in model.supported_generation_methods:
-            print(f"✓ {model.name}")
-            print(f"  描述: {model.display_name}")
-            print(f"  支援的方法: {', '.join(model.supported_generation_methods)}")
-            print()
+    # 設定 API key（設定 GEMINI_BASE_URL 時改連本機 fake server）
+    configure_gemini(os.getenv("GEMINI_BASE_URL"))
 
-except Exception as e:
-    print(f"錯誤: {e}")
+    print("正在列出所有可用的 Gemini 模型...\n")
+
+    try:
+        # 列出所有模型
+        models = genai.list_models()
+
+        print("=== 可用的模型 ===\n")
+        for model in models:
+            # 檢查是否支援 generateContent
+            if 'generateContent' in model.supported_generation_methods:
+                print(f"✓ {model.name}")
+                print(f"  描述: {model.display_name}")
+                print(f"  支援的方法: {', '.join(model.supported_generation_methods)}")
+                print()
+
+    except Exception as e:
+        print(f"錯誤: {e}")
+
+
+if __name__ == "__main__":
+    main()
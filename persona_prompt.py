@@ -0,0 +1,110 @@
+# persona_prompt.py
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+# 編譯結果的磁碟快取目錄
+PROMPT_CACHE_DIR = ".prompt_cache"
+
+# Gemini CachedContent 的存活時間；剩下不到 GEMINI_CACHE_REFRESH 時延長（沿用既有快取時也會重設）
+GEMINI_CACHE_TTL = timedelta(hours=1)
+GEMINI_CACHE_REFRESH = timedelta(minutes=10)
+
+# CachedContent 已過期或被刪除時的錯誤訊息（API 回傳 403 / 404，不是暫時性錯誤，但重建快取即可恢復）
+CACHE_MISSING_MESSAGE = re.compile(
+    r"cache[ds]?[ _]?content.*(not found|expired|does not exist|permission)"
+    r"|(not found|expired|does not exist).*cache[ds]?[ _]?content",
+    re.IGNORECASE | re.DOTALL,
+)
+
+CompiledPrompt = namedtuple("CompiledPrompt", ["text", "sha256"])
+
+
+def canonical_ppv(ppv_data):
+    """PPV 的標準形式：排序 key、不縮排、不轉義中文，同樣內容永遠得到同樣位元組"""
+    return json.dumps(ppv_data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def compile_persona_prompt(template, ppv_path=None):
+    """把 PPV 套入模板（以 {ppv} 標記位置），回傳 CompiledPrompt(text, sha256)
+
+    結果以「模板 + PPV 檔案內容」的雜湊值快取在 PROMPT_CACHE_DIR，
+    同一份 PPV 與模板只會編譯一次。
+    """
+    ppv_bytes = b""
+    if ppv_path is not None:
+        with open(ppv_path, "rb") as f:
+            ppv_bytes = f.read()
+
+    source_hash = hashlib.sha256(template.encode("utf-8") + b"\0" + ppv_bytes).hexdigest()
+    cache_path = os.path.join(PROMPT_CACHE_DIR, f"{source_hash}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        return CompiledPrompt(cached["text"], cached["sha256"])
+
+    text = template.strip() + "\n"
+    if ppv_path is not None:
+        text = text.replace("{ppv}", canonical_ppv(json.loads(ppv_bytes.decode("utf-8"))))
+    compiled = CompiledPrompt(text, hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+    os.makedirs(PROMPT_CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"text": compiled.text, "sha256": compiled.sha256}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return compiled
+
+
+def openai_cache_params(prompt):
+    """OpenAI 自動 prefix caching：system prompt 固定放在最前面，並以 prompt 雜湊值作為 prompt_cache_key，
+    讓同一個人格的請求被導向同一份快取"""
+    return {"prompt_cache_key": f"persona-{prompt.sha256[:32]}"}
+
+
+def gemini_cached_model(model_name, prompt, generation_config=None, safety_settings=None, ttl=GEMINI_CACHE_TTL):
+    """建立使用 Gemini CachedContent 的模型，人格 prompt 只需付費、處理一次
+
+    同名（依 prompt 雜湊值）的快取已存在時沿用並把存活時間重設為 ttl，不存在（或已過期）時重新建立；
+    模型不支援或 prompt 低於快取的最小 token 數時，退回一般的 system_instruction。
+    長時間執行時由 provider 在快取到期前再呼叫一次（見 GEMINI_CACHE_REFRESH）。
+    """
+    import google.generativeai as genai
+
+    display_name = f"persona-{prompt.sha256[:32]}"
+    try:
+        cache = None
+        for existing in genai.caching.CachedContent.list():
+            if existing.display_name == display_name and existing.model == model_name:
+                cache = existing
+                break
+        if cache is not None:
+            cache.update(ttl=ttl)
+        else:
+            cache = genai.caching.CachedContent.create(
+                model=model_name,
+                display_name=display_name,
+                system_instruction=prompt.text,
+                ttl=ttl,
+            )
+        return genai.GenerativeModel.from_cached_content(
+            cached_content=cache,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+        )
+    except Exception as e:
+        print(f"提示：無法使用 Gemini CachedContent（{e}），改用一般 system_instruction")
+        return genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            safety_settings=safety_settings,
+            system_instruction=prompt.text,
+        )
+
+
+def is_cache_missing_error(exc):
+    """錯誤是否代表 CachedContent 已過期或不存在（需要重建快取）"""
+    return bool(CACHE_MISSING_MESSAGE.search(str(exc)))
@@ -0,0 +1,117 @@
+# prompt_templates.py
+# 各 prompt 版本的人格模板：ppv = 帶入 PPV（以 {ppv} 標記位置），none = 不帶 PPV 的基準版本
+
+TEMPLATES = {
+    # ask_gpt5_final.py / ask_gemini_final.py 系列（1~3 量表）
+    "final": {
+        "ppv": """
+請扮演以下 PPV 的人格：
+{ppv}
+
+從現在開始回答我給你的問題。
+
+作答方式：
+1 = 不符合
+2 = 不算符合也不算不符合
+3 = 符合
+
+輸出格式範例：1, 2, 3...
+""",
+        "none": """
+妳作為自己，從現在開始回答我給你的問題。
+
+作答方式：
+1 = 不符合
+2 = 不算符合也不算不符合
+3 = 符合
+
+輸出格式範例：1, 2, 3...
+""",
+    },
+    # ask_gpt5_v2.py / ask_gpt5_no_ppv.py（A~E 量表）
+    "v2": {
+        "ppv": """
+你是一個具有固定價值觀與決策習慣的角色，請依以下原則回答問題：
+【PPV】{ppv}
+【決策優先順序】
+1. 穩定性
+2. 可控制度
+3. 長期利益
+4. 效率
+5. 避免極端選項
+
+【回答規則】
+- 每題僅回答 A~E 中一個選項。
+- 若有兩個選項相近，選更穩健、可控或長期的選項。
+- 答案要保持傾向一致性，但允許少量波動。
+- 不要解釋，不要描述理由，只回答選項字母。
+- 請依序回答所有題目，格式為：A, B, C...（依此類推）
+""",
+        "none": """
+你是一個具有固定決策傾向的角色，回答問題時遵循以下原則：
+1. 優先選擇穩健、可控、長期有利的選項。
+2. 避免極端或冒險的選擇。
+
+【回答規則】
+- 每題僅回答 A~E 中一個選項。
+- 答案應保持一致性，但允許少量波動。
+- 不要解釋，不要描述理由，只回答選項字母。
+- 請依序回答所有題目，格式為：A, B, C...（依此類推）
+""",
+    },
+    # ask_gpt5_v2_finetuned_prompt.py（A~E，附理由與信心水準）
+    "v2_finetuned": {
+        "ppv": """
+你是一個具有固定價值觀與決策習慣的角色，請依以下原則回答問題：
+【PPV】{ppv}
+【決策優先順序】
+1. 穩定性
+2. 可控制度
+3. 長期利益
+4. 效率
+5. 避免極端選項
+
+【回答規則】
+- 每題僅回答 A~E 中一個選項。
+- 請仔細思考並且基於 PPV 中的哪些具體維度做出選擇。
+- 請先回答選項字母（A~E），然後用 1-2 句話簡明扼要地說明選擇這個答案的理由。
+- 在回答時，請附上選擇當下時的信心水準（0-100分，100分代表最有信心）。
+- 若有不確定的部分，請給予較低的信心分數（例如：30-50分）。
+- 請依序回答所有題目，格式範例：
+  第1題：A（理由說明）- 信心水準：85分
+  第2題：B（理由說明）- 信心水準：70分
+""",
+    },
+}
+
+
+# 補問缺答題目時附在題目後的說明（{options} 為可用選項）
+REPAIR_INSTRUCTION = "上一次的回答缺少或無法判讀以上題目，請只回答這幾題，每題一行，格式：第N題：答案（可用選項：{options}）"
+
+# 自適應抽樣只問尚未穩定的題目時附在題目後的說明（題號維持原本的編號）
+SUBSET_INSTRUCTION = "這次只需要回答以上幾題，請每題一行，格式：第N題：答案（可用選項：{options}）"
+
+
+# 結構化輸出模式附在題目後的說明（實際格式由 JSON schema 強制）
+STRUCTURED_INSTRUCTION = (
+    "請以 JSON 回答上面所有題目：answers 陣列中每題一項，question_id 為題號，answer 為選項（{options}），"
+    "confidence 為 0-100 的信心水準，reason 為一句話的理由。"
+)
+
+
+def get_template(name, with_ppv):
+    """取得模板文字；該版本沒有對應的 PPV / 無 PPV 模板時拋出 ValueError"""
+    if name not in TEMPLATES:
+        raise ValueError(f"未知的 prompt 模板: {name}（可用: {', '.join(TEMPLATES)}）")
+    key = "ppv" if with_ppv else "none"
+    if key not in TEMPLATES[name]:
+        raise ValueError(f"模板 {name} 沒有{'帶 PPV' if with_ppv else '不帶 PPV'}的版本")
+    return TEMPLATES[name][key]
+
+
+def format_question(idx, q):
+    """單一題目的文字；題目有自訂選項時附在下一行"""
+    text = f"第 {idx+1} 題: {q['q']}"
+    if q.get("options"):
+        text += f"\n選項: {', '.join(q['options'])}"
+    return text
@@ -0,0 +1,376 @@
+# providers.py
+import asyncio
+import os
+import time
+
+from persona_prompt import (
+    openai_cache_params, gemini_cached_model, is_cache_missing_error, GEMINI_CACHE_TTL, GEMINI_CACHE_REFRESH
+)
+from response_cache import prompt_hash
+from rate_limiter import get_rate_limiter, estimate_tokens, is_rate_limit_error, retry_after_from_error
+from batch_runner import run_openai_batch, run_gemini_batch
+from retry_policy import RetryPolicy, CircuitBreaker
+from answer_distributions import TOP_LOGPROBS
+import telemetry
+import api_clients
+
+
+def record_openai_usage(usage):
+    if usage is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        telemetry.record_usage(usage.prompt_tokens, usage.completion_tokens, getattr(details, "cached_tokens", None))
+
+
+def record_gemini_usage(usage):
+    """Gemini 的輸出 tokens 另外加上思考 tokens（同樣以輸出價格計費）"""
+    if usage is not None:
+        output_tokens = (usage.candidates_token_count or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+        telemetry.record_usage(usage.prompt_token_count, output_tokens, usage.cached_content_token_count)
+
+
+def gemini_schema(schema):
+    """Gemini 的 response_schema 不支援 additionalProperties，遞迴移除"""
+    if isinstance(schema, dict):
+        return {key: gemini_schema(value) for key, value in schema.items() if key != "additionalProperties"}
+    if isinstance(schema, list):
+        return [gemini_schema(value) for value in schema]
+    return schema
+
+
+class Provider:
+    """各 provider 共用的預算：同時進行中的請求數上限（所有條件共用）、rate limiter、重試策略與 circuit breaker"""
+
+    def __init__(self, model, concurrency, tier=None, retry=None, circuit_breaker=None, pricing=None, rpm=None, tpm=None):
+        self.name = model
+        self.model = model
+        self.concurrency = concurrency
+        # 依模型與付費等級（環境變數 OPENAI_TIER / GEMINI_TIER）控制請求速率；設定檔的 rpm / tpm 優先
+        self.rate_limiter = get_rate_limiter(model, tier, rpm, tpm)
+        # retry / circuit_breaker 為設定檔中的參數 dict
+        self.retry_policy = RetryPolicy(**(retry or {}))
+        self.breaker = CircuitBreaker(name=model, **(circuit_breaker or {}))
+        # 每百萬 tokens 的美元價格 {"input", "cached_input", "output"}，用於請求統計的費用
+        self.pricing = pricing
+        self._slots = None
+
+    @property
+    def slots(self):
+        """同一個 provider 的所有條件共用的並行額度（在 event loop 中第一次使用時建立）"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        return self._slots
+
+    def throttled(self, exc):
+        """收到 429 時讓這個 provider 的所有回合一起放慢"""
+        if is_rate_limit_error(exc):
+            self.rate_limiter.penalize(retry_after_from_error(exc))
+
+
+class OpenAIProvider(Provider):
+    """OpenAI Chat Completions：system prompt 放最前面，每題一則 user message"""
+
+    def __init__(self, model, concurrency=8, params=None, tier=None, retry=None, circuit_breaker=None, pricing=None,
+                 rpm=None, tpm=None):
+        super().__init__(model, concurrency, tier, retry, circuit_breaker, pricing, rpm, tpm)
+        # 額外的生成參數（GPT-5 不支援 temperature，預設不帶任何參數）
+        self.params = params or {}
+
+    @property
+    def client(self):
+        return api_clients.openai_client()
+
+    @property
+    def async_client(self):
+        """整個 process 共用的 client（連線池由所有 OpenAI provider 與條件共用）"""
+        return api_clients.openai_async_client()
+
+    def build_request(self, persona, questions):
+        messages = [{"role": "system", "content": persona.text}]
+        for q_text in questions:
+            messages.append({"role": "user", "content": q_text})
+        return messages
+
+    def request_hash(self, persona, request):
+        return prompt_hash(request)
+
+    def cache_params(self):
+        return self.params
+
+    def structured_params(self, response_schema):
+        """結構化輸出：strict JSON schema"""
+        if response_schema is None:
+            return {}
+        return {"response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": "questionnaire_answers", "strict": True, "schema": response_schema},
+        }}
+
+    async def _create_async(self, persona, request, **extra):
+        """等待並行與速率額度後送出一個請求，回傳完整的 response"""
+        estimated_tokens = estimate_tokens("".join(message["content"] for message in request))
+        async with self.slots:
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            telemetry.record_sent()
+            try:
+                # with_raw_response 才讀得到 x-ratelimit-* header
+                raw = await self.async_client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=request,
+                    **openai_cache_params(persona),   # 同一人格共用 prompt prefix cache
+                    **self.params,
+                    **extra,
+                )
+            except Exception as e:
+                self.throttled(e)
+                raise
+        self.rate_limiter.update_from_headers(raw.headers)
+        response = raw.parse()
+        record_openai_usage(response.usage)
+        self.rate_limiter.record_success()
+        return response
+
+    async def generate_async(self, persona, request, response_schema=None):
+        """送出一個回合，回傳回答文字；沒有內容時回傳 None
+
+        response_schema 不為 None 時要求模型輸出符合該 JSON schema 的回答。
+        """
+        response = await self._create_async(persona, request, **self.structured_params(response_schema))
+        content = response.choices[0].message.content
+        return content.strip() if content else None
+
+    async def stream_async(self, persona, request, response_schema=None, on_sent=None):
+        """以串流送出一個回合，逐段 yield 回答文字；on_sent 在請求送出時呼叫（用來計時，不含排隊時間）"""
+        estimated_tokens = estimate_tokens("".join(message["content"] for message in request))
+        async with self.slots:
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            telemetry.record_sent()
+            if on_sent is not None:
+                on_sent()
+            try:
+                raw = await self.async_client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=request,
+                    stream=True,
+                    stream_options={"include_usage": True},   # 最後一個 chunk 附上 token 用量
+                    **openai_cache_params(persona),
+                    **self.params,
+                    **self.structured_params(response_schema),
+                )
+                self.rate_limiter.update_from_headers(raw.headers)
+                stream = raw.parse()
+                # 提早中止時關閉連線，不再接收剩下的輸出
+                async with stream:
+                    async for chunk in stream:
+                        record_openai_usage(getattr(chunk, "usage", None))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            telemetry.record_first_token()
+                            yield chunk.choices[0].delta.content
+            except Exception as e:
+                self.throttled(e)
+                raise
+        self.rate_limiter.record_success()
+
+    async def logprobs_async(self, persona, request, response_schema=None, top_logprobs=TOP_LOGPROBS):
+        """送出一個帶 logprobs 的回合，回傳 [(token, [(候選 token, logprob), ...]), ...]；沒有內容時回傳 None
+
+        GPT-5 等推理模型不支援 logprobs，會回傳 400（client_error）。
+        """
+        response = await self._create_async(
+            persona, request, logprobs=True, top_logprobs=top_logprobs, **self.structured_params(response_schema)
+        )
+        logprobs = response.choices[0].logprobs
+        if logprobs is None or not logprobs.content:
+            return None
+        return [
+            (item.token, [(candidate.token, candidate.logprob) for candidate in item.top_logprobs])
+            for item in logprobs.content
+        ]
+
+    def run_batch(self, persona, request, rounds, name, response_schema=None, batch_id=None, on_submit=None):
+        extra_body = {**openai_cache_params(persona), **self.params, **self.structured_params(response_schema)}
+        return run_openai_batch(
+            self.client, self.model, request, rounds, extra_body=extra_body, name=name, batch_id=batch_id, on_submit=on_submit
+        )
+
+
+class GeminiProvider(Provider):
+    """Gemini generateContent：人格 prompt 放進 CachedContent，所有題目合成一段文字"""
+
+    def __init__(self, model, concurrency=4, generation_config=None, safety_settings=None, tier=None,
+                 retry=None, circuit_breaker=None, pricing=None, rpm=None, tpm=None):
+        super().__init__(model, concurrency, tier, retry, circuit_breaker, pricing, rpm, tpm)
+        self.generation_config = generation_config
+        self.safety_settings = safety_settings
+        # 每個人格 prompt 各自一個模型（各自的 CachedContent），同一個 process 內共用
+        self._models = {}
+        # 每個模型的快取要在什麼時候（time.monotonic()）延長存活時間
+        self._refresh_at = {}
+        # 設定 GEMINI_BASE_URL 時（本機 fake server）改用 REST transport
+        self.base_url = os.getenv("GEMINI_BASE_URL")
+
+    def _model_for(self, persona, stale=None):
+        """人格 prompt 對應的模型；快取快到期時延長存活時間，stale 為剛發現快取已失效的模型時重建
+
+        同時有多個回合發現快取失效時，只有第一個會重建，其他回合直接拿到新的模型。
+        """
+        key = persona.sha256
+        model = self._models.get(key)
+        if model is None or model is stale or time.monotonic() >= self._refresh_at[key]:
+            # 測試時指向本機的 fake_llm_server.py（REST）
+            api_clients.configure_gemini(self.base_url)
+            self._models[key] = gemini_cached_model(
+                self.model, persona, self.generation_config, self.safety_settings, ttl=GEMINI_CACHE_TTL
+            )
+            self._refresh_at[key] = time.monotonic() + (GEMINI_CACHE_TTL - GEMINI_CACHE_REFRESH).total_seconds()
+        return self._models[key]
+
+    async def _call_model(self, model, request, generation_config=None, stream=False):
+        """送出 generateContent；REST transport 沒有 async 版本，改在執行緒中呼叫同步 API"""
+        if self.base_url:
+            return await asyncio.to_thread(model.generate_content, request, generation_config=generation_config, stream=stream)
+        return await model.generate_content_async(request, generation_config=generation_config, stream=stream)
+
+    async def _chunks(self, response):
+        """逐段取出串流回應（REST transport 的同步 iterator 在執行緒中讀取）"""
+        if not self.base_url:
+            async for chunk in response:
+                yield chunk
+            return
+        iterator = iter(response)
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def build_request(self, persona, questions):
+        return "".join(f"{q_text}\n" for q_text in questions)
+
+    def request_hash(self, persona, request):
+        return prompt_hash(persona.sha256, request)
+
+    def cache_params(self):
+        return {"generation_config": self.generation_config, "safety_settings": self.safety_settings}
+
+    def structured_config(self, response_schema):
+        """結構化輸出：JSON 回應 + response_schema（會與模型的 generation_config 合併）"""
+        if response_schema is None:
+            return {}
+        return {"response_mime_type": "application/json", "response_schema": gemini_schema(response_schema)}
+
+    async def _generate_async(self, persona, request, generation_config=None):
+        """等待並行與速率額度後送出一個請求，回傳完整的 response；generation_config 會與模型的設定合併"""
+        model = self._model_for(persona)
+        estimated_tokens = estimate_tokens(persona.text + request)
+        async with self.slots:
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            telemetry.record_sent()
+            try:
+                try:
+                    response = await self._call_model(model, request, generation_config)
+                except Exception as e:
+                    if not is_cache_missing_error(e):
+                        raise
+                    # CachedContent 已過期或被刪除：重建後再送一次（否則每個回合都會是不重試的 4xx）
+                    print(f"[{self.model}] Gemini CachedContent 已失效，重新建立")
+                    model = self._model_for(persona, stale=model)
+                    response = await self._call_model(model, request, generation_config)
+            except Exception as e:
+                self.throttled(e)
+                raise
+
+        # 以實際輸入 token 數修正 rate limiter 的預估（預估只涵蓋輸入；Gemini 不回傳剩餘配額的 header，配額用盡只能由 429 得知）
+        usage = getattr(response, "usage_metadata", None)
+        actual_tokens = getattr(usage, "prompt_token_count", None) if usage else None
+        self.rate_limiter.record_usage(estimated_tokens, actual_tokens)
+        self.rate_limiter.record_success()
+        record_gemini_usage(usage)
+        return response
+
+    async def generate_async(self, persona, request, response_schema=None):
+        """送出一個回合，回傳回答文字；回應被阻擋時回傳 None"""
+        response = await self._generate_async(persona, request, self.structured_config(response_schema) or None)
+        if not response.candidates or not response.candidates[0].content.parts:
+            return None
+        return response.text.strip()
+
+    async def stream_async(self, persona, request, response_schema=None, on_sent=None):
+        """以串流送出一個回合，逐段 yield 回答文字（被阻擋的片段略過）；on_sent 在請求送出時呼叫"""
+        model = self._model_for(persona)
+        estimated_tokens = estimate_tokens(persona.text + request)
+        async with self.slots:
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            telemetry.record_sent()
+            if on_sent is not None:
+                on_sent()
+            received = False
+            try:
+                for attempt in range(2):
+                    try:
+                        response = await self._call_model(
+                            model, request, self.structured_config(response_schema) or None, stream=True
+                        )
+                        async for chunk in self._chunks(response):
+                            if chunk.candidates and chunk.candidates[0].content.parts:
+                                received = True
+                                telemetry.record_first_token()
+                                yield chunk.text
+                        break
+                    except Exception as e:
+                        # CachedContent 已失效且還沒收到任何內容：重建後再送一次
+                        if attempt or received or not is_cache_missing_error(e):
+                            raise
+                        print(f"[{self.model}] Gemini CachedContent 已失效，重新建立")
+                        model = self._model_for(persona, stale=model)
+            except Exception as e:
+                self.throttled(e)
+                raise
+
+        usage = getattr(response, "usage_metadata", None)
+        actual_tokens = getattr(usage, "prompt_token_count", None) if usage else None
+        self.rate_limiter.record_usage(estimated_tokens, actual_tokens)
+        self.rate_limiter.record_success()
+        record_gemini_usage(usage)
+
+    async def logprobs_async(self, persona, request, response_schema=None, top_logprobs=TOP_LOGPROBS):
+        """送出一個帶 logprobs 的回合，回傳格式同 OpenAIProvider.logprobs_async；被阻擋或模型沒有回傳 logprobs 時回傳 None"""
+        generation_config = {"response_logprobs": True, "logprobs": top_logprobs, **self.structured_config(response_schema)}
+        response = await self._generate_async(persona, request, generation_config)
+        if not response.candidates or not response.candidates[0].content.parts:
+            return None
+        result = response.candidates[0].logprobs_result
+        if not result or not result.chosen_candidates:
+            return None
+        return [
+            (chosen.token, [(candidate.token, candidate.log_probability) for candidate in top.candidates])
+            for chosen, top in zip(result.chosen_candidates, result.top_candidates)
+        ]
+
+    def run_batch(self, persona, request, rounds, name, response_schema=None, batch_id=None, on_submit=None):
+        generation_config = {**(self.generation_config or {}), **self.structured_config(response_schema)}
+        return run_gemini_batch(
+            self.model, persona.text, request, rounds, generation_config=generation_config,
+            safety_settings=self.safety_settings, name=name, batch_id=batch_id, on_submit=on_submit
+        )
+
+
+# 設定檔中 provider 的 type → 類別
+PROVIDER_TYPES = {
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+}
+
+
+def make_provider(name, settings):
+    """依設定建立 provider；name 為設定檔 providers 區段的 key，settings 為其內容"""
+    settings = dict(settings)
+    provider_type = settings.pop("type")
+    if provider_type not in PROVIDER_TYPES:
+        raise ValueError(f"未知的 provider 類型: {provider_type}（可用: {', '.join(PROVIDER_TYPES)}）")
+    provider = PROVIDER_TYPES[provider_type](**settings)
+    provider.name = name
+    provider.breaker.name = name
+    if isinstance(provider, OpenAIProvider):
+        # 共用連線池的大小依所有 OpenAI provider 的並行數決定
+        api_clients.reserve(name, provider.concurrency)
+    return provider
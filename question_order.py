@@ -0,0 +1,68 @@
+# question_order.py
+# 每回合的題目順序隨機化：由 (seed, 回合) 決定的排列，只需保存 seed 與索引陣列即可重現
+# 題目依排列後的順序重新編號送出，解析後再依排列放回原本的題號；同樣的回合數也能量測題序效應
+import numpy as np
+
+from stability import MISSING
+
+
+def round_order(seed, round_idx, num_questions):
+    """第 round_idx 回合的題目順序：依序列出的原題目索引（從 0 起算），同一個 seed 與回合永遠相同"""
+    return np.random.default_rng([seed, round_idx]).permutation(num_questions).astype(np.int16)
+
+
+def unpermute(values, order, num_questions):
+    """把依送出順序排列的值（答案、各題計時等）放回原本的題目位置，沒有送出的題目為 None"""
+    canonical = [None] * num_questions
+    for position, idx in enumerate(order):
+        if position < len(values):
+            canonical[idx] = values[position]
+    return canonical
+
+
+def canonical_numbers(numbers, order):
+    """送出時的題號（從 1 起算）→ 原本的題號"""
+    return [int(order[number - 1]) + 1 for number in numbers if 0 < number <= len(order)]
+
+
+def position_matrix(orders, num_questions):
+    """每回合每題出現的位置（回合 × 題目，從 0 起算）；順序為 None 的回合為原本順序，沒有送出的題目為 MISSING"""
+    positions = np.full((len(orders), num_questions), MISSING, dtype=np.int16)
+    for round_idx, order in enumerate(orders):
+        if order is None:
+            positions[round_idx] = np.arange(num_questions)
+        else:
+            positions[round_idx, np.asarray(order, dtype=np.int64)] = np.arange(len(order))
+    return positions
+
+
+def order_effects(matrix, positions, num_options):
+    """比較每題出現在前半段與後半段時的作答：平均答案（0~1）與和整體眾數一致的比例
+
+    matrix 為答案矩陣（回合 × 題目，缺答為 MISSING），positions 為 position_matrix 的結果；
+    回傳每題的陣列 dict，某一半沒有答案的題目為 NaN。
+    """
+    valid = (matrix >= 0) & (positions >= 0)
+    presented = (positions >= 0).sum(axis=1, keepdims=True)
+    early = valid & (positions < presented / 2)
+    late = valid & ~early
+    values = np.where(valid, matrix, 0) / (num_options - 1)
+    counts = np.stack([((matrix == k) & valid).sum(axis=0) for k in range(num_options)], axis=1)
+    agree = valid & (matrix == counts.argmax(axis=1)[None, :])
+
+    def mean(x, mask):
+        n = mask.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, (x * mask).sum(axis=0) / n, np.nan)
+
+    effects = {
+        "early_n": early.sum(axis=0),
+        "late_n": late.sum(axis=0),
+        "early_mean": mean(values, early),
+        "late_mean": mean(values, late),
+        "early_agreement": mean(agree, early),
+        "late_agreement": mean(agree, late),
+    }
+    effects["mean_shift"] = effects["late_mean"] - effects["early_mean"]
+    effects["agreement_shift"] = effects["late_agreement"] - effects["early_agreement"]
+    return effects
@@ -1,62 +1,73 @@
-# Big Five 人格量表（50 題）
+# Big Five 人格量表（50 題，IPIP 50 題版本）
+# 每題的 trait 為所屬特質（key 與 PPV 的 big5 區塊相同），reverse 為反向計分題（「符合」代表該特質較低）
+
+# 特質 key → 中文名稱（依題目順序）
+BIG5_TRAITS = {
+    "extraversion": "外向性",
+    "agreeableness": "親和性",
+    "conscientiousness": "嚴謹性",
+    "neuroticism": "神經質",
+    "openness": "開放性",
+}
+
 questions_list = [
     # 外向性 Extraversion (E1-E10)
-    {"q": "我在聚會裡常常是帶動氣氛的那一個。"},
-    {"q": "我平常話不多。"},
-    {"q": "跟一群人在一起時，我通常覺得很自在。"},
-    {"q": "在人多的場合，我習慣待在後面、不出頭。"},
-    {"q": "我很容易主動跟別人搭話。"},
-    {"q": "我常常不知道要說什麼，所以選擇安靜。"},
-    {"q": "參加活動時，我會到處跟不同的人聊天。"},
-    {"q": "我不喜歡成為別人注意的焦點。"},
-    {"q": "被大家注意、成為焦點時，我覺得還好，甚至有點享受。"},
-    {"q": "面對陌生人時，我通常非常安靜。"},
+    {"q": "我在聚會裡常常是帶動氣氛的那一個。", "trait": "extraversion", "reverse": False},
+    {"q": "我平常話不多。", "trait": "extraversion", "reverse": True},
+    {"q": "跟一群人在一起時，我通常覺得很自在。", "trait": "extraversion", "reverse": False},
+    {"q": "在人多的場合，我習慣待在後面、不出頭。", "trait": "extraversion", "reverse": True},
+    {"q": "我很容易主動跟別人搭話。", "trait": "extraversion", "reverse": False},
+    {"q": "我常常不知道要說什麼，所以選擇安靜。", "trait": "extraversion", "reverse": True},
+    {"q": "參加活動時，我會到處跟不同的人聊天。", "trait": "extraversion", "reverse": False},
+    {"q": "我不喜歡成為別人注意的焦點。", "trait": "extraversion", "reverse": True},
+    {"q": "被大家注意、成為焦點時，我覺得還好，甚至有點享受。", "trait": "extraversion", "reverse": False},
+    {"q": "面對陌生人時，我通常非常安靜。", "trait": "extraversion", "reverse": True},
 
     # 親和性 Agreeableness (A1-A10)
-    {"q": "我對別人的處境其實不太在意。"},
-    {"q": "我真心對人有興趣，會想了解他們。"},
-    {"q": "我有時會用說話方式傷到別人。"},
-    {"q": "我會替別人的感受著想。"},
-    {"q": "別人的煩惱通常跟我沒什麼關係。"},
-    {"q": "我覺得自己很有同理心。"},
-    {"q": "老實說，我不太在乎其他人。"},
-    {"q": "我願意花時間幫忙別人。"},
-    {"q": "別人心情不好時，我感受得到他們的情緒。"},
-    {"q": "跟我在一起時，多數人會覺得放鬆、自在。"},
+    {"q": "我對別人的處境其實不太在意。", "trait": "agreeableness", "reverse": True},
+    {"q": "我真心對人有興趣，會想了解他們。", "trait": "agreeableness", "reverse": False},
+    {"q": "我有時會用說話方式傷到別人。", "trait": "agreeableness", "reverse": True},
+    {"q": "我會替別人的感受著想。", "trait": "agreeableness", "reverse": False},
+    {"q": "別人的煩惱通常跟我沒什麼關係。", "trait": "agreeableness", "reverse": True},
+    {"q": "我覺得自己很有同理心。", "trait": "agreeableness", "reverse": False},
+    {"q": "老實說，我不太在乎其他人。", "trait": "agreeableness", "reverse": True},
+    {"q": "我願意花時間幫忙別人。", "trait": "agreeableness", "reverse": False},
+    {"q": "別人心情不好時，我感受得到他們的情緒。", "trait": "agreeableness", "reverse": False},
+    {"q": "跟我在一起時，多數人會覺得放鬆、自在。", "trait": "agreeableness", "reverse": False},
 
     # 嚴謹性 Conscientiousness (C1-C10)
-    {"q": "我通常事先準備好自己需要的東西。"},
-    {"q": "我的東西常常亂放在各個角落。"},
-    {"q": "我做事會注意細節。"},
-    {"q": "我有時會把事情弄得亂七八糟。"},
-    {"q": "我要做的事通常會很快處理完。"},
-    {"q": "我常忘記把東西放回原來的位置。"},
-    {"q": "我喜歡生活和工作都是井然有序的。"},
-    {"q": "我有時會故意拖延或閃避應該完成的事情。"},
-    {"q": "我習慣依照行程或計畫表來安排一天。"},
-    {"q": "我對自己的工作要求很高、做事很講究。"},
+    {"q": "我通常事先準備好自己需要的東西。", "trait": "conscientiousness", "reverse": False},
+    {"q": "我的東西常常亂放在各個角落。", "trait": "conscientiousness", "reverse": True},
+    {"q": "我做事會注意細節。", "trait": "conscientiousness", "reverse": False},
+    {"q": "我有時會把事情弄得亂七八糟。", "trait": "conscientiousness", "reverse": True},
+    {"q": "我要做的事通常會很快處理完。", "trait": "conscientiousness", "reverse": False},
+    {"q": "我常忘記把東西放回原來的位置。", "trait": "conscientiousness", "reverse": True},
+    {"q": "我喜歡生活和工作都是井然有序的。", "trait": "conscientiousness", "reverse": False},
+    {"q": "我有時會故意拖延或閃避應該完成的事情。", "trait": "conscientiousness", "reverse": True},
+    {"q": "我習慣依照行程或計畫表來安排一天。", "trait": "conscientiousness", "reverse": False},
+    {"q": "我對自己的工作要求很高、做事很講究。", "trait": "conscientiousness", "reverse": False},
 
     # 神經質 Neuroticism (N1-N10)
-    {"q": "我很容易感到壓力。"},
-    {"q": "大多數時間，我都蠻放鬆、不怎麼緊張。"},
-    {"q": "我常常會為各種事情擔心。"},
-    {"q": "我很少覺得自己情緒低落。"},
-    {"q": "小事情也容易讓我心神不寧。"},
-    {"q": "我很容易被惹毛或心情變差。"},
-    {"q": "我的心情變化很大。"},
-    {"q": "我的情緒常常忽好忽壞。"},
-    {"q": "別人覺得我很容易被激怒。"},
-    {"q": "我時不時會陷入憂鬱或沮喪的情緒。"},
+    {"q": "我很容易感到壓力。", "trait": "neuroticism", "reverse": False},
+    {"q": "大多數時間，我都蠻放鬆、不怎麼緊張。", "trait": "neuroticism", "reverse": True},
+    {"q": "我常常會為各種事情擔心。", "trait": "neuroticism", "reverse": False},
+    {"q": "我很少覺得自己情緒低落。", "trait": "neuroticism", "reverse": True},
+    {"q": "小事情也容易讓我心神不寧。", "trait": "neuroticism", "reverse": False},
+    {"q": "我很容易被惹毛或心情變差。", "trait": "neuroticism", "reverse": False},
+    {"q": "我的心情變化很大。", "trait": "neuroticism", "reverse": False},
+    {"q": "我的情緒常常忽好忽壞。", "trait": "neuroticism", "reverse": False},
+    {"q": "別人覺得我很容易被激怒。", "trait": "neuroticism", "reverse": False},
+    {"q": "我時不時會陷入憂鬱或沮喪的情緒。", "trait": "neuroticism", "reverse": False},
 
     # 開放性 Openness (O1-O10)
-    {"q": "我的詞彙量算多，表達方式也蠻多變。"},
-    {"q": "我在理解抽象概念時，常覺得有點吃力。"},
-    {"q": "我有很豐富、生動的想像力。"},
-    {"q": "我對抽象、理論性的東西不太有興趣。"},
-    {"q": "我常會冒出一些不錯的新點子。"},
-    {"q": "我覺得自己的想像力其實普通而已。"},
-    {"q": "我很快就能理解新的觀念或知識。"},
-    {"q": "我有時會使用比較艱深或專業的詞語。"},
-    {"q": "我喜歡自己一個人安靜地想事情。"},
-    {"q": "我的腦袋裡常常充滿各種不同的想法。"}
+    {"q": "我的詞彙量算多，表達方式也蠻多變。", "trait": "openness", "reverse": False},
+    {"q": "我在理解抽象概念時，常覺得有點吃力。", "trait": "openness", "reverse": True},
+    {"q": "我有很豐富、生動的想像力。", "trait": "openness", "reverse": False},
+    {"q": "我對抽象、理論性的東西不太有興趣。", "trait": "openness", "reverse": True},
+    {"q": "我常會冒出一些不錯的新點子。", "trait": "openness", "reverse": False},
+    {"q": "我覺得自己的想像力其實普通而已。", "trait": "openness", "reverse": True},
+    {"q": "我很快就能理解新的觀念或知識。", "trait": "openness", "reverse": False},
+    {"q": "我有時會使用比較艱深或專業的詞語。", "trait": "openness", "reverse": False},
+    {"q": "我喜歡自己一個人安靜地想事情。", "trait": "openness", "reverse": False},
+    {"q": "我的腦袋裡常常充滿各種不同的想法。", "trait": "openness", "reverse": False}
 ]
@@ -0,0 +1,193 @@
+# rate_limiter.py
+import asyncio
+import os
+import re
+import threading
+import time
+
+# 各模型、各付費等級的配額（rpm = 每分鐘請求數，tpm = 每分鐘 token 數）
+RATE_LIMITS = {
+    ("models/gemini-pro-latest", "free"): {"rpm": 10, "tpm": 250_000},
+    ("models/gemini-pro-latest", "tier1"): {"rpm": 150, "tpm": 2_000_000},
+    ("models/gemini-pro-latest", "tier2"): {"rpm": 1_000, "tpm": 5_000_000},
+    ("models/gemini-pro-latest", "tier3"): {"rpm": 2_000, "tpm": 8_000_000},
+    ("gpt-5.1-2025-11-13", "tier1"): {"rpm": 500, "tpm": 500_000},
+    ("gpt-5.1-2025-11-13", "tier2"): {"rpm": 5_000, "tpm": 1_000_000},
+    ("gpt-5.1-2025-11-13", "tier3"): {"rpm": 5_000, "tpm": 2_000_000},
+}
+
+# 未指定付費等級時各模型的預設等級（可用 GEMINI_TIER / OPENAI_TIER 覆寫）
+DEFAULT_TIERS = {
+    "models/gemini-pro-latest": "free",
+    "gpt-5.1-2025-11-13": "tier1",
+}
+
+# 找不到對應設定時使用的保守配額
+DEFAULT_LIMIT = {"rpm": 10, "tpm": None}
+
+# 收到 429 但沒有 Retry-After 時的預設等待秒數
+DEFAULT_PENALTY = 10.0
+
+
+def estimate_tokens(text):
+    """粗估 token 數：中日韓字元約 1 字 1 token，其餘約 4 字元 1 token"""
+    cjk = sum(1 for ch in text if "\u3000" <= ch <= "\u9fff" or "\uff00" <= ch <= "\uffef")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def parse_reset_duration(value):
+    """解析 OpenAI 的 reset header（例如 "1s"、"6m0s"、"20ms"），回傳秒數"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    for number, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        total += float(number) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+
+class RateLimiter:
+    """同時計算每分鐘請求數與 token 數的 token bucket，同步與 asyncio 皆可使用"""
+
+    def __init__(self, rpm, tpm=None, burst=1):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._requests = float(burst)
+        self._tokens = float(tpm) if tpm else 0.0
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        # 收到 429 後暫時降低速率，成功後再逐步恢復
+        self._rate_scale = 1.0
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._requests = min(self.burst, self._requests + elapsed * self.rpm * self._rate_scale / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm * self._rate_scale / 60)
+
+    def _reserve(self, tokens):
+        """預約一次請求並回傳需要等待的秒數（額度可先預支成負值，依序排隊）"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._requests -= 1
+            wait = max(0.0, -self._requests * 60 / (self.rpm * self._rate_scale))
+            if self.tpm and tokens:
+                self._tokens -= tokens
+                wait = max(wait, -self._tokens * 60 / (self.tpm * self._rate_scale))
+            return max(wait, self._blocked_until - now)
+
+    async def acquire_async(self, tokens=0):
+        """非同步等待直到可以送出請求"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """以實際用量修正預估的 token 數"""
+        if not self.tpm or actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens -= actual_tokens - estimated_tokens
+
+    def set_limits(self, rpm=None, tpm=None):
+        """改用設定檔指定的配額（None 表示維持原本的值）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if rpm is not None:
+                self.rpm = rpm
+            if tpm is not None:
+                # 原本不限 token 數時從滿額開始
+                self._tokens = min(self._tokens, float(tpm)) if self.tpm else float(tpm)
+                self.tpm = tpm
+
+    def record_success(self):
+        """成功的請求會逐步恢復被 429 降低的速率"""
+        with self._lock:
+            self._rate_scale = min(1.0, self._rate_scale + 0.1)
+
+    def penalize(self, retry_after=None):
+        """收到 429 時暫停送出請求，並將速率減半"""
+        with self._lock:
+            now = time.monotonic()
+            delay = retry_after if retry_after is not None else DEFAULT_PENALTY
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._rate_scale = max(0.1, self._rate_scale / 2)
+
+    def update_from_headers(self, headers):
+        """讀取回應中的配額 header，額度用盡時暫停到重置時間"""
+        if not headers:
+            return
+        retry_after = headers.get("retry-after")
+        if retry_after is not None:
+            self.penalize(parse_reset_duration(retry_after))
+            return
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining is not None and reset is not None and int(remaining) <= 0:
+                with self._lock:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + reset)
+
+
+# 例外沒有 HTTP 狀態碼時，從錯誤訊息判斷是否為限流（429 需為獨立的數字，避免「14290 tokens」之類誤判）
+RATE_LIMIT_MESSAGE = re.compile(r"\b429\b|RESOURCE_EXHAUSTED|quota", re.IGNORECASE)
+
+
+def is_rate_limit_error(exc):
+    """判斷例外是否為 429 / 配額用盡；有狀態碼時只看狀態碼"""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int):
+        return status == 429
+    if type(exc).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests"):
+        return True
+    return bool(RATE_LIMIT_MESSAGE.search(str(exc)))
+
+
+def retry_after_from_error(exc):
+    """從例外中取出 Retry-After 秒數（沒有則回傳 None）"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None and headers.get("retry-after") is not None:
+        return parse_reset_duration(headers.get("retry-after"))
+    # Gemini 的錯誤訊息會帶 retry_delay { seconds: N }
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(exc))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name, tier=None, rpm=None, tpm=None):
+    """取得某模型、某付費等級共用的 RateLimiter（同一個 process 內只會建立一次）
+
+    rpm / tpm 為設定檔中的配額（優先於 RATE_LIMITS）；同一個模型與等級的 limiter 已存在時改用新的配額。
+    """
+    if tier is None:
+        env_name = "GEMINI_TIER" if "gemini" in model_name else "OPENAI_TIER"
+        tier = os.getenv(env_name) or DEFAULT_TIERS.get(model_name, "free")
+    key = (model_name, tier)
+    with _limiters_lock:
+        if key not in _limiters:
+            limit = RATE_LIMITS.get(key)
+            if limit is None and rpm is None:
+                print(
+                    f"警告：{model_name}（{tier}）沒有已知的配額，使用保守的 {DEFAULT_LIMIT['rpm']} RPM；"
+                    f"可在 experiments.json 的 provider 設定 rpm / tpm"
+                )
+            limit = limit or DEFAULT_LIMIT
+            _limiters[key] = RateLimiter(limit["rpm"], limit["tpm"])
+        limiter = _limiters[key]
+    if rpm is not None or tpm is not None:
+        limiter.set_limits(rpm, tpm)
+    return limiter
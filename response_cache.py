@@ -0,0 +1,157 @@
+# response_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = ".response_cache.sqlite3"
+
+# 快取總大小上限，超過時淘汰最久沒被讀取的回應
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# off    = 不使用快取（預設）
+# record = 一律呼叫 API，並把回應寫入快取（覆蓋舊資料）
+# replay = 只讀快取，不呼叫 API；沒有快取時拋出 CacheMiss
+# auto   = 有快取就讀，沒有才呼叫 API 並寫入
+CACHE_MODES = ("off", "record", "replay", "auto")
+
+
+class CacheMiss(Exception):
+    """replay 模式下找不到對應的快取回應"""
+
+
+def prompt_hash(*parts):
+    """把 prompt 的各部分（messages、system prompt、題目文字…）合成一個雜湊值"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_key(model, prompt_digest, params, sample_index):
+    """快取 key = (模型, prompt 雜湊, 生成參數, 第幾次取樣)"""
+    return prompt_hash(model, prompt_digest, params or {}, sample_index)
+
+
+class ResponseCache:
+    """以 SQLite 保存 API 回應文字，讓分析可以離線重跑"""
+
+    def __init__(self, path=CACHE_PATH, mode=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.mode = mode or os.getenv("RESPONSE_CACHE_MODE", "off")
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, value):
+        if value not in CACHE_MODES:
+            raise ValueError(f"未知的快取模式: {value}（可用: {', '.join(CACHE_MODES)}）")
+        self._mode = value
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    prompt_hash TEXT,
+                    params TEXT,
+                    sample_index INTEGER,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    accessed_at REAL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed_at)")
+        return self._conn
+
+    def get(self, key):
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key, model, prompt_digest, params, sample_index, response):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, prompt_digest, json.dumps(params or {}, sort_keys=True), sample_index,
+                 response, len(response.encode("utf-8")), now, now),
+            )
+            conn.commit()
+            self._evict(conn)
+
+    def invalidate(self, model, prompt_digest, params, sample_index):
+        """刪除某次取樣的快取回應（例如格式錯誤、要重新呼叫 API 時）"""
+        if self.mode == "off" or sample_index is None:
+            return
+        key = cache_key(model, prompt_digest, params, sample_index)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.commit()
+
+    def _evict(self, conn):
+        """總大小超過上限時，從最久沒被讀取的開始刪到上限的 90%"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        removed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append((key,))
+            removed += size
+            if removed >= target:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+        conn.commit()
+
+    def _lookup(self, key):
+        if self.mode in ("replay", "auto"):
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            if self.mode == "replay":
+                raise CacheMiss(key)
+        return None
+
+    def lookup(self, model, prompt_digest, params, sample_index):
+        """批次模式用：依模式讀取快取的回應，沒有快取（或不讀快取的模式）時回傳 None，不呼叫 API"""
+        if self.mode not in ("replay", "auto"):
+            return None
+        return self.get(cache_key(model, prompt_digest, params, sample_index))
+
+    def store(self, model, prompt_digest, params, sample_index, response):
+        """批次模式用：依模式把批次取得的回應寫入快取（與逐回合呼叫相同的 key，可用 replay 重播）"""
+        if self.mode in ("record", "auto") and response is not None:
+            self.put(cache_key(model, prompt_digest, params, sample_index), model, prompt_digest, params, sample_index, response)
+
+    async def fetch_async(self, model, prompt_digest, params, sample_index, call):
+        """依模式讀快取或呼叫 call()（async 函式）；call 回傳 None（例如被阻擋）時不寫入快取"""
+        if self.mode == "off" or sample_index is None:
+            return await call()
+        key = cache_key(model, prompt_digest, params, sample_index)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = await call()
+        if response is not None:
+            self.put(key, model, prompt_digest, params, sample_index, response)
+        return response
@@ -0,0 +1,89 @@
+# results_log.py
+import json
+import os
+import threading
+from datetime import datetime
+
+# 結果紀錄檔的存放目錄
+RUNS_DIR = "runs"
+
+
+def new_log_path(name):
+    os.makedirs(RUNS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(RUNS_DIR, f"{name}_{timestamp}.jsonl")
+
+
+def load_results(path):
+    """讀取紀錄檔，回傳 {回合索引: 紀錄}；同一回合出現多次時以最後一筆為準
+
+    程式中斷時最後一行可能只寫了一半，這種不完整的行會被略過。
+    """
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"警告：略過不完整的紀錄: {line[:80]}")
+                continue
+            completed[record["round"]] = record
+    return completed
+
+
+class ResultsLog:
+    """只附加（append-only）的 JSONL 結果紀錄：每完成一回合立即寫入並 fsync"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 上次中斷時若最後一行沒寫完，先補上換行，避免和新紀錄黏在一起
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        else:
+            needs_newline = False
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def append(self, round_idx, answers, raw=None, meta=None):
+        record = {
+            "round": round_idx,
+            "answers": answers,
+            "raw": raw,
+            "meta": meta or {},
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def open_results_log(name, resume_path=None, prompt_hash=None):
+    """開啟本次的紀錄檔；指定 resume_path 時沿用該檔並回傳已完成的回合"""
+    if resume_path is None:
+        return ResultsLog(new_log_path(name)), {}
+
+    completed = load_results(resume_path)
+    if prompt_hash is not None:
+        mismatched = [r for r in completed.values() if r["meta"].get("prompt_hash") not in (None, prompt_hash)]
+        if mismatched:
+            print(f"警告：紀錄檔中有 {len(mismatched)} 個回合使用了不同的 prompt，仍會沿用")
+    print(f"從 {resume_path} 繼續：已完成 {len(completed)} 個回合")
+    return ResultsLog(resume_path), completed
@@ -0,0 +1,314 @@
+# results_store.py
+import os
+import re
+from datetime import date, datetime
+
+import numpy as np
+
+import stability
+
+# Parquet 結果庫根目錄，底下分成 rounds/（每回合每題答案）、stability/（每題穩定度）
+# 、traits/（每個 Big Five 特質的穩定度彙總）、distributions/（logprobs 估計的每題選項機率）
+# 、telemetry/（每個 API 請求的延遲、token 與費用）與 orders/（題目順序隨機化時每回合的 seed 與題目順序）
+STORE_DIR = "results_store"
+
+# 分區欄位（hive 格式：model=.../persona=.../prompt_variant=.../date=...）
+PARTITION_COLS = ["model", "persona", "prompt_variant", "date"]
+
+
+def run_id_from_log(log_path):
+    """以結果紀錄檔名（不含副檔名）作為 run_id，--resume 時同一個 run 會覆寫同一組檔案"""
+    return os.path.splitext(os.path.basename(log_path))[0]
+
+
+def run_date(run_id):
+    """從 run_id 尾端的時間戳記取出日期，找不到則用今天"""
+    match = re.search(r"_(\d{8})_\d{6}$", run_id)
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d").date().isoformat()
+    return date.today().isoformat()
+
+
+def run_condition(run_id):
+    """run_id 去掉尾端時間戳記即為條件名稱"""
+    return re.sub(r"_\d{8}_\d{6}$", "", run_id)
+
+
+def _partition_values(run_id, model, persona, prompt_variant, num_rows):
+    import pyarrow as pa
+
+    values = {"model": model, "persona": persona, "prompt_variant": prompt_variant, "date": run_date(run_id)}
+    return {col: pa.array([values[col]] * num_rows, pa.string()) for col in PARTITION_COLS}
+
+
+def _write(table, subdir, run_id):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    ds.write_dataset(
+        table,
+        os.path.join(STORE_DIR, subdir),
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(col, pa.string()) for col in PARTITION_COLS]), flavor="hive"
+        ),
+        basename_template=f"{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def save_run(run_id, model, persona, prompt_variant, prompt_hash, all_rounds, options, num_questions, stability_results):
+    """把一次執行的每回合答案（長表：回合 × 題目）與每題穩定度寫入 Parquet 結果庫"""
+    import pyarrow as pa
+
+    matrix = stability.build_answer_matrix(all_rounds, options, num_questions)
+    num_rounds = matrix.shape[0]
+    codes = matrix.reshape(-1)
+    labels = np.array(list(options) + [None], dtype=object)
+
+    rounds_table = pa.table({
+        "run_id": pa.array([run_id] * codes.size, pa.string()),
+        "prompt_hash": pa.array([prompt_hash] * codes.size, pa.string()),
+        "round": pa.array(np.repeat(np.arange(1, num_rounds + 1, dtype=np.int32), num_questions)),
+        "question": pa.array(np.tile(np.arange(1, num_questions + 1, dtype=np.int16), num_rounds)),
+        "answer": pa.array(labels[codes], pa.string()),
+        "answer_code": pa.array(codes, pa.int8()),
+        **_partition_values(run_id, model, persona, prompt_variant, codes.size),
+    })
+    _write(rounds_table, "rounds", run_id)
+
+    n = len(stability_results)
+    stability_table = pa.table({
+        "run_id": pa.array([run_id] * n, pa.string()),
+        "prompt_hash": pa.array([prompt_hash] * n, pa.string()),
+        "rounds": pa.array([num_rounds] * n, pa.int32()),
+        "question": pa.array([s["question"] for s in stability_results], pa.int16()),
+        "most_common": pa.array([s["most_common"] for s in stability_results], pa.string()),
+        "count": pa.array([s["count"] for s in stability_results], pa.int32()),
+        "total": pa.array([s["total"] for s in stability_results], pa.int32()),
+        "stability": pa.array([s["stability"] for s in stability_results], pa.float64()),
+        "entropy": pa.array([s["entropy"] for s in stability_results], pa.float64()),
+        "variance": pa.array([s["variance"] for s in stability_results], pa.float64()),
+        **_partition_values(run_id, model, persona, prompt_variant, n),
+    })
+    _write(stability_table, "stability", run_id)
+
+
+def save_traits(run_id, model, persona, prompt_variant, prompt_hash, num_rounds, aggregates):
+    """把 stability.trait_aggregates 的各特質穩定度彙總寫入 traits/"""
+    import pyarrow as pa
+
+    n = len(aggregates)
+    traits_table = pa.table({
+        "run_id": pa.array([run_id] * n, pa.string()),
+        "prompt_hash": pa.array([prompt_hash] * n, pa.string()),
+        "rounds": pa.array([num_rounds] * n, pa.int32()),
+        "trait": pa.array([a["trait"] for a in aggregates], pa.string()),
+        "mean_consistency": pa.array([a["mean_consistency"] for a in aggregates], pa.float64()),
+        "min_consistency": pa.array([a["min_consistency"] for a in aggregates], pa.float64()),
+        "mean_entropy": pa.array([a["mean_entropy"] for a in aggregates], pa.float64()),
+        "mean_variance": pa.array([a["mean_variance"] for a in aggregates], pa.float64()),
+        **_partition_values(run_id, model, persona, prompt_variant, n),
+    })
+    _write(traits_table, "traits", run_id)
+
+
+def save_distributions(run_id, model, persona, prompt_variant, prompt_hash, probabilities, calls, options, stats):
+    """把 logprobs 估計的每題選項機率與解析計算的預期穩定度寫入 distributions/（對不到的題目不寫入）"""
+    import pyarrow as pa
+
+    questions = np.flatnonzero(calls > 0)
+    n = questions.size
+    distributions_table = pa.table({
+        "run_id": pa.array([run_id] * n, pa.string()),
+        "prompt_hash": pa.array([prompt_hash] * n, pa.string()),
+        "calls": pa.array(calls[questions], pa.int32()),
+        "question": pa.array(questions + 1, pa.int16()),
+        "options": pa.array([list(options)] * n, pa.list_(pa.string())),
+        "probabilities": pa.array([row.tolist() for row in probabilities[questions]], pa.list_(pa.float64())),
+        "most_likely": pa.array([options[idx] for idx in stats["mode"][questions]], pa.string()),
+        "expected_stability": pa.array(stats["expected_stability"][questions], pa.float64()),
+        "agreement": pa.array(stats["agreement"][questions], pa.float64()),
+        "entropy": pa.array(stats["entropy"][questions], pa.float64()),
+        "variance": pa.array(stats["variance"][questions], pa.float64()),
+        **_partition_values(run_id, model, persona, prompt_variant, n),
+    })
+    _write(distributions_table, "distributions", run_id)
+
+
+def save_telemetry(run_id, model, persona, prompt_variant, calls):
+    """把每個 API 請求的延遲、token、重試與費用（telemetry.Telemetry.calls）寫入 telemetry/"""
+    import pyarrow as pa
+
+    n = len(calls)
+
+    def column(key, type_):
+        return pa.array([call[key] for call in calls], type_)
+
+    telemetry_table = pa.table({
+        "run_id": pa.array([run_id] * n, pa.string()),
+        "kind": column("kind", pa.string()),
+        "round": column("round", pa.int32()),
+        "attempt": column("attempt", pa.int16()),
+        "error": column("error", pa.string()),
+        "queue_seconds": column("queue_seconds", pa.float64()),
+        "latency_seconds": column("latency_seconds", pa.float64()),
+        "ttft_seconds": column("ttft_seconds", pa.float64()),
+        "input_tokens": column("input_tokens", pa.int64()),
+        "output_tokens": column("output_tokens", pa.int64()),
+        "cached_tokens": column("cached_tokens", pa.int64()),
+        "cost_usd": column("cost_usd", pa.float64()),
+        **_partition_values(run_id, model, persona, prompt_variant, n),
+    })
+    _write(telemetry_table, "telemetry", run_id)
+
+
+def save_orders(run_id, model, persona, prompt_variant, rounds, seeds, orders):
+    """把每回合的題目順序寫入 orders/：每回合一列，只存 seed 與送出順序的原題目索引（int16）"""
+    import pyarrow as pa
+
+    n = len(rounds)
+    orders_table = pa.table({
+        "run_id": pa.array([run_id] * n, pa.string()),
+        "round": pa.array(rounds, pa.int32()),
+        "seed": pa.array(seeds, pa.int64()),
+        "order": pa.array([list(order) for order in orders], pa.list_(pa.int16())),
+        **_partition_values(run_id, model, persona, prompt_variant, n),
+    })
+    _write(orders_table, "orders", run_id)
+
+
+def _load(subdir, columns=None, **filters):
+    import pyarrow.dataset as ds
+
+    path = os.path.join(STORE_DIR, subdir)
+    if not os.path.exists(path):
+        return None
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    expression = None
+    for col, value in filters.items():
+        if value is None:
+            continue
+        condition = ds.field(col).isin(value) if isinstance(value, (list, tuple, set)) else ds.field(col) == value
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def load_rounds(columns=None, **filters):
+    """讀取每回合答案，例如 load_rounds(model="gpt-5.1-2025-11-13", persona="ppv_initial")；回傳 pyarrow Table"""
+    return _load("rounds", columns, **filters)
+
+
+def load_stability(columns=None, **filters):
+    """讀取每題穩定度，可用分區欄位或 run_id 篩選；回傳 pyarrow Table"""
+    return _load("stability", columns, **filters)
+
+
+def latest_run_id(name):
+    """name 為 run_id 時直接回傳；為條件名稱時回傳該條件最新一次執行的 run_id，找不到則回傳 None"""
+    table = load_stability(columns=["run_id"])
+    if table is None:
+        return None
+    run_ids = set(table.column("run_id").to_pylist())
+    if name in run_ids:
+        return name
+    pattern = re.compile(rf"^{re.escape(name)}_\d{{8}}_\d{{6}}$")
+    matches = [run_id for run_id in run_ids if pattern.match(run_id)]
+    return max(matches, key=lambda run_id: run_id[-15:]) if matches else None
+
+
+def load_answer_matrix(run_id):
+    """讀回一次執行的答案矩陣（回合 × 題目，值為選項索引，缺答為 stability.MISSING）"""
+    table = load_rounds(columns=["round", "question", "answer_code"], run_id=run_id)
+    if table is None or not table.num_rows:
+        return None
+    rounds = table.column("round").to_numpy()
+    questions = table.column("question").to_numpy()
+    codes = table.column("answer_code").to_numpy(zero_copy_only=False)
+    matrix = np.full((rounds.max(), questions.max()), stability.MISSING, dtype=np.int8)
+    matrix[rounds - 1, questions - 1] = codes
+    return matrix
+
+
+def load_traits(columns=None, **filters):
+    """讀取各 Big Five 特質的穩定度彙總；回傳 pyarrow Table"""
+    return _load("traits", columns, **filters)
+
+
+def load_distributions(columns=None, **filters):
+    """讀取 logprobs 估計的每題選項機率與預期穩定度；回傳 pyarrow Table"""
+    return _load("distributions", columns, **filters)
+
+
+def load_orders(columns=None, **filters):
+    """讀取每回合的題目順序（seed 與索引陣列，可用 question_order.round_order 重現）；回傳 pyarrow Table"""
+    return _load("orders", columns, **filters)
+
+
+def load_telemetry(columns=None, **filters):
+    """讀取每個 API 請求的延遲、token 與費用紀錄；回傳 pyarrow Table"""
+    return _load("telemetry", columns, **filters)
+
+
+def export_excel(run_id, filename, extra_sheets=None):
+    """由結果庫產生與過去相同格式的 Excel（每回合答案、穩定度統計，另加執行資訊），extra_sheets 為 {工作表名稱: DataFrame}"""
+    import pandas as pd
+
+    rounds = load_rounds(columns=["round", "question", "answer"], run_id=run_id).to_pandas()
+    df_rounds = rounds.pivot(index="round", columns="question", values="answer").sort_index()
+    df_rounds.columns = [f"第{q}題" for q in df_rounds.columns]
+    df_rounds = df_rounds.reset_index().rename(columns={"round": "回合"})
+
+    stats = load_stability(run_id=run_id).to_pandas().sort_values("question")
+    # 記錄這個檔案屬於哪個條件：多個條件共用 excel_prefix 時，彙總時無法只靠檔名判斷
+    df_info = pd.DataFrame([{
+        "run_id": run_id,
+        "條件": run_condition(run_id),
+        "模型": str(stats["model"].iloc[0]),
+        "人格": str(stats["persona"].iloc[0]),
+        "prompt 版本": str(stats["prompt_variant"].iloc[0]),
+    }])
+    df_stability = pd.DataFrame({
+        "題號": stats["question"],
+        "最常出現答案": stats["most_common"],
+        "出現次數": stats["count"],
+        "穩定度": stats["stability"],
+        "熵": stats["entropy"],
+        "變異數": stats["variance"],
+    })
+
+    traits = load_traits(run_id=run_id)
+    df_traits = None
+    if traits is not None and traits.num_rows:
+        agg = traits.to_pandas()
+        df_traits = pd.DataFrame({
+            "特質": agg["trait"],
+            "平均穩定度": agg["mean_consistency"],
+            "最低穩定度": agg["min_consistency"],
+            "平均熵": agg["mean_entropy"],
+            "平均變異數": agg["mean_variance"],
+        })
+
+    # 有 logprobs 估計時加上每題選項機率與預期穩定度
+    distributions = load_distributions(run_id=run_id)
+    df_distributions = None
+    if distributions is not None and distributions.num_rows:
+        dist = distributions.to_pandas().sort_values("question")
+        df_distributions = pd.DataFrame({"題號": dist["question"], "最可能答案": dist["most_likely"]})
+        for idx, opt in enumerate(dist["options"].iloc[0]):
+            df_distributions[f"P({opt})"] = [row[idx] for row in dist["probabilities"]]
+        df_distributions["預期穩定度"] = dist["expected_stability"].to_numpy()
+        df_distributions["一致機率(Σp²)"] = dist["agreement"].to_numpy()
+        df_distributions["熵"] = dist["entropy"].to_numpy()
+        df_distributions["請求數"] = dist["calls"].to_numpy()
+
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        df_rounds.to_excel(writer, sheet_name='每回合答案', index=False)
+        df_stability.to_excel(writer, sheet_name='穩定度統計', index=False)
+        if df_traits is not None:
+            df_traits.to_excel(writer, sheet_name='特質穩定度', index=False)
+        if df_distributions is not None:
+            df_distributions.to_excel(writer, sheet_name='選項機率分布', index=False)
+        df_info.to_excel(writer, sheet_name='執行資訊', index=False)
+        for sheet_name, df in (extra_sheets or {}).items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
@@ -0,0 +1,159 @@
+# retry_policy.py
+import asyncio
+import random
+import time
+
+from rate_limiter import is_rate_limit_error, retry_after_from_error
+
+# 錯誤分類
+RATE_LIMIT = "rate_limit"      # 429 / 配額用盡
+SERVER_ERROR = "server_error"  # 5xx、408、409
+NETWORK = "network"            # 連線中斷、逾時
+BLOCKED = "blocked"            # 回應被安全機制阻擋（沒有內容）
+MALFORMED = "malformed"        # 有回應但解析不出任何答案
+CLIENT_ERROR = "client_error"  # 其他 4xx（參數錯誤、金鑰無效…），重試也不會成功
+UNKNOWN = "unknown"
+
+# 不重試的錯誤
+NON_RETRYABLE = (CLIENT_ERROR,)
+
+# 代表端點本身有問題、會計入 circuit breaker 的錯誤
+ENDPOINT_FAILURES = (RATE_LIMIT, SERVER_ERROR, NETWORK)
+
+# 各 SDK 中代表連線或逾時問題的例外名稱（不必 import 各家 SDK 就能判斷）
+NETWORK_ERROR_NAMES = (
+    "APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout",
+    "RemoteProtocolError", "ServiceUnavailable", "DeadlineExceeded",
+)
+
+
+class BlockedResponse(Exception):
+    """回應被阻擋、沒有任何內容"""
+
+
+class MalformedOutput(Exception):
+    """回應格式錯誤，解析不出答案"""
+
+
+def classify_error(exc):
+    """把例外分類成上面的錯誤類型"""
+    if isinstance(exc, BlockedResponse):
+        return BLOCKED
+    if isinstance(exc, MalformedOutput):
+        return MALFORMED
+    if is_rate_limit_error(exc):
+        return RATE_LIMIT
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int):
+        if status >= 500 or status in (408, 409):
+            return SERVER_ERROR
+        if 400 <= status < 500:
+            return CLIENT_ERROR
+    if isinstance(exc, (TimeoutError, ConnectionError)) or type(exc).__name__ in NETWORK_ERROR_NAMES:
+        return NETWORK
+    return UNKNOWN
+
+
+class RetryPolicy:
+    """指數退避 + full jitter；錯誤帶有 Retry-After 時至少等待該秒數"""
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """第 attempt 次（從 0 起算）失敗後的等待秒數"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+class CircuitBreaker:
+    """連續失敗達門檻時暫停該端點的所有請求（open），reset_timeout 秒後只放行一個試探請求（half-open），
+    成功才恢復（closed）；避免在端點被限流或故障時持續送出請求"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, name=""):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _wait_time(self):
+        """回傳還要等待的秒數，0 表示可以送出"""
+        if self.state == "closed":
+            return 0.0
+        if self.state == "open":
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                return remaining
+            self.state = "half_open"
+            print(f"[{self.name}] circuit breaker 半開：送出一個試探請求")
+        # half-open：同時只放行一個試探請求，其他請求稍候
+        if not self._probing:
+            self._probing = True
+            return 0.0
+        return min(1.0, self.reset_timeout)
+
+    async def wait_async(self):
+        while True:
+            wait = self._wait_time()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def record_success(self):
+        if self.state != "closed":
+            print(f"[{self.name}] circuit breaker 關閉：端點已恢復")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._probing = False
+        if self.state == "half_open":
+            self._open()
+            return
+        self.failures += 1
+        if self.state == "closed" and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        print(f"[{self.name}] circuit breaker 開啟：連續 {self.failures} 次失敗，暫停 {self.reset_timeout:.0f} 秒")
+
+
+async def call_with_retry(fn, policy, breaker=None, fatal=(), label=""):
+    """呼叫 async 函式 fn，依錯誤類型決定是否重試；重試用盡或不可重試時拋出最後的例外
+
+    fatal 中的例外類型不重試也不計入 breaker，直接往外拋。
+    """
+    for attempt in range(policy.max_attempts):
+        if breaker is not None:
+            await breaker.wait_async()
+        try:
+            result = await fn()
+        except fatal:
+            raise
+        except Exception as e:
+            kind = classify_error(e)
+            if breaker is not None:
+                if kind in ENDPOINT_FAILURES:
+                    breaker.record_failure()
+                else:
+                    # 端點有回應（內容被阻擋、格式錯誤…），不算端點故障
+                    breaker.record_success()
+            if kind in NON_RETRYABLE or attempt == policy.max_attempts - 1:
+                raise
+            delay = policy.delay(attempt, retry_after_from_error(e))
+            print(f"重試：[{label}] {kind}（嘗試 {attempt + 1}/{policy.max_attempts}），{delay:.1f} 秒後重試: {e}")
+            await asyncio.sleep(delay)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
@@ -0,0 +1,41 @@
+# round_runner.py
+import asyncio
+
+
+async def run_rounds_async(ask_round, rounds, concurrency=8, on_result=None, stop_when=None):
+    """同時保持最多 concurrency 個回合進行中，結果依回合順序回傳
+
+    stop_when 為選用的無參數函式，每完成一回合檢查一次；回傳 True 後不再開始新回合，
+    已送出的回合仍會完成，回傳的結果只包含已開始的回合。
+    """
+    results = [None] * rounds
+    next_round = 0
+    stopped = False
+
+    async def worker():
+        nonlocal next_round, stopped
+        # 每個 worker 依序領取下一個尚未開始的回合
+        while next_round < rounds and not stopped:
+            round_idx = next_round
+            next_round += 1
+
+            result = await ask_round(round_idx)
+            results[round_idx] = result
+
+            # 回合完成即回報（完成順序可能與回合順序不同）
+            if on_result is not None:
+                on_result(round_idx + 1, result)
+
+            if stop_when is not None and not stopped and stop_when():
+                print(f"\n達到提前停止條件，不再開始新回合（已開始 {next_round} 回合）")
+                stopped = True
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, rounds)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # 任一回合拋出例外時，取消其餘仍在進行的回合
+        for task in workers:
+            task.cancel()
+
+    return results[:next_round]
@@ -0,0 +1,118 @@
+# scheduler.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from telemetry import format_comparison
+
+# 執行中輸出進度與預估完成時間的間隔（秒）
+PROGRESS_INTERVAL = 30
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} 秒"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} 分鐘"
+    return f"{seconds / 3600:.1f} 小時"
+
+
+def minimum_duration(provider, rounds):
+    """只受 RPM 限制時，這個 provider 跑完 rounds 個回合至少需要的秒數"""
+    return rounds * 60 / provider.rate_limiter.rpm
+
+
+class ProgressTracker:
+    """追蹤每個條件完成的回合數，依各 provider 的實際吞吐量推估完成時間"""
+
+    def __init__(self, experiments, rounds=None):
+        self.started = time.monotonic()
+        self.providers = {exp.provider.name: exp.provider for exp in experiments}
+        self.provider_of = {exp.name: exp.provider.name for exp in experiments}
+        self.totals = {exp.name: exp.rounds if rounds is None else rounds for exp in experiments}
+        self.done = {exp.name: 0 for exp in experiments}
+
+    def update(self, name):
+        self.done[name] += 1
+
+    def finish(self, name):
+        """條件結束（含提前停止）後，剩下沒跑的回合不再計入"""
+        self.totals[name] = self.done[name]
+
+    def by_provider(self):
+        """{provider: (已完成回合, 總回合)}"""
+        groups = {name: [0, 0] for name in self.providers}
+        for exp_name, provider_name in self.provider_of.items():
+            groups[provider_name][0] += self.done[exp_name]
+            groups[provider_name][1] += self.totals[exp_name]
+        return {name: tuple(counts) for name, counts in groups.items()}
+
+    def projection(self):
+        """{provider: 預估剩餘秒數}；還沒有完成的回合時以 RPM 上限估計"""
+        elapsed = time.monotonic() - self.started
+        etas = {}
+        for name, (done, total) in self.by_provider().items():
+            remaining = total - done
+            if remaining <= 0:
+                etas[name] = 0.0
+            elif done > 0:
+                etas[name] = remaining * elapsed / done
+            else:
+                etas[name] = minimum_duration(self.providers[name], remaining)
+        return etas
+
+    def plan(self):
+        """開始前的預估：各 provider 的回合數與 RPM 下限，整體時間取決於最慢的 provider"""
+        lines = ["=== 實驗矩陣 ==="]
+        slowest = None
+        for name, (_, total) in self.by_provider().items():
+            provider = self.providers[name]
+            duration = minimum_duration(provider, total)
+            lines.append(
+                f"{name}（{provider.model}）：{total} 回合，並行 {provider.concurrency}，"
+                f"{provider.rate_limiter.rpm} RPM → 至少 {format_duration(duration)}"
+            )
+            if slowest is None or duration > slowest[1]:
+                slowest = (name, duration)
+        if slowest is not None:
+            lines.append(f"各 provider 同時進行，總時間約取決於最慢的 {slowest[0]}（至少 {format_duration(slowest[1])}）")
+        return "\n".join(lines)
+
+    def summary(self):
+        etas = self.projection()
+        parts = []
+        for name, (done, total) in self.by_provider().items():
+            parts.append(f"{name} {done}/{total}（剩約 {format_duration(etas[name])}）")
+        finish_at = datetime.now() + timedelta(seconds=max(etas.values(), default=0.0))
+        return f"進度：{'｜'.join(parts)}｜預計 {finish_at:%H:%M:%S} 全部完成"
+
+
+async def report_progress(tracker, interval=PROGRESS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        print(f"\n{tracker.summary()}")
+
+
+async def run_matrix(experiments, response_cache, progress_interval=PROGRESS_INTERVAL, **options):
+    """同時執行所有條件：每個 provider 依自己的並行額度與 rate limiter 送出請求，
+    不同 provider 互不等待，總時間接近最慢的單一 provider。回傳 {條件名稱: run_id}（被略過的條件為 None）"""
+    tracker = ProgressTracker(experiments, options.get("rounds"))
+    print(tracker.plan())
+
+    reporter = asyncio.create_task(report_progress(tracker, progress_interval))
+    try:
+        run_ids = await asyncio.gather(
+            *(experiment.run(response_cache, progress=tracker, **options) for experiment in experiments)
+        )
+    finally:
+        reporter.cancel()
+
+    print(f"\n全部條件完成，耗時 {format_duration(time.monotonic() - tracker.started)}")
+    # 條件的 run 回傳 None 代表被略過（例如 --cache replay 缺少快取）
+    skipped = [experiment.name for experiment, run_id in zip(experiments, run_ids) if run_id is None]
+    if skipped:
+        print(f"警告：以下條件沒有完成、未寫入結果庫：{', '.join(skipped)}")
+    summaries = {experiment.name: experiment.telemetry.summary() for experiment in experiments if experiment.telemetry.calls}
+    if len(summaries) > 1:
+        print(format_comparison(summaries))
+    return {experiment.name: run_id for experiment, run_id in zip(experiments, run_ids)}
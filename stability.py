@@ -0,0 +1,228 @@
+# stability.py
+import numpy as np
+
+from questions_list import questions_list, BIG5_TRAITS
+
+# 答案矩陣中代表「缺答」的值
+MISSING = -1
+
+
+def trait_blocks(questions=questions_list, traits=BIG5_TRAITS):
+    """依題目的 trait 分組：[(特質中文名稱, 題目索引陣列)]，依 traits 的順序；題目沒有 trait 時回傳空 list"""
+    if not questions or any("trait" not in q for q in questions):
+        return []
+    blocks = []
+    for key, label in traits.items():
+        indices = np.array([idx for idx, q in enumerate(questions) if q["trait"] == key], dtype=np.int64)
+        if indices.size:
+            blocks.append((label, indices))
+    return blocks
+
+
+def build_answer_matrix(all_rounds, options, num_questions):
+    """把每回合的答案 list 轉成 int8 矩陣（回合 × 題目），值為選項索引，缺答為 MISSING
+
+    答案 list 中的 None 代表該題缺答；答案多於題數時只取前 num_questions 個，少於題數時其餘題目記為缺答。
+    """
+    lookup = np.full(256, MISSING, dtype=np.int8)
+    single_char = all(len(opt) == 1 and ord(opt) < 256 for opt in options)
+    if single_char:
+        for idx, opt in enumerate(options):
+            lookup[ord(opt)] = idx
+    option_index = {opt: idx for idx, opt in enumerate(options)}
+
+    matrix = np.full((len(all_rounds), num_questions), MISSING, dtype=np.int8)
+    for r, answers in enumerate(all_rounds):
+        answers = answers[:num_questions]
+        if not answers:
+            continue
+        # 缺答（None）以 "\0" 佔位，查表結果為 MISSING
+        joined = "".join(a or "\0" for a in answers)
+        if single_char and len(joined) == len(answers):
+            # 單字元選項：整回合一次查表
+            codes = lookup[np.frombuffer(joined.encode("latin-1", errors="replace"), dtype=np.uint8)]
+        else:
+            codes = [option_index.get(a, MISSING) for a in answers]
+        matrix[r, :len(answers)] = codes
+    return matrix
+
+
+def option_counts(matrix, num_options):
+    """每題各選項出現次數，shape = (題目 × 選項)"""
+    num_questions = matrix.shape[1]
+    valid = matrix >= 0
+    flat = (matrix.astype(np.int64) + np.arange(num_questions) * num_options)[valid]
+    return np.bincount(flat, minlength=num_questions * num_options).reshape(num_questions, num_options)
+
+
+def stability_stats(matrix, num_options, option_values=None):
+    """以向量化運算計算每題的眾數、一致性、熵與變異數
+
+    回傳 dict，每個值都是長度為題數的 array；沒有任何有效答案的題目為 NaN。
+    option_values 為各選項對應的數值（預設 1..K），用於計算變異數。
+    """
+    counts = option_counts(matrix, num_options)
+    totals = counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        proportions = counts / totals[:, None]
+        # 平手時取索引較小的選項
+        mode = counts.argmax(axis=1)
+        mode_count = counts.max(axis=1)
+        consistency = np.where(totals > 0, mode_count / totals, np.nan)
+        entropy = -np.nansum(np.where(proportions > 0, proportions * np.log2(proportions), 0.0), axis=1)
+
+        values = np.arange(1, num_options + 1, dtype=float) if option_values is None else np.asarray(option_values, dtype=float)
+        mean = proportions @ values
+        variance = proportions @ (values ** 2) - mean ** 2
+
+    empty = totals == 0
+    entropy[empty] = np.nan
+    return {
+        "counts": counts,
+        "total": totals,
+        "mode": mode,
+        "mode_count": mode_count,
+        "consistency": consistency,
+        "entropy": entropy,
+        "mean": mean,
+        "variance": variance,
+    }
+
+
+def distribution_stats(probabilities, option_values=None):
+    """由每題的選項機率（題目 × 選項，對不到的題目為 NaN）解析地計算預期的穩定度與分布統計
+
+    expected_stability 為眾數選項的機率（回合數夠多時抽樣穩定度會收斂到此值），
+    agreement 為任兩回合答案相同的機率 Σp²；其餘欄位與 stability_stats 相同。
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    num_options = probabilities.shape[1]
+    empty = np.isnan(probabilities).any(axis=1)
+    p = np.where(empty[:, None], 0.0, probabilities)
+
+    values = np.arange(1, num_options + 1, dtype=float) if option_values is None else np.asarray(option_values, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        entropy = -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=1)
+    mean = p @ values
+    variance = p @ (values ** 2) - mean ** 2
+
+    stats = {
+        "mode": p.argmax(axis=1),
+        "expected_stability": p.max(axis=1),
+        "agreement": (p ** 2).sum(axis=1),
+        "entropy": entropy,
+        "mean": mean,
+        "variance": variance,
+    }
+    for key in ("expected_stability", "agreement", "entropy", "mean", "variance"):
+        stats[key] = np.where(empty, np.nan, stats[key])
+    return stats
+
+
+def trait_aggregates(stats, blocks=None):
+    """依 Big Five 特質彙總每題的一致性、熵與變異數"""
+    results = []
+    num_questions = len(stats["consistency"])
+    for trait, indices in trait_blocks() if blocks is None else blocks:
+        # 只彙總有作答的題目；整個特質都沒有答案時略過
+        block = indices[indices < num_questions]
+        block = block[np.isfinite(stats["consistency"][block])]
+        if not block.size:
+            continue
+        results.append({
+            "trait": trait,
+            "mean_consistency": float(np.nanmean(stats["consistency"][block])),
+            "min_consistency": float(np.nanmin(stats["consistency"][block])),
+            "mean_entropy": float(np.nanmean(stats["entropy"][block])),
+            "mean_variance": float(np.nanmean(stats["variance"][block])),
+        })
+    return results
+
+
+def compute_stability(all_rounds, options, num_questions):
+    """計算每一題的穩定度，回傳與各腳本原本相同格式的 list of dict"""
+    matrix = build_answer_matrix(all_rounds, options, num_questions)
+    if not (matrix >= 0).any():
+        print("警告：沒有有效的回合數據")
+        return []
+
+    stats = stability_stats(matrix, len(options))
+    results = []
+    for q_idx in np.flatnonzero(stats["total"] > 0):
+        results.append({
+            "question": int(q_idx) + 1,
+            "most_common": options[stats["mode"][q_idx]],
+            "count": int(stats["mode_count"][q_idx]),
+            "total": int(stats["total"][q_idx]),
+            "stability": float(stats["consistency"][q_idx]),
+            "entropy": float(stats["entropy"][q_idx]),
+            "variance": float(stats["variance"][q_idx]),
+        })
+    return results
+
+
+def wilson_interval(successes, totals, z=1.96):
+    """Wilson 信賴區間（向量化），回傳 (下界, 上界)；totals 為 0 時為 NaN"""
+    successes = np.asarray(successes, dtype=float)
+    totals = np.asarray(totals, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = successes / totals
+        denom = 1 + z ** 2 / totals
+        center = (p + z ** 2 / (2 * totals)) / denom
+        half = z * np.sqrt(p * (1 - p) / totals + z ** 2 / (4 * totals ** 2)) / denom
+    return center - half, center + half
+
+
+class StabilityAccumulator:
+    """回合進行中即時累積每題的選項次數表，可隨時取得穩定度與信賴區間"""
+
+    def __init__(self, options, num_questions, z=1.96):
+        self.options = options
+        self.num_questions = num_questions
+        self.z = z
+        self.counts = np.zeros((num_questions, len(options)), dtype=np.int64)
+        self.rounds = 0
+
+    def add_round(self, answers):
+        row = build_answer_matrix([answers], self.options, self.num_questions)[0]
+        valid = np.flatnonzero(row >= 0)
+        self.counts[valid, row[valid]] += 1
+        self.rounds += 1
+
+    def totals(self):
+        return self.counts.sum(axis=1)
+
+    def consistency(self):
+        """目前每題的穩定度（眾數比例）"""
+        totals = self.totals()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(totals > 0, self.counts.max(axis=1) / totals, np.nan)
+
+    def confidence_intervals(self):
+        """每題穩定度的 Wilson 信賴區間，回傳 (下界, 上界)"""
+        return wilson_interval(self.counts.max(axis=1), self.totals(), self.z)
+
+    def margins(self):
+        """每題信賴區間的半寬（誤差範圍）"""
+        lower, upper = self.confidence_intervals()
+        return (upper - lower) / 2
+
+    def unsettled(self, target_margin, min_rounds=10):
+        """還需要更多答案的題目（布林陣列）：答案少於 min_rounds 個，或誤差範圍大於 target_margin"""
+        with np.errstate(invalid="ignore"):
+            return (self.totals() < min_rounds) | ~(self.margins() <= target_margin)
+
+    def converged(self, target_margin, min_rounds=10):
+        """每一題都至少有 min_rounds 個答案，且誤差範圍都在 target_margin 以內"""
+        if self.rounds < min_rounds:
+            return False
+        return not self.unsettled(target_margin, min_rounds).any()
+
+    def summary(self):
+        consistency = self.consistency()
+        if np.isnan(consistency).all():
+            return f"即時穩定度：尚無有效答案（{self.rounds} 回合）"
+        return (
+            f"即時穩定度：平均 {np.nanmean(consistency):.3f}，"
+            f"最大誤差 ±{np.nanmax(self.margins()):.3f}（{self.rounds} 回合）"
+        )
@@ -0,0 +1,166 @@
+# telemetry.py
+# 每個 API 請求的延遲、token 用量、重試與費用紀錄
+import contextvars
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from retry_policy import classify_error
+
+# 目前這個 asyncio task 中正在進行的請求（provider 在送出、收到第一個 token、取得用量時寫入）
+_current_call = contextvars.ContextVar("telemetry_call", default=None)
+
+# 摘要中的延遲百分位數
+PERCENTILES = (50, 95, 99)
+
+
+def record_sent():
+    """請求實際送出（已取得並行與速率額度）"""
+    call = _current_call.get()
+    if call is not None:
+        call["sent"] = time.monotonic()
+
+
+def record_first_token():
+    """串流收到第一段輸出（只記第一次）"""
+    call = _current_call.get()
+    if call is not None and call.get("first_token") is None:
+        call["first_token"] = time.monotonic()
+
+
+def record_usage(input_tokens, output_tokens, cached_tokens=None):
+    """API 回報的 token 用量；input_tokens 含 cached_tokens"""
+    call = _current_call.get()
+    if call is not None:
+        call["input_tokens"] = input_tokens
+        call["output_tokens"] = output_tokens
+        call["cached_tokens"] = cached_tokens or 0
+
+
+def request_cost(pricing, input_tokens, output_tokens, cached_tokens=0):
+    """依每百萬 token 的美元價格計算費用；沒有價格設定或用量時回傳 None
+
+    pricing 為 {"input": ..., "cached_input": ..., "output": ...}（cached_input 預設同 input）。
+    """
+    if not pricing or input_tokens is None or output_tokens is None:
+        return None
+    cached_price = pricing.get("cached_input", pricing["input"])
+    return (
+        (input_tokens - cached_tokens) * pricing["input"]
+        + cached_tokens * cached_price
+        + output_tokens * pricing["output"]
+    ) / 1_000_000
+
+
+class Telemetry:
+    """收集一個條件所有 API 請求的紀錄（從快取讀到的回合沒有請求，不會出現在這裡）"""
+
+    def __init__(self, name, pricing=None):
+        self.name = name
+        self.pricing = pricing
+        self.calls = []
+        self._attempts = {}
+
+    @contextmanager
+    def measure(self, kind, round_idx):
+        """包住一次 API 請求；kind 為 round / repair / logprobs，同一 (kind, 回合) 的第二次以後算重試"""
+        attempt = self._attempts.get((kind, round_idx), 0)
+        self._attempts[(kind, round_idx)] = attempt + 1
+        call = {"started": time.monotonic(), "sent": None, "first_token": None,
+                "input_tokens": None, "output_tokens": None, "cached_tokens": None}
+        token = _current_call.set(call)
+        error = None
+        try:
+            yield call
+        except Exception as e:
+            error = classify_error(e)
+            raise
+        finally:
+            _current_call.reset(token)
+            self._finish(kind, round_idx, attempt, call, error)
+
+    def _finish(self, kind, round_idx, attempt, call, error):
+        finished = time.monotonic()
+        sent = call["sent"] or call["started"]
+        self.calls.append({
+            "kind": kind,
+            "round": round_idx,
+            "attempt": attempt,
+            "error": error,
+            "queue_seconds": sent - call["started"],
+            "latency_seconds": finished - sent,
+            "ttft_seconds": call["first_token"] - sent if call["first_token"] is not None else None,
+            "input_tokens": call["input_tokens"],
+            "output_tokens": call["output_tokens"],
+            "cached_tokens": call["cached_tokens"],
+            "cost_usd": request_cost(self.pricing, call["input_tokens"], call["output_tokens"], call["cached_tokens"] or 0),
+        })
+
+    def summary(self):
+        """彙總成 {指標: 值}：請求數、重試、錯誤、延遲 / TTFT 百分位數、token 與費用
+
+        每回合費用 = 總費用（含補問與 logprobs 請求）÷ 有送出請求的回合數。
+        """
+        calls = self.calls
+        rounds = len({c["round"] for c in calls if c["kind"] == "round"})
+        latency = np.array([c["latency_seconds"] for c in calls if c["error"] is None])
+        ttft = np.array([c["ttft_seconds"] for c in calls if c["ttft_seconds"] is not None])
+        input_tokens = sum(c["input_tokens"] or 0 for c in calls)
+        cached_tokens = sum(c["cached_tokens"] or 0 for c in calls)
+        costs = [c["cost_usd"] for c in calls if c["cost_usd"] is not None]
+
+        summary = {
+            "請求數": len(calls),
+            "重試次數": sum(1 for c in calls if c["attempt"] > 0),
+            "失敗請求": sum(1 for c in calls if c["error"] is not None),
+        }
+        for label, values in (("延遲", latency), ("TTFT", ttft)):
+            for p in PERCENTILES:
+                summary[f"{label} p{p}(秒)"] = float(np.percentile(values, p)) if values.size else None
+        summary["平均排隊(秒)"] = float(np.mean([c["queue_seconds"] for c in calls])) if calls else None
+        summary["輸入 tokens"] = input_tokens
+        summary["快取 tokens"] = cached_tokens
+        summary["快取比例"] = cached_tokens / input_tokens if input_tokens else None
+        summary["輸出 tokens"] = sum(c["output_tokens"] or 0 for c in calls)
+        summary["總費用(USD)"] = sum(costs) if costs else None
+        summary["每回合費用(USD)"] = sum(costs) / rounds if costs and rounds else None
+        return summary
+
+
+def format_summary(name, summary):
+    """把 Telemetry.summary 印成幾行文字"""
+    def seconds(key):
+        value = summary[key]
+        return "-" if value is None else f"{value:.2f}"
+
+    lines = [f"\n=== [{name}] 請求統計 ===",
+             f"請求 {summary['請求數']} 次（重試 {summary['重試次數']}、失敗 {summary['失敗請求']}）｜"
+             f"平均排隊 {seconds('平均排隊(秒)')} 秒",
+             "延遲 " + " / ".join(f"p{p} {seconds(f'延遲 p{p}(秒)')}" for p in PERCENTILES) + " 秒"]
+    if summary["TTFT p50(秒)"] is not None:
+        lines.append("TTFT " + " / ".join(f"p{p} {seconds(f'TTFT p{p}(秒)')}" for p in PERCENTILES) + " 秒")
+    cached_ratio = summary["快取比例"]
+    lines.append(
+        f"tokens：輸入 {summary['輸入 tokens']:,}（快取 {summary['快取 tokens']:,}"
+        f"{f'，{cached_ratio:.0%}' if cached_ratio is not None else ''}）｜輸出 {summary['輸出 tokens']:,}"
+    )
+    if summary["總費用(USD)"] is not None:
+        per_round = summary["每回合費用(USD)"]
+        lines.append(f"費用：${summary['總費用(USD)']:.4f}" + (f"｜每回合 ${per_round:.4f}" if per_round is not None else ""))
+    return "\n".join(lines)
+
+
+def format_comparison(summaries):
+    """多個條件的請求統計並列比較（{條件名稱: summary}），看出時間與費用主要花在哪裡"""
+    lines = ["\n=== 各條件請求統計 ==="]
+    for name, summary in summaries.items():
+        per_round = summary["每回合費用(USD)"]
+        p50, p95 = summary["延遲 p50(秒)"], summary["延遲 p95(秒)"]
+        lines.append(
+            f"{name}：請求 {summary['請求數']}（重試 {summary['重試次數']}）｜"
+            f"延遲 p50 {'-' if p50 is None else f'{p50:.2f}'} / p95 {'-' if p95 is None else f'{p95:.2f}'} 秒｜"
+            f"排隊 {summary['平均排隊(秒)']:.2f} 秒｜輸出 {summary['輸出 tokens']:,} tokens｜"
+            f"每回合 {'-' if per_round is None else f'${per_round:.4f}'}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,25 @@
+# tests/test_aggregate_results.py
+from aggregate_results import condition_index, file_info
+
+CONFIG = {
+    "providers": {"openai": {"type": "openai", "model": "gpt-test"}},
+    "conditions": [
+        {"name": "gpt_ppv", "provider": "openai", "persona": "ppv_initial.json", "template": "final",
+         "excel_prefix": "gpt_stability_results"},
+        {"name": "gpt_no_ppv", "provider": "openai", "persona": None, "template": "final",
+         "excel_prefix": "gpt_no_ppv_results"},
+    ],
+}
+
+
+def test_shared_legacy_prefix_is_not_attributed_to_one_condition():
+    # 舊版 ask_gpt5_final.py 與 ask_gpt5_final_noppv.py 都寫 gpt_stability_results_*.xlsx
+    info = file_info("gpt_stability_results_20250101_120000.xlsx", condition_index(CONFIG))
+    assert info["ambiguous"] and info["condition"] is None and info["persona"] is None
+    assert info["model"] == "gpt-test"
+
+
+def test_workbook_info_takes_precedence_over_filename():
+    workbook = {"condition": "gpt_no_ppv", "model": "gpt-test", "persona": "none", "prompt_variant": "final"}
+    info = file_info("gpt_stability_results_20250101_120000.xlsx", condition_index(CONFIG), workbook)
+    assert not info["ambiguous"] and info["condition"] == "gpt_no_ppv" and info["persona"] == "none"
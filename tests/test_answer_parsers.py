@@ -0,0 +1,53 @@
+# tests/test_answer_parsers.py
+from answer_parsers import parse_chars, parse_structured, StreamingAnswerParser
+from answer_distributions import answer_offsets
+
+OPTIONS = ["1", "2", "3"]
+
+
+def test_enumeration_comma_answers_are_positional():
+    # 以頓號分隔、沒有題號的答案不可把第一個答案誤認為題號
+    assert parse_chars("1、2、3、1、2", OPTIONS, 5) == (["1", "2", "3", "1", "2"], {})
+    assert answer_offsets("1、2、3、1、2", OPTIONS, 5) == {1: 0, 2: 2, 3: 4, 4: 6, 5: 8}
+
+
+def test_multiline_numbered_answers():
+    assert parse_chars("1. 2\n2) 3\n3、1", OPTIONS, 3) == (["2", "3", "1"], {})
+
+
+def test_single_numbered_line_is_not_trusted():
+    # 只有一行「N. X」無法判斷是題號還是答案，依位置對齊（數量不符則視為缺答）
+    assert parse_chars("1. 2", OPTIONS, 2) == (["1", "2"], {})
+
+
+def test_streaming_parser_uses_same_rule():
+    for text, expected in (("1、2、3、1、2", ["1", "2", "3", "1", "2"]), ("1. 2\n2. 3\n3. 1", ["2", "3", "1"])):
+        parser = StreamingAnswerParser(OPTIONS, len(expected))
+        for char in text:
+            parser.feed(char, 0.0)
+        parser.feed("", 0.0, final=True)
+        assert parser.answers == expected
+        assert parser.malformed is None
+
+
+def test_structured_confidence_is_keyed_by_question_id():
+    text = (
+        '{"answers": [{"question_id": 2, "answer": "3", "confidence": 40, "reason": ""}, '
+        '{"question_id": 1, "answer": "1", "confidence": 90, "reason": ""}]}'
+    )
+    assert parse_structured(text, OPTIONS, 3) == (["1", "3", None], {"confidence": {1: 90, 2: 40}})
+
+
+def test_streaming_confidence_is_recorded_in_timing():
+    parser = StreamingAnswerParser(OPTIONS, 3, mode="numbered")
+    parser.feed("第1題：2（理由）- 信心水準：85分\n第3題：1（理由）- 信心水準：60分\n", 0.5)
+    parser.feed("", 1.0, final=True)
+    assert parser.timing(1.0)["confidence"] == [85, None, 60]
+
+
+def test_short_unnumbered_reply_is_flagged_for_repair():
+    # 沒有題號、少了一個答案：不猜測位置，全部視為缺答並標記 unaligned，交給補問逐題重答
+    answers, meta = parse_chars("1, 2, 3, 1", OPTIONS, 5)
+    assert answers == [None] * 5
+    assert meta == {"unaligned": 4}
+    assert parse_chars("1, 2, 3, 1, 2", OPTIONS, 5)[1] == {}
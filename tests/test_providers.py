@@ -0,0 +1,59 @@
+# tests/test_providers.py
+import asyncio
+from types import SimpleNamespace
+
+import api_clients
+import providers
+from persona_prompt import CompiledPrompt, is_cache_missing_error
+
+
+class FakeGeminiModel:
+    def __init__(self, expired=False, usage=None):
+        self.expired = expired
+        self.usage = usage
+        self.calls = 0
+
+    def generate_content(self, request, generation_config=None, stream=False):
+        self.calls += 1
+        if self.expired:
+            raise Exception("403 CachedContent not found (or permission denied)")
+        part = SimpleNamespace(text="1")
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))], text="1",
+                               usage_metadata=self.usage)
+
+
+def test_cache_missing_message():
+    assert is_cache_missing_error(Exception("403 CachedContent not found (or permission denied)"))
+    assert is_cache_missing_error(Exception("400 Cache content 123 is expired."))
+    assert not is_cache_missing_error(Exception("400 API key not valid"))
+
+
+def test_gemini_rebuilds_expired_cached_content(monkeypatch):
+    # 第一個模型的 CachedContent 已過期：重建一次後同一個回合照常完成，之後的回合沿用新模型
+    models = [FakeGeminiModel(expired=True), FakeGeminiModel()]
+    monkeypatch.setattr(providers, "gemini_cached_model", lambda *args, **kwargs: models.pop(0))
+    monkeypatch.setattr(api_clients, "configure_gemini", lambda base_url: None)
+    provider = providers.GeminiProvider("fake-gemini", rpm=1000, tpm=10_000_000)
+    provider.base_url = "http://fake"
+    persona = CompiledPrompt("人格", "0" * 64)
+
+    async def two_rounds():
+        return [await provider.generate_async(persona, "第1題") for _ in range(2)]
+
+    assert asyncio.run(two_rounds()) == ["1", "1"]
+    assert not models
+
+
+def test_gemini_rate_limiter_uses_prompt_tokens(monkeypatch):
+    # rate limiter 的預估只涵蓋輸入，修正時要用 prompt_token_count 而不是含輸出與思考的 total_token_count
+    usage = SimpleNamespace(prompt_token_count=120, candidates_token_count=80, thoughts_token_count=800,
+                            cached_content_token_count=0, total_token_count=1000)
+    monkeypatch.setattr(providers, "gemini_cached_model", lambda *args, **kwargs: FakeGeminiModel(usage=usage))
+    monkeypatch.setattr(api_clients, "configure_gemini", lambda base_url: None)
+    provider = providers.GeminiProvider("fake-gemini", rpm=1000, tpm=10_000_000)
+    provider.base_url = "http://fake"
+    recorded = []
+    monkeypatch.setattr(provider.rate_limiter, "record_usage", lambda estimated, actual: recorded.append(actual))
+
+    asyncio.run(provider.generate_async(CompiledPrompt("人格", "0" * 64), "第1題"))
+    assert recorded == [120]
@@ -0,0 +1,30 @@
+# tests/test_question_order.py
+import numpy as np
+
+from question_order import canonical_numbers, position_matrix, round_order, unpermute
+from stability import MISSING
+
+
+def test_round_order_is_a_reproducible_permutation():
+    order = round_order(20251128, 3, 50)
+    assert order.dtype == np.int16
+    assert sorted(order.tolist()) == list(range(50))
+    assert np.array_equal(order, round_order(20251128, 3, 50))
+    assert not np.array_equal(order, round_order(20251128, 4, 50))
+
+
+def test_unpermute_restores_canonical_positions():
+    order = [2, 0, 1]
+    # 送出順序：原第 3 題、第 1 題、第 2 題
+    assert unpermute(["c", "a", "b"], order, 3) == ["a", "b", "c"]
+    # 答案不足時，沒有對到的題目為 None
+    assert unpermute(["c"], order, 3) == [None, None, "c"]
+
+
+def test_canonical_numbers():
+    assert canonical_numbers([1, 3, 4], [2, 0, 1]) == [3, 2]
+
+
+def test_position_matrix():
+    positions = position_matrix([[2, 0, 1], None, [1]], 3)
+    assert positions.tolist() == [[1, 2, 0], [0, 1, 2], [MISSING, 0, MISSING]]
@@ -0,0 +1,20 @@
+# tests/test_retry_policy.py
+from retry_policy import classify_error, RATE_LIMIT, CLIENT_ERROR, UNKNOWN
+
+
+class APIError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def test_status_code_wins_over_message():
+    # 訊息中的 14290 不能讓 400 被當成限流而重試
+    assert classify_error(APIError("you requested 14290 tokens", 400)) == CLIENT_ERROR
+    assert classify_error(APIError("Too Many Requests", 429)) == RATE_LIMIT
+
+
+def test_message_fallback_without_status():
+    assert classify_error(APIError("HTTP 429 Too Many Requests")) == RATE_LIMIT
+    assert classify_error(APIError("RESOURCE_EXHAUSTED: quota exceeded")) == RATE_LIMIT
+    assert classify_error(APIError("request 1429 failed")) == UNKNOWN
@@ -0,0 +1,66 @@
+# tests/test_stability.py
+import numpy as np
+import pytest
+
+from stability import MISSING, StabilityAccumulator, build_answer_matrix, compute_stability, wilson_interval
+
+OPTIONS = ["1", "2", "3"]
+
+
+def test_answer_matrix_marks_missing():
+    # None、不在選項中的答案與不足題數的部分都記為 MISSING；多出的答案略過
+    matrix = build_answer_matrix([["1", None, "3"], ["2"], ["3", "x", "1", "2"], []], OPTIONS, 3)
+    assert matrix.dtype == np.int8
+    assert matrix.tolist() == [
+        [0, MISSING, 2],
+        [1, MISSING, MISSING],
+        [2, MISSING, 0],
+        [MISSING, MISSING, MISSING],
+    ]
+
+
+def test_answer_matrix_multi_char_options():
+    matrix = build_answer_matrix([["很符合", "不符合"], ["不符合", None]], ["不符合", "很符合"], 2)
+    assert matrix.tolist() == [[1, 0], [0, MISSING]]
+
+
+def test_compute_stability_ignores_missing_answers():
+    rounds = [["1", "2", None], ["1", "3", None], ["2", "2", None], ["1", None, None]]
+    results = compute_stability(rounds, OPTIONS, 3)
+    # 第 3 題完全沒有答案，不列出
+    assert [r["question"] for r in results] == [1, 2]
+    first, second = results
+    assert (first["most_common"], first["count"], first["total"]) == ("1", 3, 4)
+    assert first["stability"] == pytest.approx(0.75)
+    assert (second["most_common"], second["count"], second["total"]) == ("2", 2, 3)
+    assert second["stability"] == pytest.approx(2 / 3)
+    assert first["entropy"] == pytest.approx(-(0.75 * np.log2(0.75) + 0.25 * np.log2(0.25)))
+
+
+def test_compute_stability_without_answers():
+    assert compute_stability([[None, None]], OPTIONS, 2) == []
+
+
+def test_wilson_interval():
+    lower, upper = wilson_interval([8, 10, 0], [10, 10, 0])
+    assert lower[0] == pytest.approx(0.4902, abs=1e-4)
+    assert upper[0] == pytest.approx(0.9433, abs=1e-4)
+    # 全部一致時上界為 1，下界仍小於 1
+    assert upper[1] == pytest.approx(1.0) and lower[1] == pytest.approx(0.7225, abs=1e-4)
+    assert np.isnan(lower[2]) and np.isnan(upper[2])
+
+
+def test_accumulator_converged():
+    accumulator = StabilityAccumulator(OPTIONS, 2)
+    for _ in range(9):
+        accumulator.add_round(["1", "2"])
+    # 回合數還不到 min_rounds 時不會停止
+    assert not accumulator.converged(0.2, min_rounds=10)
+    accumulator.add_round(["1", None])
+    # 第 2 題只有 9 個答案
+    assert not accumulator.converged(0.2, min_rounds=10)
+    assert accumulator.unsettled(0.2, min_rounds=10).tolist() == [False, True]
+    accumulator.add_round(["1", "2"])
+    assert accumulator.converged(0.2, min_rounds=10)
+    # 誤差範圍（10/10 約 ±0.14）大於目標時不會停止
+    assert not accumulator.converged(0.1, min_rounds=10)
@@ -0,0 +1,34 @@
+# tests/test_trait_scores.py
+import numpy as np
+import pytest
+
+from stability import MISSING
+from trait_scores import scoring_key, score_matrix
+
+QUESTIONS = [
+    {"q": "a", "trait": "extraversion", "reverse": False},
+    {"q": "b", "trait": "extraversion", "reverse": True},
+    {"q": "c", "trait": "openness", "reverse": False},
+]
+TRAITS = {"extraversion": "外向性", "openness": "開放性"}
+
+
+def test_reverse_keyed_questions_are_flipped():
+    key = scoring_key(QUESTIONS, TRAITS)
+    assert key[0] == ["extraversion", "openness"]
+    # 3 個選項：索引 2 =「符合」；反向題答「不符合」（索引 0）等同正向題答「符合」
+    matrix = np.array([[2, 0, 1], [0, 2, 2]], dtype=np.int8)
+    scores = score_matrix(matrix, 3, key)
+    np.testing.assert_allclose(scores, [[100.0, 50.0], [0.0, 100.0]])
+
+
+def test_missing_answers_are_excluded_from_the_mean():
+    key = scoring_key(QUESTIONS, TRAITS)
+    matrix = np.array([[2, MISSING, MISSING]], dtype=np.int8)
+    scores = score_matrix(matrix, 3, key)
+    assert scores[0, 0] == pytest.approx(100.0)
+    assert np.isnan(scores[0, 1])
+
+
+def test_questions_without_traits():
+    assert scoring_key([{"q": "a"}], TRAITS) is None
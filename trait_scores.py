@@ -0,0 +1,119 @@
+# trait_scores.py
+# 由答案矩陣計算每回合的 Big Five 特質分數（0~100，反向題反向計分），以及與 PPV big5 目標值的距離
+import json
+import warnings
+
+import numpy as np
+
+from questions_list import questions_list, BIG5_TRAITS
+from stability import build_answer_matrix
+
+
+def scoring_key(questions=questions_list, traits=BIG5_TRAITS):
+    """題目的計分表：(特質 key list, 題目 × 特質 的 0/1 矩陣, 各題是否反向)；題目沒有 trait 時回傳 None"""
+    if not questions or any("trait" not in q for q in questions):
+        return None
+    trait_keys = [t for t in traits if any(q["trait"] == t for q in questions)]
+    membership = np.array([[q["trait"] == t for t in trait_keys] for q in questions], dtype=float)
+    reverse = np.array([bool(q.get("reverse")) for q in questions])
+    return trait_keys, membership, reverse
+
+
+def score_matrix(matrix, num_options, key):
+    """答案矩陣（回合 × 題目，值為選項索引）→ 每回合的特質分數（回合 × 特質，0~100）
+
+    選項依量表順序視為由「不符合」到「符合」（agree3 的 1~3；letter5 假設 A~E 同方向），
+    反向題以 (K−1) − 索引 計分；每個特質取有作答題目的平均，完全沒有作答時為 NaN。
+    """
+    _, membership, reverse = key
+    num_questions = min(matrix.shape[1], len(reverse))
+    matrix, membership, reverse = matrix[:, :num_questions], membership[:num_questions], reverse[:num_questions]
+    valid = matrix >= 0
+    keyed = np.where(reverse, num_options - 1 - matrix, matrix) / (num_options - 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 100 * (np.where(valid, keyed, 0.0) @ membership) / (valid.astype(float) @ membership)
+
+
+def ppv_targets(ppv_path, trait_keys):
+    """PPV 檔案 big5 區塊中各特質的目標值（0~100）；沒有 PPV 或沒有 big5 時回傳 None"""
+    if not ppv_path:
+        return None
+    with open(ppv_path, "r", encoding="utf-8") as f:
+        big5 = json.load(f).get("big5")
+    if not big5:
+        return None
+    return np.array([big5.get(t, np.nan) for t in trait_keys], dtype=float)
+
+
+def target_distance(scores, targets):
+    """每回合各特質與目標值的差（分數 − 目標）與整體距離（各特質差的均方根），回傳 (差, 距離)"""
+    diff = scores - targets
+    # 整列都是 NaN（該回合沒有任何作答）時距離為 NaN，不顯示 Mean of empty slice 警告
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        distance = np.sqrt(np.nanmean(diff ** 2, axis=1))
+    return diff, distance
+
+
+class TraitAccumulator:
+    """回合進行中即時累積各特質分數的總和，可隨時取得平均分數與離 PPV 目標的距離（每回合 O(題數)）"""
+
+    def __init__(self, options, questions=questions_list, ppv_path=None):
+        self.options = options
+        self.num_questions = len(questions)
+        self.key = scoring_key(questions)
+        self.trait_keys = self.key[0] if self.key else []
+        self.targets = ppv_targets(ppv_path, self.trait_keys) if self.key else None
+        self.sums = np.zeros(len(self.trait_keys))
+        self.counts = np.zeros(len(self.trait_keys), dtype=np.int64)
+
+    def add_round(self, answers):
+        if self.key is None:
+            return
+        row = build_answer_matrix([answers], self.options, self.num_questions)
+        scores = score_matrix(row, len(self.options), self.key)[0]
+        valid = np.isfinite(scores)
+        self.sums[valid] += scores[valid]
+        self.counts[valid] += 1
+
+    def means(self):
+        """目前各特質的平均分數（還沒有任何作答的特質為 NaN）"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sums / self.counts, np.nan)
+
+    def summary(self):
+        if self.key is None or not self.counts.any():
+            return "特質分數：尚無有效答案"
+        means = self.means()
+        parts = []
+        for idx, trait in enumerate(self.trait_keys):
+            text = f"{BIG5_TRAITS.get(trait, trait)} {means[idx]:.0f}"
+            if self.targets is not None and np.isfinite(self.targets[idx]):
+                text += f"（目標 {self.targets[idx]:.0f}）"
+            parts.append(text)
+        line = "特質分數：" + "、".join(parts)
+        if self.targets is not None:
+            _, distance = target_distance(means[None, :], self.targets)
+            line += f"｜與 PPV 距離 {distance[0]:.1f}"
+        return line
+
+
+def trait_report(all_rounds, options, questions=questions_list, ppv_path=None):
+    """每回合一列的特質分數表（DataFrame），有 PPV 目標時加上各特質的差與整體距離；題目沒有 trait 時回傳 None"""
+    import pandas as pd
+
+    key = scoring_key(questions)
+    if key is None or not all_rounds:
+        return None
+    trait_keys = key[0]
+    scores = score_matrix(build_answer_matrix(all_rounds, options, len(questions)), len(options), key)
+    df = pd.DataFrame({"回合": np.arange(1, len(scores) + 1)})
+    for idx, trait in enumerate(trait_keys):
+        df[BIG5_TRAITS.get(trait, trait)] = scores[:, idx]
+    targets = ppv_targets(ppv_path, trait_keys)
+    if targets is not None:
+        diff, distance = target_distance(scores, targets)
+        for idx, trait in enumerate(trait_keys):
+            df[f"{BIG5_TRAITS.get(trait, trait)}−目標"] = diff[:, idx]
+        df["與 PPV 距離"] = distance
+    return df